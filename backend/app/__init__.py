@@ -11,27 +11,75 @@ migrate = Migrate()
 jwt = JWTManager()
 
 
+def start_schedulers(app):
+    """
+    Start the purge and partition maintenance threads. Threads do not survive fork, so a
+    pre-forking server calls this in each worker (gunicorn.conf.py post_fork) instead.
+    """
+    from app.services import partitions, purge
+    purge.start_scheduler(app)
+    partitions.start_scheduler(app)
+
+
 def create_app(config_name=None):
     config_name = config_name or "default"
     app = Flask(__name__)
     app.config.from_object(config_by_name[config_name])
 
+    from app.services.pool import configure_pool, pool_status
+    configure_pool(app)
+
     CORS(app, supports_credentials=True)
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
 
-    from app.models import User, Meal, Workout  # noqa: F401 - register models for Flask-Migrate
-    from app.routes import auth_bp, meals_bp, workouts_bp, analyze_bp, dashboard_bp
+    from app.services.analysis import analyzer
+    from app.services.cache import response_cache
+    from app.services.estimates import text_estimates
+    from app.services.metrics import metrics, register_default_collectors
+    from app.services.users import user_cache
+    response_cache.init_app(app)
+    user_cache.init_app(app, jwt)
+    metrics.init_app(app)
+    register_default_collectors(app)
+    analyzer.init_app(app)
+    text_estimates.init_app(app)
+
+    from app.models import User, Meal, Workout, DailyTotal, AnalysisJob, UploadBlob, TextEstimate, Tombstone  # noqa: F401 - register models for Flask-Migrate
+    from app.routes import auth_bp, meals_bp, workouts_bp, analyze_bp, dashboard_bp, export_bp, sync_bp
+    from app.commands import register_commands
 
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
     app.register_blueprint(meals_bp, url_prefix="/api/meals")
     app.register_blueprint(workouts_bp, url_prefix="/api/workouts")
     app.register_blueprint(analyze_bp, url_prefix="/api")
     app.register_blueprint(dashboard_bp, url_prefix="/api/dashboard")
+    app.register_blueprint(export_bp, url_prefix="/api/export")
+    app.register_blueprint(sync_bp, url_prefix="/api/sync")
+    register_commands(app)
+
+    if not app.config["SCHEDULERS_AFTER_FORK"]:
+        start_schedulers(app)
 
     @app.route("/")
     def home():
         return {"message": "Backend is running"}
 
+    @app.route("/health/cache")
+    def cache_stats():
+        return {
+            "response_cache": response_cache.stats(),
+            "user_cache": user_cache.stats(),
+            "text_estimates": text_estimates.stats(),
+        }
+
+    @app.route("/health/pool")
+    def pool_stats():
+        return {"db_pool": pool_status(db.engine)}
+
+    @app.route("/health/analyzer")
+    def analyzer_stats():
+        return {"analyzer": analyzer.stats()}
+
     return app
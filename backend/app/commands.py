@@ -0,0 +1,191 @@
+"""Flask CLI commands (run from backend with FLASK_APP=run:app)."""
+from datetime import date
+
+import click
+from flask.cli import AppGroup
+
+from app import db
+
+rollups_cli = AppGroup("rollups", help="Maintain the daily_totals rollup table.")
+
+
+def _parse_day(value):
+    return date.fromisoformat(value) if value else None
+
+
+@rollups_cli.command("rebuild")
+@click.option("--user-id", type=int, default=None, help="Only rebuild this user's rollups.")
+@click.option("--from", "from_day", default=None, help="First day to rebuild (YYYY-MM-DD).")
+@click.option("--to", "to_day", default=None, help="Last day to rebuild (YYYY-MM-DD).")
+def rebuild_rollups(user_id, from_day, to_day):
+    """Recompute daily_totals from raw meals and workouts (backfill/repair)."""
+    from app.services import rollups
+
+    written = rollups.rebuild(user_id, _parse_day(from_day), _parse_day(to_day))
+    db.session.commit()
+    click.echo(f"Rebuilt {written} daily_totals rows.")
+
+
+jobs_cli = AppGroup("jobs", help="Run the asynchronous image analysis queue.")
+
+
+@jobs_cli.command("work")
+@click.option("--processes", type=int, default=None, help="Pool size (default: ANALYZE_WORKER_PROCESSES).")
+@click.option("--once", is_flag=True, help="Exit when the queue is empty.")
+def work_jobs(processes, once):
+    """Process queued analysis jobs with a process pool."""
+    from flask import current_app
+
+    from app.services import jobs
+
+    processed = jobs.run_worker(current_app._get_current_object(), processes=processes, once=once)
+    click.echo(f"Processed {processed} jobs.")
+
+
+uploads_cli = AppGroup("uploads", help="Manage the content-addressed upload store.")
+
+
+@uploads_cli.command("gc")
+@click.option("--grace-seconds", type=int, default=None, help="Default: UPLOAD_GC_GRACE_SECONDS.")
+def collect_uploads(grace_seconds):
+    """Delete stored images no meal references anymore."""
+    from flask import current_app
+
+    from app.services import uploads
+
+    grace = grace_seconds if grace_seconds is not None else current_app.config["UPLOAD_GC_GRACE_SECONDS"]
+    total = 0
+    while True:
+        removed = uploads.collect_garbage(grace)
+        total += removed
+        if not removed:
+            break
+    click.echo(f"Removed {total} unreferenced uploads.")
+
+
+@uploads_cli.command("trim-variants")
+@click.option("--max-bytes", type=int, default=None, help="Default: IMAGE_VARIANT_CACHE_MAX_BYTES.")
+def trim_variants(max_bytes):
+    """Evict least recently used resized images until the cache fits."""
+    from flask import current_app
+
+    from app.services import images
+
+    limit = max_bytes if max_bytes is not None else current_app.config["IMAGE_VARIANT_CACHE_MAX_BYTES"]
+    removed, freed = images.trim(limit)
+    click.echo(f"Removed {removed} variants ({freed / 1e6:.1f} MB).")
+
+
+guests_cli = AppGroup("guests", help="Manage the pre-allocated guest account pool.")
+
+
+@guests_cli.command("prefill")
+@click.option("--count", type=int, default=1000, show_default=True)
+def prefill_guests(count):
+    """Pre-allocate guest rows for POST /api/auth/guest (with GUEST_POOL_ENABLED)."""
+    from app.services import guests
+
+    created = guests.prefill(count)
+    click.echo(f"Added {created} pooled guests; pool size is now {guests.pool_size()}.")
+
+
+purge_cli = AppGroup("purge", help="Delete expired guests and accounts pending deletion.")
+
+
+@purge_cli.command("run")
+@click.option("--max-batches", type=int, default=None, help="Stop after this many batches.")
+def run_purge(max_batches):
+    """Purge due accounts in throttled batches (see PURGE_* settings)."""
+    from flask import current_app
+
+    from app.services import purge
+
+    stats = purge.run(current_app.config, max_batches=max_batches)
+    click.echo(
+        f"Purged {stats.get('users', 0)} users, {stats.get('meals', 0)} meals, "
+        f"{stats.get('workouts', 0)} workouts, {stats.get('files', 0)} legacy image files."
+    )
+
+
+partitions_cli = AppGroup("partitions", help="Maintain monthly meals/workouts partitions (PostgreSQL).")
+
+
+def _require_partitioned():
+    from app.services import partitions
+
+    if not partitions.is_partitioned():
+        raise click.ClickException("meals is not partitioned (PostgreSQL with migration 008 required).")
+
+
+@partitions_cli.command("list")
+def list_partitions():
+    """Show attached monthly partitions with approximate row counts."""
+    from app.services import partitions
+
+    _require_partitioned()
+    for table in partitions.TABLES:
+        for month, name, rows in partitions.list_partitions(table):
+            click.echo(f"{name:24s} {month:%Y-%m}  ~{rows} rows")
+
+
+@partitions_cli.command("ensure")
+@click.option("--months-ahead", type=int, default=None, help="Default: PARTITION_MONTHS_AHEAD.")
+def ensure_partitions(months_ahead):
+    """Create upcoming monthly partitions and split rows out of the default partition."""
+    from flask import current_app
+
+    from app.services import partitions
+
+    _require_partitioned()
+    ahead = months_ahead if months_ahead is not None else current_app.config["PARTITION_MONTHS_AHEAD"]
+    created = partitions.ensure_partitions(ahead)
+    click.echo(f"Created {len(created)} partitions{': ' + ', '.join(created) if created else '.'}")
+
+
+@partitions_cli.command("archive")
+@click.option("--older-than-months", type=int, required=True, help="Archive months before this many months ago.")
+@click.option("--export", "export_dir", default=None, help="Write <partition>.csv.gz here and drop the partition.")
+def archive_partitions(older_than_months, export_dir):
+    """Detach old partitions into the archive schema, or export and drop them."""
+    from app.services import partitions
+
+    _require_partitioned()
+    for name, destination in partitions.archive(older_than_months, export_dir):
+        click.echo(f"{name} -> {destination}")
+
+
+estimates_cli = AppGroup("estimates", help="Manage the cached /api/analyze/text estimates.")
+
+
+@estimates_cli.command("prune")
+def prune_estimates():
+    """Delete cached estimates made with an older version of the food table."""
+    from app.services.estimates import text_estimates
+
+    click.echo(f"Removed {text_estimates.prune()} stale estimates.")
+
+
+sync_cli = AppGroup("sync", help="Maintain delta sync state.")
+
+
+@sync_cli.command("prune-tombstones")
+@click.option("--days", type=int, default=None, help="Keep this many days (default: SYNC_TOMBSTONE_RETENTION_DAYS).")
+def prune_tombstones(days):
+    """Delete tombstones older than the retention window."""
+    from flask import current_app
+
+    from app.services import sync
+
+    days = days if days is not None else current_app.config["SYNC_TOMBSTONE_RETENTION_DAYS"]
+    click.echo(f"Removed {sync.prune_tombstones(days)} tombstones older than {days} days.")
+
+
+def register_commands(app):
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(uploads_cli)
+    app.cli.add_command(guests_cli)
+    app.cli.add_command(purge_cli)
+    app.cli.add_command(partitions_cli)
+    app.cli.add_command(estimates_cli)
+    app.cli.add_command(sync_cli)
@@ -1,5 +1,10 @@
 from app.models.user import User
 from app.models.meal import Meal
 from app.models.workout import Workout
+from app.models.daily_total import DailyTotal
+from app.models.analysis_job import AnalysisJob
+from app.models.upload_blob import UploadBlob
+from app.models.text_estimate import TextEstimate
+from app.models.tombstone import Tombstone
 
-__all__ = ["User", "Meal", "Workout"]
+__all__ = ["User", "Meal", "Workout", "DailyTotal", "AnalysisJob", "UploadBlob", "TextEstimate", "Tombstone"]
@@ -0,0 +1,40 @@
+from app import db
+
+
+class AnalysisJob(db.Model):
+    """Queued image analysis (POST /api/analyze?async=1), processed by `flask jobs work`."""
+
+    __tablename__ = "analysis_jobs"
+    __table_args__ = (db.Index("ix_analysis_jobs_status_created_at", "status", "created_at"),)
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = db.Column(db.String(16), nullable=False, default=QUEUED)
+    image_path = db.Column(db.String(512), nullable=False)
+    save_meal = db.Column(db.Boolean, nullable=False, default=False)
+    meal_name = db.Column(db.String(255), nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    meal_id = db.Column(db.Integer, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
+    started_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "image_path": self.image_path,
+            "result": self.result,
+            "error": self.error,
+            "meal_id": self.meal_id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -0,0 +1,29 @@
+from app import db
+
+
+class DailyTotal(db.Model):
+    """Per-user, per-UTC-day rollup of meals and workouts, maintained by every write path."""
+
+    __tablename__ = "daily_totals"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    calories_in = db.Column(db.Float, nullable=False, default=0)
+    calories_out = db.Column(db.Float, nullable=False, default=0)
+    protein = db.Column(db.Float, nullable=False, default=0)
+    carbs = db.Column(db.Float, nullable=False, default=0)
+    fats = db.Column(db.Float, nullable=False, default=0)
+    meals_count = db.Column(db.Integer, nullable=False, default=0)
+    workouts_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            "date": self.day.isoformat() if self.day else None,
+            "calories_in": round(self.calories_in, 1),
+            "calories_out": round(self.calories_out, 1),
+            "protein": round(self.protein, 1),
+            "carbs": round(self.carbs, 1),
+            "fats": round(self.fats, 1),
+            "meals_count": self.meals_count,
+            "workouts_count": self.workouts_count,
+        }
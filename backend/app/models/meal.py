@@ -1,11 +1,21 @@
+from datetime import datetime, timezone
+
 from app import db
 
 
 class Meal(db.Model):
     __tablename__ = "meals"
+    __table_args__ = (
+        # Serves list/history ordering and keyset pagination (see services/pagination.py)
+        db.Index("ix_meals_user_id_logged_at", "user_id", db.text("logged_at DESC"), db.text("id DESC")),
+        # Serves GET /api/sync (rows changed since a token)
+        db.Index("ix_meals_user_id_updated_at", "user_id", "updated_at"),
+    )
 
+    # On PostgreSQL the table is partitioned by logged_at month (migration 008) and the database
+    # primary key is (id, logged_at); id alone is still unique (one sequence) and identifies rows here.
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     image_path = db.Column(db.String(512), nullable=True)  # optional, for analyzed images
     calories = db.Column(db.Float, nullable=False, default=0)
     protein = db.Column(db.Float, nullable=False, default=0)
@@ -14,6 +24,13 @@ class Meal(db.Model):
     name = db.Column(db.String(255), nullable=True)  # optional label, e.g. "Lunch"
     logged_at = db.Column(db.DateTime(timezone=True), nullable=False)  # when user says they ate
     created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
+    # Set on every INSERT and UPDATE (ORM and Core statements alike), for delta sync
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
 
     def to_dict(self):
         return {
@@ -27,4 +44,5 @@ class Meal(db.Model):
             "name": self.name,
             "logged_at": self.logged_at.isoformat() if self.logged_at else None,
             "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
@@ -0,0 +1,21 @@
+from app import db
+
+
+class TextEstimate(db.Model):
+    """
+    A resolved /api/analyze/text description, keyed by the SHA-256 of the food table
+    version and the normalized text (see app/services/estimates.py). hits counts
+    lookups, so the hottest entries can be preloaded into each worker.
+    """
+
+    __tablename__ = "text_estimates"
+
+    digest = db.Column(db.String(64), primary_key=True)
+    food_version = db.Column(db.String(16), nullable=False)
+    normalized = db.Column(db.Text, nullable=False)
+    result = db.Column(db.JSON, nullable=False)
+    hits = db.Column(db.BigInteger, nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
+    last_hit_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
+
+    __table_args__ = (db.Index("ix_text_estimates_version_hits", "food_version", hits.desc()),)
@@ -0,0 +1,17 @@
+from app import db
+
+
+class Tombstone(db.Model):
+    """
+    Marks a deleted meal or workout so GET /api/sync can tell clients to drop it.
+    Kept for SYNC_TOMBSTONE_RETENTION_DAYS; older sync tokens must resync from scratch.
+    """
+
+    __tablename__ = "tombstones"
+    __table_args__ = (db.Index("ix_tombstones_user_id_deleted_at", "user_id", "deleted_at"),)
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    kind = db.Column(db.String(16), nullable=False)  # "meal" or "workout"
+    record_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime(timezone=True), nullable=False)
@@ -0,0 +1,19 @@
+from app import db
+
+
+class UploadBlob(db.Model):
+    """
+    A stored image, addressed by the SHA-256 of its content.
+    refcount counts meals whose image_path points at it; analysis caches the
+    analyzer output so re-sent photos are not analyzed twice.
+    """
+
+    __tablename__ = "upload_blobs"
+
+    digest = db.Column(db.String(64), primary_key=True)
+    path = db.Column(db.String(512), nullable=False, unique=True)  # relative to UPLOAD_FOLDER
+    size = db.Column(db.BigInteger, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    analysis = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
+    last_used_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
@@ -4,24 +4,46 @@ from werkzeug.security import generate_password_hash, check_password_hash
 
 class User(db.Model):
     __tablename__ = "users"
+    __table_args__ = (
+        db.Index("ix_users_pooled", "pooled", postgresql_where=db.text("pooled"), sqlite_where=db.text("pooled")),
+        db.Index(
+            "ix_users_deletion_requested_at",
+            "deletion_requested_at",
+            postgresql_where=db.text("deletion_requested_at IS NOT NULL"),
+        ),
+        db.Index("ix_users_guest_created_at", "created_at", postgresql_where=db.text("is_guest AND NOT pooled")),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(255), unique=True, nullable=False, index=True)
-    password_hash = db.Column(db.String(255), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=True)  # NULL for guests
+    is_guest = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    # Pre-allocated guest rows waiting to be handed out by POST /api/auth/guest
+    pooled = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
+    # Set by DELETE /api/auth/me; `flask purge run` removes the account afterwards
+    deletion_requested_at = db.Column(db.DateTime(timezone=True), nullable=True)
 
-    meals = db.relationship("Meal", backref="user", lazy="dynamic", cascade="all, delete-orphan")
-    workouts = db.relationship("Workout", backref="user", lazy="dynamic", cascade="all, delete-orphan")
+    # passive_deletes: rely on ON DELETE CASCADE instead of loading every child row
+    meals = db.relationship(
+        "Meal", backref="user", lazy="dynamic", cascade="all, delete-orphan", passive_deletes=True
+    )
+    workouts = db.relationship(
+        "Workout", backref="user", lazy="dynamic", cascade="all, delete-orphan", passive_deletes=True
+    )
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
 
     def check_password(self, password):
+        if not self.password_hash:
+            return False
         return check_password_hash(self.password_hash, password)
 
     def to_dict(self):
         return {
             "id": self.id,
             "email": self.email,
+            "is_guest": bool(self.is_guest),
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
@@ -1,17 +1,34 @@
+from datetime import datetime, timezone
+
 from app import db
 
 
 class Workout(db.Model):
     __tablename__ = "workouts"
+    __table_args__ = (
+        # Serves list/history ordering and keyset pagination (see services/pagination.py)
+        db.Index("ix_workouts_user_id_logged_at", "user_id", db.text("logged_at DESC"), db.text("id DESC")),
+        # Serves GET /api/sync (rows changed since a token)
+        db.Index("ix_workouts_user_id_updated_at", "user_id", "updated_at"),
+    )
 
+    # On PostgreSQL the table is partitioned by logged_at month (migration 008) and the database
+    # primary key is (id, logged_at); id alone is still unique (one sequence) and identifies rows here.
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     name = db.Column(db.String(255), nullable=False)  # e.g. "Running", "Strength"
     duration_minutes = db.Column(db.Integer, nullable=False)
     calories_burned = db.Column(db.Float, nullable=True)
     notes = db.Column(db.Text, nullable=True)
     logged_at = db.Column(db.DateTime(timezone=True), nullable=False)
     created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
+    # Set on every INSERT and UPDATE (ORM and Core statements alike), for delta sync
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
 
     def to_dict(self):
         return {
@@ -23,4 +40,5 @@ class Workout(db.Model):
             "notes": self.notes,
             "logged_at": self.logged_at.isoformat() if self.logged_at else None,
             "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
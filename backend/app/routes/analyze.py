@@ -1,10 +1,11 @@
-import os
-import uuid
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.utils import secure_filename
 from app import db
-from app.models import Meal
+from app.models import AnalysisJob, Meal
+from app.services import jobs, rollups, uploads
+from app.services.analysis import analyzer
+from app.services.estimates import text_estimates
+from app.services.metrics import metrics
 from datetime import datetime, timezone
 
 analyze_bp = Blueprint("analyze", __name__)
@@ -20,40 +21,72 @@ def allowed_file(filename):
 @jwt_required()
 def analyze():
     """
-    Accept an image file, run stub analysis (placeholder for TensorFlow/OpenCV),
-    return estimated macros. Optionally save image and create a meal log.
+    Accept an image (multipart form field "image" or "file", or the raw request body),
+    streamed into upload storage as it arrives so a non-image is rejected after its first
+    chunk either way. Run it through the configured analyzer backend, return estimated
+    macros with per-stage timings_ms. Optionally save image and create a meal log.
+    With ?async=1 the analysis is queued instead and 202 + job_id is returned;
+    poll GET /api/analyze/jobs/<job_id> for the result.
     """
-    if "image" not in request.files and "file" not in request.files:
-        return jsonify({"error": "No image file provided. Use form field 'image' or 'file'."}), 400
-    file = request.files.get("image") or request.files.get("file")
-    if not file or file.filename == "":
-        return jsonify({"error": "Empty filename"}), 400
-    if not allowed_file(file.filename):
-        return jsonify({"error": "Allowed formats: png, jpg, jpeg, webp, gif"}), 400
-
-    # Stub: in production, run TensorFlow/OpenCV here and return real macros
-    # For now return placeholder values (could add simple heuristics later)
-    result = {
-        "calories": 450,
-        "protein": 28,
-        "carbs": 42,
-        "fats": 18,
-        "stub": True,
-        "message": "Stub analysis; integrate TensorFlow/OpenCV for real recognition.",
-    }
-
-    # Optional: save image and store path for later ML pipeline
-    upload_folder = request.app.config.get("UPLOAD_FOLDER")
-    if upload_folder:
-        os.makedirs(upload_folder, exist_ok=True)
-        ext = file.filename.rsplit(".", 1)[1].lower()
-        unique = f"{uuid.uuid4().hex}.{ext}"
-        save_path = os.path.join(upload_folder, unique)
-        file.save(save_path)
-        result["image_path"] = unique
+    # The image is read straight from the socket in chunks, never spooled: either the raw
+    # body (Content-Type: image/* or application/octet-stream, options in the query string)
+    # or the "image"/"file" part of a multipart form, parsed as it arrives.
+    multipart = None
+    if request.mimetype.startswith("image/") or request.mimetype == "application/octet-stream":
+        chunks = uploads.iter_chunks(request.stream)
+    else:
+        boundary = request.mimetype_params.get("boundary")
+        if request.mimetype != "multipart/form-data" or not boundary:
+            return jsonify({"error": "No image file provided. Use form field 'image' or 'file'."}), 400
+        multipart = uploads.MultipartUpload(request.stream, boundary)
+        try:
+            filename = multipart.find_file(("image", "file"))
+        except ValueError:
+            return jsonify({"error": "Malformed multipart body"}), 400
+        if filename is None:
+            return jsonify({"error": "No image file provided. Use form field 'image' or 'file'."}), 400
+        if filename == "":
+            return jsonify({"error": "Empty filename"}), 400
+        if not allowed_file(filename):
+            return jsonify({"error": "Allowed formats: png, jpg, jpeg, webp, gif"}), 400
+        chunks = multipart.file_chunks()
+
+    try:
+        stored = uploads.store(chunks)
+        # Fields after the file part (e.g. save_meal) are read once the image is stored
+        form = multipart.finish() if multipart is not None else request.args
+    except uploads.UploadRejected as exc:
+        metrics.observe_upload(0, 0, "rejected")
+        return jsonify({"error": str(exc)}), exc.status
+    except ValueError:
+        return jsonify({"error": "Malformed multipart body"}), 400
+    if stored.created:
+        metrics.observe_upload(stored.received, stored.size, "stored")
+    else:
+        metrics.observe_upload(stored.received, 0, "duplicate")
+    save_meal = form.get("save_meal", "").lower() in ("1", "true", "yes")
+    meal_name = form.get("name")
+
+    # Async mode: queue the analysis for `flask jobs work` and return immediately
+    if request.args.get("async", "").lower() in ("1", "true", "yes"):
+        job = jobs.enqueue(get_jwt_identity(), stored.path, save_meal, meal_name)
+        return jsonify(
+            job_id=job.id,
+            status=job.status,
+            status_url=url_for("analyze.analysis_job", job_id=job.id),
+        ), 202
+
+    # Same photo seen before (e.g. a client retry): reuse its analysis
+    if stored.analysis is not None:
+        result = {**stored.analysis, "cached": True}
+    else:
+        result, timings = analyzer.analyze(uploads.resolve_path(stored.path))
+        uploads.cache_analysis(stored.path, result)
+        db.session.commit()
+        result = {**result, "timings_ms": timings}
+    result["image_path"] = stored.path
 
     # Optional: if client sends save_meal=true, create a meal from this analysis
-    save_meal = request.form.get("save_meal", "").lower() in ("1", "true", "yes")
     if save_meal:
         user_id = get_jwt_identity()
         meal = Meal(
@@ -63,10 +96,12 @@ def analyze():
             carbs=result["carbs"],
             fats=result["fats"],
             image_path=result.get("image_path"),
-            name=request.form.get("name") or "Photo meal",
+            name=meal_name or "Photo meal",
             logged_at=datetime.now(timezone.utc),
         )
         db.session.add(meal)
+        rollups.add_meal(meal)
+        uploads.retain(meal.image_path)
         db.session.commit()
         result["meal"] = meal.to_dict()
         result["meal_id"] = meal.id
@@ -74,11 +109,24 @@ def analyze():
     return jsonify(result)
 
 
+@analyze_bp.route("/analyze/jobs/<job_id>", methods=["GET"])
+@jwt_required()
+def analysis_job(job_id):
+    """Status of an async analysis: queued, running, done (with result/meal_id) or failed."""
+    user_id = get_jwt_identity()
+    job = AnalysisJob.query.filter_by(id=job_id, user_id=user_id).first()
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
 @analyze_bp.route("/analyze/text", methods=["POST"])
 @jwt_required()
 def analyze_text():
     """
-    Accept a text description of what was eaten, return stub macros.
+    Accept a text description of what was eaten, return estimated macros from the
+    bundled food table (see app/services/nutrition.py); repeated descriptions are
+    answered from app/services/estimates.py.
     Body: { "description": "two eggs and toast" }, optional "save_meal", "name".
     """
     data = request.get_json() or {}
@@ -86,19 +134,15 @@ def analyze_text():
     if not description:
         return jsonify({"error": "description required"}), 400
 
-    # Stub: in production, use NLP or a food DB to estimate from description
-    result = {
-        "description": description,
-        "calories": 420,
-        "protein": 22,
-        "carbs": 38,
-        "fats": 20,
-        "stub": True,
-        "message": "Stub estimate; integrate food DB/NLP for real values.",
-    }
+    estimate = text_estimates.estimate(description)
+    result = {"description": description, **estimate, "stub": False}
+    if not estimate["items"]:
+        result["message"] = "No known foods recognized in description."
 
     save_meal = data.get("save_meal") is True or str(data.get("save_meal", "")).lower() in ("1", "true", "yes")
     if save_meal:
+        if not estimate["items"]:
+            return jsonify({**result, "error": "Could not recognize any foods to log"}), 422
         user_id = get_jwt_identity()
         meal = Meal(
             user_id=user_id,
@@ -110,6 +154,7 @@ def analyze_text():
             logged_at=datetime.now(timezone.utc),
         )
         db.session.add(meal)
+        rollups.add_meal(meal)
         db.session.commit()
         result["meal"] = meal.to_dict()
         result["meal_id"] = meal.id
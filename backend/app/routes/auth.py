@@ -1,14 +1,17 @@
-from flask import Blueprint, request, jsonify
+from datetime import datetime, timezone
+
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import (
     create_access_token,
     create_refresh_token,
+    current_user,
     jwt_required,
     get_jwt_identity,
 )
-import os
-import uuid
 from app import db
 from app.models import User
+from app.services import guests
+from app.services.users import note_account_change
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -16,11 +19,7 @@ auth_bp = Blueprint("auth", __name__)
 @auth_bp.route("/guest", methods=["POST"])
 def guest():
     """Create a temporary guest user and return tokens. No email/password required."""
-    guest_email = f"guest_{uuid.uuid4().hex}@guest.local"
-    user = User(email=guest_email)
-    user.set_password(os.urandom(24).hex())  # random password, guest won't use it
-    db.session.add(user)
-    db.session.commit()
+    user = guests.create_guest(use_pool=current_app.config["GUEST_POOL_ENABLED"])
     access_token = create_access_token(identity=user.id)
     refresh_token = create_refresh_token(identity=user.id)
     return jsonify(
@@ -31,15 +30,29 @@ def guest():
 
 
 @auth_bp.route("/register", methods=["POST"])
+@jwt_required(optional=True)
 def register():
+    """
+    Register with email and password. Called with a guest's access token, the guest
+    account is upgraded in place and keeps its meals and workouts.
+    """
     data = request.get_json()
     if not data or not data.get("email") or not data.get("password"):
         return jsonify({"error": "Email and password required"}), 400
-    if User.query.filter_by(email=data["email"].strip().lower()).first():
+    email = data["email"].strip().lower()
+    if User.query.filter_by(email=email).first():
         return jsonify({"error": "Email already registered"}), 409
-    user = User(email=data["email"].strip().lower())
+    identity = get_jwt_identity()
+    user = db.session.get(User, identity) if identity is not None else None
+    upgrading = user is not None and user.is_guest
+    if upgrading:
+        note_account_change(db.session, [user.id])
+    else:
+        user = User(email=email)
+        db.session.add(user)
+    user.email = email
+    user.is_guest = False
     user.set_password(data["password"])
-    db.session.add(user)
     db.session.commit()
     access_token = create_access_token(identity=user.id)
     refresh_token = create_refresh_token(identity=user.id)
@@ -47,7 +60,7 @@ def register():
         user=user.to_dict(),
         access_token=access_token,
         refresh_token=refresh_token,
-    ), 201
+    ), 200 if upgrading else 201
 
 
 @auth_bp.route("/login", methods=["POST"])
@@ -58,6 +71,8 @@ def login():
     user = User.query.filter_by(email=data["email"].strip().lower()).first()
     if not user or not user.check_password(data["password"]):
         return jsonify({"error": "Invalid email or password"}), 401
+    if user.deletion_requested_at is not None:
+        return jsonify({"error": "Account is scheduled for deletion"}), 403
     access_token = create_access_token(identity=user.id)
     refresh_token = create_refresh_token(identity=user.id)
     return jsonify(
@@ -70,19 +85,26 @@ def login():
 @auth_bp.route("/refresh", methods=["POST"])
 @jwt_required(refresh=True)
 def refresh():
-    identity = get_jwt_identity()
-    user = User.query.get(identity)
-    if not user:
-        return jsonify({"error": "User not found"}), 404
-    access_token = create_access_token(identity=user.id)
+    # current_user comes from the user cache; missing or deleted accounts got a 401 already
+    access_token = create_access_token(identity=current_user.id)
     return jsonify(access_token=access_token)
 
 
 @auth_bp.route("/me", methods=["GET"])
 @jwt_required()
 def me():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    return jsonify(user=current_user.to_dict())
+
+
+@auth_bp.route("/me", methods=["DELETE"])
+@jwt_required()
+def delete_me():
+    """Schedule the account for deletion; `flask purge run` removes it and all its data."""
+    user = db.session.get(User, get_jwt_identity())
     if not user:
         return jsonify({"error": "User not found"}), 404
-    return jsonify(user=user.to_dict())
+    if user.deletion_requested_at is None:
+        user.deletion_requested_at = datetime.now(timezone.utc)
+        note_account_change(db.session, [user.id])
+        db.session.commit()
+    return jsonify({"message": "Account scheduled for deletion"}), 202
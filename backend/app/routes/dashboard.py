@@ -1,11 +1,19 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timezone, timedelta
+from sqlalchemy import func, literal, null, select, tuple_, union_all
 from app import db
-from app.models import Meal, Workout
+from app.models import DailyTotal, Meal, Workout
+from app.services.cache import response_cache
+from app.services.pagination import decode_cursor, encode_cursor
+from app.services import trends as trends_service
+from app.services.serializers import json_response, meal_rows, workout_rows
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
+_FLOAT_KEYS = ("calories_in", "calories_out", "protein", "carbs", "fats")
+_TOTAL_KEYS = _FLOAT_KEYS + ("meals_count", "workouts_count")
+
 
 def _parse_date(s, default=None):
     if not s:
@@ -16,109 +24,243 @@ def _parse_date(s, default=None):
         return default
 
 
+def _aggregate_columns():
+    return [
+        func.coalesce(func.sum(getattr(DailyTotal, key)), 0).label(key) for key in _TOTAL_KEYS
+    ]
+
+
+def _totals_dict(row):
+    totals = {key: round(float(getattr(row, key)), 1) for key in _FLOAT_KEYS}
+    totals["meals_count"] = int(row.meals_count)
+    totals["workouts_count"] = int(row.workouts_count)
+    return totals
+
+
+def _range_totals(user_id, from_date, to_date):
+    """Totals over [from_date, to_date] from the daily_totals rollup (one row per day)."""
+    row = db.session.execute(
+        select(*_aggregate_columns()).where(
+            DailyTotal.user_id == user_id,
+            DailyTotal.day >= from_date,
+            DailyTotal.day <= to_date,
+        )
+    ).one()
+    return _totals_dict(row)
+
+
+def _daily_series(user_id, from_date, to_date):
+    """Per-day totals for every day in [from_date, to_date], zero-filled."""
+    rows = db.session.execute(
+        select(DailyTotal.day, *[getattr(DailyTotal, key) for key in _TOTAL_KEYS]).where(
+            DailyTotal.user_id == user_id,
+            DailyTotal.day >= from_date,
+            DailyTotal.day <= to_date,
+        )
+    )
+    by_day = {row.day: _totals_dict(row) for row in rows}
+    empty = {key: 0.0 if key in _FLOAT_KEYS else 0 for key in _TOTAL_KEYS}
+    series = []
+    day = from_date
+    while day <= to_date:
+        series.append({"date": day.isoformat(), **by_day.get(day, empty)})
+        day += timedelta(days=1)
+    return series
+
+
+def _sum_series(series):
+    totals = {key: 0 for key in _TOTAL_KEYS}
+    for point in series:
+        for key in _TOTAL_KEYS:
+            totals[key] += point[key]
+    for key in _FLOAT_KEYS:
+        totals[key] = round(totals[key], 1)
+    return totals
+
+
 @dashboard_bp.route("/summary", methods=["GET"])
 @jwt_required()
+@response_cache.cached("summary")
 def summary():
     """
     Daily and optional weekly summary: total calories (meals), total burned (workouts),
     and macro breakdown for the given date or range.
+    Reads the daily_totals rollup; pass granularity=day for a per-day series.
     """
     user_id = get_jwt_identity()
     today = datetime.now(timezone.utc).date()
     date_str = request.args.get("date")
     from_str = request.args.get("from")
     to_str = request.args.get("to")
+    granularity = request.args.get("granularity")
+    if granularity not in (None, "", "day"):
+        return jsonify({"error": "granularity must be 'day'"}), 400
 
     # Single day summary
     if date_str:
         day = _parse_date(date_str, today)
-        start = datetime.combine(day, datetime.min.time()).replace(tzinfo=timezone.utc)
-        end = start + timedelta(days=1)
-        meals = Meal.query.filter(
-            Meal.user_id == user_id,
-            Meal.logged_at >= start,
-            Meal.logged_at < end,
-        ).all()
-        workouts = Workout.query.filter(
-            Workout.user_id == user_id,
-            Workout.logged_at >= start,
-            Workout.logged_at < end,
-        ).all()
-        calories_in = sum(m.calories for m in meals)
-        protein = sum(m.protein for m in meals)
-        carbs = sum(m.carbs for m in meals)
-        fats = sum(m.fats for m in meals)
-        calories_out = sum(w.calories_burned or 0 for w in workouts)
-        return jsonify({
-            "date": day.isoformat(),
-            "calories_in": round(calories_in, 1),
-            "calories_out": round(calories_out, 1),
-            "protein": round(protein, 1),
-            "carbs": round(carbs, 1),
-            "fats": round(fats, 1),
-            "meals_count": len(meals),
-            "workouts_count": len(workouts),
-        })
+        return jsonify({"date": day.isoformat(), **_range_totals(user_id, day, day)})
 
     # Range summary (e.g. last 7 days)
     from_date = _parse_date(from_str, today - timedelta(days=6))
     to_date = _parse_date(to_str, today)
     if from_date > to_date:
         from_date, to_date = to_date, from_date
-    start = datetime.combine(from_date, datetime.min.time()).replace(tzinfo=timezone.utc)
-    end = datetime.combine(to_date, datetime.min.time()).replace(tzinfo=timezone.utc) + timedelta(days=1)
 
-    meals = Meal.query.filter(
-        Meal.user_id == user_id,
-        Meal.logged_at >= start,
-        Meal.logged_at < end,
-    ).all()
-    workouts = Workout.query.filter(
-        Workout.user_id == user_id,
-        Workout.logged_at >= start,
-        Workout.logged_at < end,
-    ).all()
-
-    calories_in = sum(m.calories for m in meals)
-    protein = sum(m.protein for m in meals)
-    carbs = sum(m.carbs for m in meals)
-    fats = sum(m.fats for m in meals)
-    calories_out = sum(w.calories_burned or 0 for w in workouts)
+    if granularity == "day":
+        series = _daily_series(user_id, from_date, to_date)
+        return jsonify({
+            "from": from_date.isoformat(),
+            "to": to_date.isoformat(),
+            **_sum_series(series),
+            "days": series,
+        })
 
     return jsonify({
         "from": from_date.isoformat(),
         "to": to_date.isoformat(),
-        "calories_in": round(calories_in, 1),
-        "calories_out": round(calories_out, 1),
-        "protein": round(protein, 1),
-        "carbs": round(carbs, 1),
-        "fats": round(fats, 1),
-        "meals_count": len(meals),
-        "workouts_count": len(workouts),
+        **_range_totals(user_id, from_date, to_date),
+    })
+
+
+# Longest range /trends accepts (about five years of daily points)
+TRENDS_MAX_DAYS = 5 * 366
+
+
+@dashboard_bp.route("/trends", methods=["GET"])
+@jwt_required()
+@response_cache.cached("trends")
+def trends():
+    """
+    Gap-filled totals per day, week (Monday start) or month for [from, to] (default: last
+    90 days), each with trailing 7- and 30-day daily averages as of the bucket's last day.
+    """
+    user_id = get_jwt_identity()
+    bucket = request.args.get("bucket", "day")
+    if bucket not in trends_service.BUCKETS:
+        return jsonify({"error": "bucket must be day, week or month"}), 400
+    today = datetime.now(timezone.utc).date()
+    to_date = _parse_date(request.args.get("to"), today)
+    from_date = _parse_date(request.args.get("from"), to_date - timedelta(days=89))
+    if from_date > to_date:
+        from_date, to_date = to_date, from_date
+    if (to_date - from_date).days >= TRENDS_MAX_DAYS:
+        return jsonify({"error": f"range is limited to {TRENDS_MAX_DAYS} days"}), 400
+    return json_response({
+        "from": from_date.isoformat(),
+        "to": to_date.isoformat(),
+        "bucket": bucket,
+        "series": trends_service.trends(user_id, from_date, to_date, bucket),
     })
 
 
 @dashboard_bp.route("/history", methods=["GET"])
 @jwt_required()
+@response_cache.cached("history")
 def history():
     """
     Recent activity: last N meals and last N workouts for dashboard widgets.
     """
     user_id = get_jwt_identity()
     limit = min(request.args.get("limit", 10, type=int), 50)
-    meals = (
-        Meal.query.filter_by(user_id=user_id)
-        .order_by(Meal.logged_at.desc())
+    meals = db.session.execute(
+        select(*meal_rows.columns)
+        .where(Meal.user_id == user_id)
+        .order_by(Meal.logged_at.desc(), Meal.id.desc())
         .limit(limit)
-        .all()
     )
-    workouts = (
-        Workout.query.filter_by(user_id=user_id)
-        .order_by(Workout.logged_at.desc())
+    workouts = db.session.execute(
+        select(*workout_rows.columns)
+        .where(Workout.user_id == user_id)
+        .order_by(Workout.logged_at.desc(), Workout.id.desc())
         .limit(limit)
-        .all()
     )
-    return jsonify({
-        "meals": [m.to_dict() for m in meals],
-        "workouts": [w.to_dict() for w in workouts],
+    return json_response({
+        "meals": meal_rows.many(meals),
+        "workouts": workout_rows.many(workouts),
     })
+
+
+# Timeline feed: both tables in one UNION ALL, newest first, ordered by (logged_at, kind, id).
+# At equal timestamps "workout" sorts before "meal" (DESC), which keeps the order total.
+TIMELINE_KINDS = ("meal", "workout")
+
+
+def _timeline_branch(model, kind, columns, user_id, after, limit):
+    """
+    One side of the union: this kind's rows below the cursor, already ordered and limited,
+    so each side is a short range scan on (user_id, logged_at DESC, id DESC).
+    The kind is constant per side, so the (logged_at, kind, id) comparison reduces to
+    a comparison on logged_at alone or on (logged_at, id).
+    """
+    stmt = select(literal(kind).label("kind"), *columns).where(model.user_id == user_id)
+    if after is not None:
+        at, after_kind, after_id = after
+        if kind < after_kind:
+            stmt = stmt.where(model.logged_at <= at)
+        elif kind == after_kind:
+            stmt = stmt.where(tuple_(model.logged_at, model.id) < tuple_(at, after_id))
+        else:
+            stmt = stmt.where(model.logged_at < at)
+    return stmt.order_by(model.logged_at.desc(), model.id.desc()).limit(limit).subquery()
+
+
+def _timeline_item(row):
+    item = {"kind": row.kind, "id": row.id, "logged_at": row.logged_at.isoformat(), "name": row.name}
+    if row.kind == "meal":
+        item.update(calories=row.calories, protein=row.protein, carbs=row.carbs, fats=row.fats,
+                    image_path=row.image_path)
+    else:
+        item.update(calories_burned=row.calories, duration_minutes=row.duration_minutes, notes=row.notes)
+    return item
+
+
+@dashboard_bp.route("/timeline", methods=["GET"])
+@jwt_required()
+@response_cache.cached("timeline")
+def timeline():
+    """
+    Meals and workouts merged newest first, from one UNION ALL query per page.
+    Pass cursor= (or nothing) for the first page, then next_cursor until it is null.
+    """
+    user_id = get_jwt_identity()
+    per_page = max(1, min(request.args.get("per_page", 20, type=int), 100))
+    after = None
+    if request.args.get("cursor"):
+        try:
+            after = decode_cursor(request.args["cursor"])
+        except ValueError:
+            after = None
+        if (
+            after is None
+            or len(after) != 3
+            or not isinstance(after[0], datetime)
+            or after[1] not in TIMELINE_KINDS
+            or not isinstance(after[2], int)
+        ):
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    meals = _timeline_branch(
+        Meal, "meal",
+        [Meal.id, Meal.logged_at, Meal.name, Meal.calories, Meal.protein, Meal.carbs, Meal.fats,
+         Meal.image_path, null().label("duration_minutes"), null().label("notes")],
+        user_id, after, per_page + 1,
+    )
+    workouts = _timeline_branch(
+        Workout, "workout",
+        [Workout.id, Workout.logged_at, Workout.name, Workout.calories_burned.label("calories"),
+         null().label("protein"), null().label("carbs"), null().label("fats"), null().label("image_path"),
+         Workout.duration_minutes, Workout.notes],
+        user_id, after, per_page + 1,
+    )
+    feed = union_all(select(meals), select(workouts)).subquery()
+    rows = db.session.execute(
+        select(feed).order_by(feed.c.logged_at.desc(), feed.c.kind.desc(), feed.c.id.desc()).limit(per_page + 1)
+    ).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.logged_at, last.kind, last.id)
+    return json_response({"items": [_timeline_item(row) for row in rows], "next_cursor": next_cursor})
@@ -0,0 +1,89 @@
+import csv
+import io
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import select
+from app import db
+from app.models import Meal, Workout
+from app.services.serializers import MEAL_FIELDS, WORKOUT_FIELDS, dumps, meal_rows, workout_rows
+
+export_bp = Blueprint("export", __name__)
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_FETCH_SIZE = 1000
+
+CSV_FIELDS = ("kind",) + tuple(dict.fromkeys(MEAL_FIELDS + WORKOUT_FIELDS))
+
+
+def _stream_rows(serializer, model, user_id):
+    """Yield plain dicts for a user's rows in (logged_at, id) order via a server-side cursor."""
+    stmt = (
+        select(*serializer.columns)
+        .where(model.user_id == user_id)
+        .order_by(model.logged_at, model.id)
+        .execution_options(yield_per=EXPORT_FETCH_SIZE)
+    )
+    to_dict = serializer.to_dict
+    for row in db.session.execute(stmt):
+        yield to_dict(row)
+
+
+def _sources(kind, user_id):
+    if kind in ("all", "meals"):
+        yield "meal", _stream_rows(meal_rows, Meal, user_id)
+    if kind in ("all", "workouts"):
+        yield "workout", _stream_rows(workout_rows, Workout, user_id)
+
+
+def _ndjson(kind, user_id):
+    for label, rows in _sources(kind, user_id):
+        for row in rows:
+            row["kind"] = label
+            yield dumps(row) + b"\n"
+
+
+def _csv(kind, user_id):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for label, rows in _sources(kind, user_id):
+        for row in rows:
+            row["kind"] = label
+            writer.writerow(row)
+            if buf.tell() >= 64 * 1024:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+    yield buf.getvalue()
+
+
+@export_bp.route("", methods=["GET"])
+@jwt_required()
+def export():
+    """
+    Stream the user's full history as NDJSON (default) or CSV.
+    Query: format=ndjson|csv, kind=all|meals|workouts.
+    Rows are read through a server-side cursor and written as they arrive,
+    so memory stays constant regardless of history size.
+    """
+    user_id = get_jwt_identity()
+    fmt = request.args.get("format", "ndjson").lower()
+    kind = request.args.get("kind", "all").lower()
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+    if kind not in ("all", "meals", "workouts"):
+        return jsonify({"error": "kind must be all, meals or workouts"}), 400
+
+    if fmt == "csv":
+        body, mimetype = _csv(kind, user_id), "text/csv"
+    else:
+        body, mimetype = _ndjson(kind, user_id), "application/x-ndjson"
+    filename = f"fitness-export-{kind}.{fmt}"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Accel-Buffering": "no",  # let reverse proxies pass chunks through immediately
+        },
+    )
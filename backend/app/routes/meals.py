@@ -1,8 +1,14 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timezone
+import math
+import mimetypes
+import os
 from app import db
 from app.models import Meal
+from app.services import activity, images, ingest, rollups, uploads
+from app.services.pagination import paginate_keyset
+from app.services.serializers import json_response, meal_rows
 
 meals_bp = Blueprint("meals", __name__)
 
@@ -12,10 +18,11 @@ meals_bp = Blueprint("meals", __name__)
 def list_meals():
     user_id = get_jwt_identity()
     page = request.args.get("page", 1, type=int)
-    per_page = min(request.args.get("per_page", 20, type=int), 100)
+    per_page = max(1, min(request.args.get("per_page", 20, type=int), 100))
     from_date = request.args.get("from")  # ISO date
     to_date = request.args.get("to")
-    q = Meal.query.filter_by(user_id=user_id)
+    # Plain column tuples: no ORM instances are built for the page
+    q = Meal.query.with_entities(*meal_rows.columns).filter_by(user_id=user_id)
     if from_date:
         try:
             q = q.filter(Meal.logged_at >= datetime.fromisoformat(from_date.replace("Z", "+00:00")))
@@ -26,14 +33,72 @@ def list_meals():
             q = q.filter(Meal.logged_at <= datetime.fromisoformat(to_date.replace("Z", "+00:00")))
         except ValueError:
             pass
-    q = q.order_by(Meal.logged_at.desc())
-    pagination = q.paginate(page=page, per_page=per_page)
-    return jsonify(
-        meals=[m.to_dict() for m in pagination.items],
-        total=pagination.total,
-        page=page,
-        per_page=per_page,
-    )
+    include_total = request.args.get("include_total", "").lower() in ("1", "true", "yes")
+    total = q.order_by(None).count() if include_total else None
+    if "cursor" in request.args:
+        # Keyset mode: pass cursor= (empty) for the first page, then next_cursor
+        try:
+            items, next_cursor = paginate_keyset(q, Meal, request.args.get("cursor"), per_page)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        return json_response({
+            "meals": meal_rows.many(items),
+            "next_cursor": next_cursor,
+            "total": total,
+            "per_page": per_page,
+        })
+    q = q.order_by(Meal.logged_at.desc(), Meal.id.desc())
+    pagination = q.paginate(page=page, per_page=per_page, count=False)
+    return json_response({
+        "meals": meal_rows.many(pagination.items),
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+    })
+
+
+def parse_logged_at(value):
+    """ISO timestamp from the client, or now (UTC) when missing or unparseable."""
+    if value:
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except (ValueError, AttributeError):
+            pass
+    return datetime.now(timezone.utc)
+
+
+def text_error(data, limits):
+    """Error message if a provided field of `limits` is not a string or is longer than its limit."""
+    for key, limit in limits.items():
+        value = data.get(key)
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            return f"{key} must be a string"
+        if limit and len(value) > limit:
+            return f"{key} must be at most {limit} characters"
+    return None
+
+
+def meal_values(data):
+    """Validate a meal payload; returns (column values, None) or (None, error message)."""
+    if data.get("calories") is None:
+        return None, "calories required"
+    try:
+        values = {key: float(data.get(key, 0)) for key in ("calories", "protein", "carbs", "fats")}
+    except (TypeError, ValueError, OverflowError):
+        return None, "calories, protein, carbs and fats must be numbers"
+    if not all(math.isfinite(value) for value in values.values()):
+        return None, "calories, protein, carbs and fats must be finite numbers"
+    error = text_error(data, {"name": 255, "image_path": 512})
+    if error:
+        return None, error
+    values["name"] = data.get("name")
+    values["image_path"] = data.get("image_path") or None
+    if values["image_path"] is not None and not uploads.is_stored(values["image_path"]):
+        return None, "image_path must be a path returned by /api/analyze"
+    values["logged_at"] = parse_logged_at(data.get("logged_at"))
+    return values, None
 
 
 @meals_bp.route("", methods=["POST"])
@@ -43,29 +108,41 @@ def create_meal():
     data = request.get_json()
     if not data or data.get("calories") is None:
         return jsonify({"error": "calories required"}), 400
-    logged_at = data.get("logged_at")
-    if logged_at:
-        try:
-            logged_at = datetime.fromisoformat(logged_at.replace("Z", "+00:00"))
-        except ValueError:
-            logged_at = datetime.now(timezone.utc)
-    else:
-        logged_at = datetime.now(timezone.utc)
-    meal = Meal(
-        user_id=user_id,
-        calories=float(data.get("calories", 0)),
-        protein=float(data.get("protein", 0)),
-        carbs=float(data.get("carbs", 0)),
-        fats=float(data.get("fats", 0)),
-        name=data.get("name"),
-        image_path=data.get("image_path"),
-        logged_at=logged_at,
-    )
+    values, error = meal_values(data)
+    if error:
+        return jsonify({"error": error}), 400
+    meal = Meal(user_id=user_id, **values)
     db.session.add(meal)
+    rollups.add_meal(meal)
+    uploads.retain(meal.image_path)
     db.session.commit()
     return jsonify(meal.to_dict()), 201
 
 
+@meals_bp.route("/bulk", methods=["POST"])
+@jwt_required()
+def bulk_create_meals():
+    """
+    Import many meals from a JSON array, NDJSON or CSV body (Content-Type or ?format=).
+    The body is streamed and inserted in batches; invalid rows are reported, not fatal.
+    """
+    user_id = get_jwt_identity()
+    try:
+        fmt = ingest.detect_format(request.mimetype, request.args.get("format"))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 415
+    result = ingest.import_records(
+        ingest.iter_records(request.stream, fmt),
+        Meal,
+        user_id,
+        meal_values,
+        rollups.meal_rows_deltas,
+        current_app.config["BULK_IMPORT_BATCH_SIZE"],
+    )
+    status = 400 if result.get("aborted") and not result["inserted"] else 200
+    return jsonify(result), status
+
+
 @meals_bp.route("/<int:meal_id>", methods=["GET"])
 @jwt_required()
 def get_meal(meal_id):
@@ -76,43 +153,98 @@ def get_meal(meal_id):
     return jsonify(meal.to_dict())
 
 
+@meals_bp.route("/<int:meal_id>/image", methods=["GET"])
+@jwt_required()
+def get_meal_image(meal_id):
+    """
+    The meal's photo: ?size=thumb|medium (resized WebP, or JPEG if the client does not
+    accept WebP; ?format=webp|jpeg overrides) or size=full (the stored file).
+    Supports If-None-Match/If-Modified-Since and Range.
+    """
+    user_id = get_jwt_identity()
+    size = request.args.get("size", "medium")
+    if size not in images.SIZES:
+        return jsonify({"error": f"size must be one of: {', '.join(images.SIZES)}"}), 400
+    fmt = request.args.get("format") or ("webp" if "image/webp" in request.headers.get("Accept", "") else "jpeg")
+    if fmt not in images.FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(images.FORMATS)}"}), 400
+    found = db.session.execute(
+        db.select(Meal.image_path).where(Meal.id == meal_id, Meal.user_id == user_id)
+    ).first()
+    if found is None:
+        return jsonify({"error": "Meal not found"}), 404
+    image_path = found[0]
+    if not image_path:
+        return jsonify({"error": "Meal has no image"}), 404
+    try:
+        path = images.get(image_path, size, fmt)
+    except images.ImageProcessingError as exc:
+        return jsonify({"error": str(exc)}), 422
+    if path is None:
+        return jsonify({"error": "Image file not found"}), 404
+    if size == "full":
+        fmt = os.path.splitext(image_path)[1].lstrip(".").lower()
+        mimetype = mimetypes.guess_type(image_path)[0] or "application/octet-stream"
+    else:
+        mimetype = images.FORMATS[fmt][1]
+    # The original's mtime: variants are re-rendered or touched without their content changing
+    try:
+        last_modified = os.path.getmtime(uploads.resolve_path(image_path))
+        return images.send(path, mimetype, images.etag(image_path, size, fmt), last_modified)
+    except FileNotFoundError:  # variant trimmed (or original collected) since images.get()
+        return jsonify({"error": "Image file not found"}), 404
+
+
 @meals_bp.route("/<int:meal_id>", methods=["PUT", "PATCH"])
 @jwt_required()
 def update_meal(meal_id):
     user_id = get_jwt_identity()
-    meal = Meal.query.filter_by(id=meal_id, user_id=user_id).first()
-    if not meal:
+    changes = activity.parse_changes(activity.MEALS, request.get_json() or {})
+    rows = activity.update_rows(activity.MEALS, user_id, [meal_id], changes)
+    if not rows:
         return jsonify({"error": "Meal not found"}), 404
-    data = request.get_json() or {}
-    numeric_float_keys = ("calories", "protein", "carbs", "fats")
-    for key in ("calories", "protein", "carbs", "fats", "name", "image_path", "logged_at"):
-        if key not in data:
-            continue
-        if key == "logged_at":
-            if data[key]:
-                try:
-                    meal.logged_at = datetime.fromisoformat(data[key].replace("Z", "+00:00"))
-                except (ValueError, TypeError):
-                    pass
-            continue
-        if key in numeric_float_keys:
-            try:
-                setattr(meal, key, float(data[key]))
-            except (TypeError, ValueError):
-                pass
-            continue
-        setattr(meal, key, data[key])
     db.session.commit()
-    return jsonify(meal.to_dict())
+    return jsonify(rows[0])
+
+
+@meals_bp.route("", methods=["PATCH"])
+@jwt_required()
+def bulk_update_meals():
+    """Apply {"changes": {...}} to every meal in {"ids": [...]} with one UPDATE."""
+    user_id = get_jwt_identity()
+    try:
+        ids, payload = activity.parse_bulk_update(request.get_json() or {}, current_app.config["BULK_UPDATE_MAX_IDS"])
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    rows = activity.update_rows(activity.MEALS, user_id, ids, activity.parse_changes(activity.MEALS, payload))
+    db.session.commit()
+    found = {row["id"] for row in rows}
+    return json_response({
+        "updated": len(rows),
+        "meals": rows,
+        "not_found": [meal_id for meal_id in ids if meal_id not in found],
+    })
 
 
 @meals_bp.route("/<int:meal_id>", methods=["DELETE"])
 @jwt_required()
 def delete_meal(meal_id):
     user_id = get_jwt_identity()
-    meal = Meal.query.filter_by(id=meal_id, user_id=user_id).first()
-    if not meal:
+    if not activity.delete_rows(activity.MEALS, user_id, Meal.id == meal_id):
         return jsonify({"error": "Meal not found"}), 404
-    db.session.delete(meal)
     db.session.commit()
     return "", 204
+
+
+@meals_bp.route("", methods=["DELETE"])
+@jwt_required()
+def delete_meals_range():
+    """Delete every meal logged in [from, to] with one DELETE."""
+    user_id = get_jwt_identity()
+    try:
+        start, end = activity.parse_range(request.args)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    deleted = activity.delete_rows(activity.MEALS, user_id, Meal.logged_at >= start, Meal.logged_at <= end)
+    db.session.commit()
+    return jsonify({"deleted": deleted})
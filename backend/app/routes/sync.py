@@ -0,0 +1,28 @@
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.services import sync
+from app.services.serializers import json_response
+
+sync_bp = Blueprint("sync", __name__)
+
+
+@sync_bp.route("", methods=["GET"])
+@jwt_required()
+def changes():
+    """
+    Meals and workouts created or changed, and ids deleted, since a sync token.
+    Query: since=<next from the previous response> (omit for a full sync), limit.
+    Keep requesting with the returned next while has_more is true; store the last
+    next for the following sync. An expired token answers 410: sync again without since.
+    """
+    user_id = get_jwt_identity()
+    limit = min(request.args.get("limit", current_app.config["SYNC_PAGE_SIZE"], type=int), 1000)
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
+    try:
+        after = sync.parse_token(request.args.get("since"), current_app.config["SYNC_TOMBSTONE_RETENTION_DAYS"])
+    except sync.TokenExpired as exc:
+        return jsonify({"error": str(exc)}), 410
+    except ValueError:
+        return jsonify({"error": "Invalid sync token"}), 400
+    return json_response(sync.changes(user_id, after, limit, current_app.config["SYNC_SETTLE_SECONDS"]))
@@ -1,8 +1,13 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime, timezone
+from datetime import datetime
+import math
 from app import db
 from app.models import Workout
+from app.routes.meals import parse_logged_at, text_error
+from app.services import activity, ingest, rollups
+from app.services.pagination import paginate_keyset
+from app.services.serializers import json_response, workout_rows
 
 workouts_bp = Blueprint("workouts", __name__)
 
@@ -12,10 +17,11 @@ workouts_bp = Blueprint("workouts", __name__)
 def list_workouts():
     user_id = get_jwt_identity()
     page = request.args.get("page", 1, type=int)
-    per_page = min(request.args.get("per_page", 20, type=int), 100)
+    per_page = max(1, min(request.args.get("per_page", 20, type=int), 100))
     from_date = request.args.get("from")
     to_date = request.args.get("to")
-    q = Workout.query.filter_by(user_id=user_id)
+    # Plain column tuples: no ORM instances are built for the page
+    q = Workout.query.with_entities(*workout_rows.columns).filter_by(user_id=user_id)
     if from_date:
         try:
             q = q.filter(Workout.logged_at >= datetime.fromisoformat(from_date.replace("Z", "+00:00")))
@@ -26,14 +32,57 @@ def list_workouts():
             q = q.filter(Workout.logged_at <= datetime.fromisoformat(to_date.replace("Z", "+00:00")))
         except ValueError:
             pass
-    q = q.order_by(Workout.logged_at.desc())
-    pagination = q.paginate(page=page, per_page=per_page)
-    return jsonify(
-        workouts=[w.to_dict() for w in pagination.items],
-        total=pagination.total,
-        page=page,
-        per_page=per_page,
-    )
+    include_total = request.args.get("include_total", "").lower() in ("1", "true", "yes")
+    total = q.order_by(None).count() if include_total else None
+    if "cursor" in request.args:
+        # Keyset mode: pass cursor= (empty) for the first page, then next_cursor
+        try:
+            items, next_cursor = paginate_keyset(q, Workout, request.args.get("cursor"), per_page)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        return json_response({
+            "workouts": workout_rows.many(items),
+            "next_cursor": next_cursor,
+            "total": total,
+            "per_page": per_page,
+        })
+    q = q.order_by(Workout.logged_at.desc(), Workout.id.desc())
+    pagination = q.paginate(page=page, per_page=per_page, count=False)
+    return json_response({
+        "workouts": workout_rows.many(pagination.items),
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+    })
+
+
+def workout_values(data):
+    """Validate a workout payload; returns (column values, None) or (None, error message)."""
+    if not data.get("name") or data.get("duration_minutes") is None:
+        return None, "name and duration_minutes required"
+    error = text_error(data, {"name": 255, "notes": None})
+    if error:
+        return None, error
+    try:
+        duration = activity.parse_integer(data["duration_minutes"])
+    except activity.RejectedValue as exc:
+        return None, f"duration_minutes {exc}"
+    except (TypeError, ValueError):
+        return None, "duration_minutes and calories_burned must be numbers"
+    try:
+        calories_burned = data.get("calories_burned")
+        calories_burned = float(calories_burned) if calories_burned is not None else None
+    except (TypeError, ValueError, OverflowError):
+        return None, "duration_minutes and calories_burned must be numbers"
+    if calories_burned is not None and not math.isfinite(calories_burned):
+        return None, "calories_burned must be a finite number"
+    return {
+        "name": data["name"].strip(),
+        "duration_minutes": duration,
+        "calories_burned": calories_burned,
+        "notes": data.get("notes"),
+        "logged_at": parse_logged_at(data.get("logged_at")),
+    }, None
 
 
 @workouts_bp.route("", methods=["POST"])
@@ -41,29 +90,42 @@ def list_workouts():
 def create_workout():
     user_id = get_jwt_identity()
     data = request.get_json()
-    if not data or not data.get("name") or data.get("duration_minutes") is None:
+    if not data:
         return jsonify({"error": "name and duration_minutes required"}), 400
-    logged_at = data.get("logged_at")
-    if logged_at:
-        try:
-            logged_at = datetime.fromisoformat(logged_at.replace("Z", "+00:00"))
-        except ValueError:
-            logged_at = datetime.now(timezone.utc)
-    else:
-        logged_at = datetime.now(timezone.utc)
-    workout = Workout(
-        user_id=user_id,
-        name=data["name"].strip(),
-        duration_minutes=int(data["duration_minutes"]),
-        calories_burned=data.get("calories_burned"),
-        notes=data.get("notes"),
-        logged_at=logged_at,
-    )
+    values, error = workout_values(data)
+    if error:
+        return jsonify({"error": error}), 400
+    workout = Workout(user_id=user_id, **values)
     db.session.add(workout)
+    rollups.add_workout(workout)
     db.session.commit()
     return jsonify(workout.to_dict()), 201
 
 
+@workouts_bp.route("/bulk", methods=["POST"])
+@jwt_required()
+def bulk_create_workouts():
+    """
+    Import many workouts from a JSON array, NDJSON or CSV body (Content-Type or ?format=).
+    The body is streamed and inserted in batches; invalid rows are reported, not fatal.
+    """
+    user_id = get_jwt_identity()
+    try:
+        fmt = ingest.detect_format(request.mimetype, request.args.get("format"))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 415
+    result = ingest.import_records(
+        ingest.iter_records(request.stream, fmt),
+        Workout,
+        user_id,
+        workout_values,
+        rollups.workout_rows_deltas,
+        current_app.config["BULK_IMPORT_BATCH_SIZE"],
+    )
+    status = 400 if result.get("aborted") and not result["inserted"] else 200
+    return jsonify(result), status
+
+
 @workouts_bp.route("/<int:workout_id>", methods=["GET"])
 @jwt_required()
 def get_workout(workout_id):
@@ -78,45 +140,56 @@ def get_workout(workout_id):
 @jwt_required()
 def update_workout(workout_id):
     user_id = get_jwt_identity()
-    workout = Workout.query.filter_by(id=workout_id, user_id=user_id).first()
-    if not workout:
+    try:
+        changes = activity.parse_changes(activity.WORKOUTS, request.get_json() or {})
+    except activity.RejectedValue as exc:
+        return jsonify({"error": str(exc)}), 400
+    rows = activity.update_rows(activity.WORKOUTS, user_id, [workout_id], changes)
+    if not rows:
         return jsonify({"error": "Workout not found"}), 404
-    data = request.get_json() or {}
-    for key in ("name", "duration_minutes", "calories_burned", "notes", "logged_at"):
-        if key not in data:
-            continue
-        if key == "logged_at":
-            if data[key]:
-                try:
-                    workout.logged_at = datetime.fromisoformat(data[key].replace("Z", "+00:00"))
-                except (ValueError, TypeError):
-                    pass
-            continue
-        if key == "duration_minutes":
-            try:
-                workout.duration_minutes = int(data[key])
-            except (TypeError, ValueError):
-                pass
-            continue
-        if key == "calories_burned":
-            try:
-                val = data[key]
-                workout.calories_burned = float(val) if val is not None else None
-            except (TypeError, ValueError):
-                pass
-            continue
-        setattr(workout, key, data[key])
     db.session.commit()
-    return jsonify(workout.to_dict())
+    return jsonify(rows[0])
+
+
+@workouts_bp.route("", methods=["PATCH"])
+@jwt_required()
+def bulk_update_workouts():
+    """Apply {"changes": {...}} to every workout in {"ids": [...]} with one UPDATE."""
+    user_id = get_jwt_identity()
+    try:
+        ids, payload = activity.parse_bulk_update(request.get_json() or {}, current_app.config["BULK_UPDATE_MAX_IDS"])
+        changes = activity.parse_changes(activity.WORKOUTS, payload)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    rows = activity.update_rows(activity.WORKOUTS, user_id, ids, changes)
+    db.session.commit()
+    found = {row["id"] for row in rows}
+    return json_response({
+        "updated": len(rows),
+        "workouts": rows,
+        "not_found": [workout_id for workout_id in ids if workout_id not in found],
+    })
 
 
 @workouts_bp.route("/<int:workout_id>", methods=["DELETE"])
 @jwt_required()
 def delete_workout(workout_id):
     user_id = get_jwt_identity()
-    workout = Workout.query.filter_by(id=workout_id, user_id=user_id).first()
-    if not workout:
+    if not activity.delete_rows(activity.WORKOUTS, user_id, Workout.id == workout_id):
         return jsonify({"error": "Workout not found"}), 404
-    db.session.delete(workout)
     db.session.commit()
     return "", 204
+
+
+@workouts_bp.route("", methods=["DELETE"])
+@jwt_required()
+def delete_workouts_range():
+    """Delete every workout logged in [from, to] with one DELETE."""
+    user_id = get_jwt_identity()
+    try:
+        start, end = activity.parse_range(request.args)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    deleted = activity.delete_rows(activity.WORKOUTS, user_id, Workout.logged_at >= start, Workout.logged_at <= end)
+    db.session.commit()
+    return jsonify({"deleted": deleted})
@@ -0,0 +1,239 @@
+"""
+Set-based updates and deletes for meals and workouts.
+
+Every write is one UPDATE ... RETURNING or DELETE ... RETURNING scoped by
+user_id, whether it touches one row or thousands; the returned values feed the
+daily_totals deltas and upload refcounts, so no ORM objects are loaded or
+refreshed. Deletes also leave tombstones for delta sync (see services/sync.py).
+On PostgreSQL the UPDATE joins the table to itself
+(UPDATE meals ... FROM (SELECT ... FOR UPDATE) AS old) so RETURNING carries
+the pre-update values as well; the row locks make a concurrent update of the
+same rows wait and then read the values it left behind. SQLite cannot return columns of a FROM table, so there the old values
+are read with one SELECT first.
+"""
+import math
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import delete, select, update
+
+from app import db
+from app.models import Meal, Workout
+from app.services import rollups, sync, uploads
+from app.services.serializers import RowSerializer, meal_rows, workout_rows
+
+
+# Bounds of a 32-bit INTEGER column
+INT_MIN, INT_MAX = -2**31, 2**31 - 1
+
+
+class RejectedValue(ValueError):
+    """A number that cannot be stored as given; update routes answer 400 instead of skipping the field."""
+
+
+def parse_integer(value):
+    """An int that fits an INTEGER column; bools, fractions and out-of-range values raise RejectedValue."""
+    if isinstance(value, bool):
+        raise RejectedValue("must be an integer")
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise RejectedValue("must be an integer")
+        value = int(value)
+    else:
+        value = int(value)
+    if not INT_MIN <= value <= INT_MAX:
+        raise RejectedValue(f"must be between {INT_MIN} and {INT_MAX}")
+    return value
+
+
+def _float(value):
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError("not a finite number")
+    return value
+
+
+def _optional_float(value):
+    return _float(value) if value is not None else None
+
+
+def _text(max_length=None, required=False):
+    def parse(value):
+        if value is None and not required:
+            return None
+        if not isinstance(value, str) or (max_length and len(value) > max_length) or (required and not value):
+            raise ValueError("not a valid string")
+        return value
+    return parse
+
+
+def _logged_at(value):
+    if not value:
+        raise ValueError("empty timestamp")
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _image_path(value):
+    """Only paths handed out by uploads.store() (or None to clear the image)."""
+    if not value:
+        return None
+    if not uploads.is_stored(value):
+        raise ValueError("unknown image_path")
+    return value
+
+
+@dataclass(frozen=True)
+class ActivityKind:
+    name: str  # Tombstone.kind
+    model: type
+    serializer: RowSerializer
+    parsers: dict  # updatable field -> parser (TypeError/ValueError skips the field, RejectedValue fails the update)
+    delta_fields: tuple  # columns the rollup deltas need
+    deltas: callable
+    has_images: bool
+
+
+MEALS = ActivityKind(
+    name="meal",
+    model=Meal,
+    serializer=meal_rows,
+    parsers={
+        "calories": _float, "protein": _float, "carbs": _float, "fats": _float,
+        "name": _text(255), "image_path": _image_path, "logged_at": _logged_at,
+    },
+    delta_fields=("user_id", "logged_at", "calories", "protein", "carbs", "fats", "image_path"),
+    deltas=rollups.meal_rows_deltas,
+    has_images=True,
+)
+
+WORKOUTS = ActivityKind(
+    name="workout",
+    model=Workout,
+    serializer=workout_rows,
+    parsers={
+        "name": _text(255, required=True), "duration_minutes": parse_integer, "calories_burned": _optional_float,
+        "notes": _text(), "logged_at": _logged_at,
+    },
+    delta_fields=("user_id", "logged_at", "calories_burned"),
+    deltas=rollups.workout_rows_deltas,
+    has_images=False,
+)
+
+
+def parse_changes(kind, data):
+    """
+    Column changes from an update payload; unknown keys and unparseable values are ignored.
+    Raises RejectedValue for a value that parses but cannot be stored (e.g. an out-of-range integer).
+    """
+    changes = {}
+    for key, parse in kind.parsers.items():
+        if key not in data:
+            continue
+        try:
+            changes[key] = parse(data[key])
+        except RejectedValue as exc:
+            raise RejectedValue(f"{key} {exc}") from None
+        except (TypeError, ValueError, AttributeError, OverflowError):
+            pass
+    return changes
+
+
+def parse_bulk_update(data, max_ids):
+    """(ids, changes payload) from a bulk PATCH body {"ids": [...], "changes": {...}}; raises ValueError."""
+    ids, changes = data.get("ids"), data.get("changes")
+    if not isinstance(ids, list) or not ids:
+        raise ValueError("ids must be a non-empty list")
+    if len(ids) > max_ids:
+        raise ValueError(f"at most {max_ids} ids per request")
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise ValueError("ids must be integers")
+    if not isinstance(changes, dict):
+        raise ValueError("changes must be an object")
+    return list(dict.fromkeys(ids)), changes
+
+
+def parse_range(args):
+    """(start, end) datetimes from required ?from=&to= ISO timestamps; raises ValueError."""
+    if not args.get("from") or not args.get("to"):
+        raise ValueError("from and to are required")
+    try:
+        start, end = (datetime.fromisoformat(args[key].replace("Z", "+00:00")) for key in ("from", "to"))
+        reversed_range = start > end
+    except (TypeError, ValueError):
+        raise ValueError("from and to must be ISO timestamps (both with or both without an offset)") from None
+    if reversed_range:
+        raise ValueError("from must not be after to")
+    return start, end
+
+
+def _apply_side_effects(kind, removed, added):
+    """Rollup deltas and image refcounts for rows removed (old values) and added (new values)."""
+    rollups.apply_deltas(rollups.merge_deltas(kind.deltas(removed, sign=-1), kind.deltas(added)))
+    if kind.has_images:
+        refs = Counter(row["image_path"] for row in added if row["image_path"])
+        refs.subtract(row["image_path"] for row in removed if row["image_path"])
+        for image_path, count in refs.items():
+            if count > 0:
+                uploads.retain(image_path, count)
+            elif count < 0:
+                uploads.release(image_path, -count)
+
+
+def update_rows(kind, user_id, ids, changes):
+    """
+    Apply the same changes to the user's rows with these ids in one UPDATE ... RETURNING.
+    Returns the updated rows serialized like to_dict(); ids the user does not own are skipped.
+    Does not commit.
+    """
+    table = kind.model.__table__
+    ids = list(ids)
+    if not changes:
+        rows = db.session.execute(
+            select(*kind.serializer.columns).where(table.c.user_id == user_id, table.c.id.in_(ids))
+        ).all()
+        return kind.serializer.many(rows)
+
+    fields = kind.serializer.fields
+    stmt = update(table).where(table.c.user_id == user_id, table.c.id.in_(ids)).values(changes)
+    if db.engine.dialect.name == "postgresql":
+        old = (
+            select(table.c.id, *[table.c[f] for f in kind.delta_fields])
+            .where(table.c.user_id == user_id, table.c.id.in_(ids))
+            .with_for_update()
+            .subquery("old")
+        )
+        stmt = stmt.where(old.c.id == table.c.id).returning(
+            *[old.c[f].label(f"old_{f}") for f in kind.delta_fields], *kind.serializer.columns
+        )
+        rows = db.session.execute(stmt).all()
+        split = len(kind.delta_fields)
+        removed = [dict(zip(kind.delta_fields, row[:split])) for row in rows]
+        new_rows = [tuple(row[split:]) for row in rows]
+    else:
+        before = db.session.execute(
+            select(*[table.c[f] for f in kind.delta_fields])
+            .where(table.c.user_id == user_id, table.c.id.in_(ids))
+            .with_for_update()  # no-op on SQLite, where the write lock serializes updates anyway
+        ).all()
+        removed = [dict(zip(kind.delta_fields, row)) for row in before]
+        new_rows = db.session.execute(stmt.returning(*kind.serializer.columns)).all()
+    added = [dict(zip(fields, row)) for row in new_rows]
+    _apply_side_effects(kind, removed, added)
+    return kind.serializer.many(new_rows)
+
+
+def delete_rows(kind, user_id, *criteria):
+    """
+    Delete the user's rows matching criteria in one DELETE ... RETURNING and tombstone them.
+    Returns the count; does not commit.
+    """
+    table = kind.model.__table__
+    rows = db.session.execute(
+        delete(table)
+        .where(table.c.user_id == user_id, *criteria)
+        .returning(table.c.id, *[table.c[f] for f in kind.delta_fields])
+    ).all()
+    _apply_side_effects(kind, [dict(zip(kind.delta_fields, row[1:])) for row in rows], [])
+    sync.record_deletions(kind.name, user_id, [row[0] for row in rows])
+    return len(rows)
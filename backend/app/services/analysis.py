@@ -0,0 +1,338 @@
+"""
+Image analysis entry points.
+
+analyze_image() is a plain function of a file path so it can run in the request
+thread or in a worker process (see app/services/jobs.py).
+
+Recognition runs through an AnalyzerBackend chosen by ANALYZER_BACKEND:
+
+- "stub" (default) returns fixed macros, as before.
+- "cpu" is the reference NumPy implementation: Pillow decode, resize and
+  normalize, then a small dense network over the whole batch in one matrix
+  product. Weights come from ANALYZER_MODEL_PATH (.npz with w1, b1, w2, b2);
+  without one it runs with fixed random weights, which exercises the full
+  pipeline but does not recognize anything.
+
+The backend is loaded once per process and warmed up with a full-size batch, so
+the first request does not pay for allocation and BLAS thread start-up. Under
+gunicorn the model is loaded in the master (preload_app, weights shared
+copy-on-write) and each worker runs its own warmup pass after the fork.
+
+Decode and preprocess run in the request thread. The infer stage goes through a
+MicroBatcher: one thread per process takes queued inputs and runs them as a
+single batch of up to ANALYZER_MAX_BATCH. It waits up to ANALYZER_MAX_WAIT_MS
+for more inputs, but only while other requests are still decoding, so a lone
+request is dispatched at once. Under load, batches fill up and throughput
+scales with the batch size rather than with one forward pass per request.
+
+Each analysis reports per-stage wall times (decode, preprocess, queue, infer)
+and the batch it ran in. The same numbers feed fitness_analyzer_* in /metrics,
+and /health/analyzer shows the backend state.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from app.services.metrics import metrics
+
+STAGES = ("decode", "preprocess", "queue", "infer")
+
+
+class AnalyzerBackend:
+    """Decode/preprocess one image, infer a stacked batch. Subclasses set `name`."""
+
+    name = None
+    batched = True  # False: infer runs inline in the request thread
+
+    def load(self):
+        pass
+
+    def decode(self, path):
+        raise NotImplementedError
+
+    def preprocess(self, image):
+        raise NotImplementedError
+
+    def infer(self, batch):
+        """Results (dicts with calories, protein, carbs, fats) for an (n, ...) input array."""
+        raise NotImplementedError
+
+    def warmup_input(self):
+        raise NotImplementedError
+
+
+class StubBackend(AnalyzerBackend):
+    name = "stub"
+    batched = False
+
+    def decode(self, path):
+        return None
+
+    def preprocess(self, image):
+        return np.zeros(1, dtype=np.float32)
+
+    def infer(self, batch):
+        return [
+            {
+                "calories": 450,
+                "protein": 28,
+                "carbs": 42,
+                "fats": 18,
+                "stub": True,
+                "message": "Stub analysis; set ANALYZER_BACKEND for real recognition.",
+            }
+            for _ in range(len(batch))
+        ]
+
+    def warmup_input(self):
+        return np.zeros(1, dtype=np.float32)
+
+
+class CpuReferenceBackend(AnalyzerBackend):
+    """Dense two-layer network on a downscaled RGB image, in NumPy (float32)."""
+
+    name = "cpu"
+    input_size = 64
+    hidden = 128
+    # Output scale per target, so softplus activations land in realistic ranges
+    scale = np.array([600.0, 40.0, 70.0, 25.0], dtype=np.float32)
+    mean = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+    std = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+    def __init__(self, model_path=None):
+        self.model_path = model_path
+        self.weights = None
+
+    def load(self):
+        if self.model_path:
+            with np.load(self.model_path) as data:
+                self.weights = tuple(np.ascontiguousarray(data[key], dtype=np.float32) for key in ("w1", "b1", "w2", "b2"))
+        else:
+            rng = np.random.default_rng(0)
+            features = self.input_size * self.input_size * 3
+            self.weights = (
+                rng.standard_normal((features, self.hidden), dtype=np.float32) / np.sqrt(features),
+                np.zeros(self.hidden, dtype=np.float32),
+                rng.standard_normal((self.hidden, len(self.scale)), dtype=np.float32) / np.sqrt(self.hidden),
+                np.zeros(len(self.scale), dtype=np.float32),
+            )
+
+    def decode(self, path):
+        from PIL import Image
+
+        with Image.open(path) as image:
+            # JPEG: let the decoder downscale by 1/2..1/8 instead of decoding full size
+            image.draft("RGB", (self.input_size * 2, self.input_size * 2))
+            return image.convert("RGB")
+
+    def preprocess(self, image):
+        from PIL import Image
+
+        resized = image.resize((self.input_size, self.input_size), Image.Resampling.BILINEAR)
+        array = np.asarray(resized, dtype=np.float32) / 255.0
+        return (array - self.mean) / self.std
+
+    def infer(self, batch):
+        w1, b1, w2, b2 = self.weights
+        x = batch.reshape(len(batch), -1)
+        hidden = np.maximum(x @ w1 + b1, 0)
+        out = np.logaddexp(0, hidden @ w2 + b2) * self.scale  # softplus: non-negative macros
+        return [
+            {
+                "calories": round(float(row[0])),
+                "protein": round(float(row[1]), 1),
+                "carbs": round(float(row[2]), 1),
+                "fats": round(float(row[3]), 1),
+                "stub": self.model_path is None,
+                "model": self.name,
+            }
+            for row in out
+        ]
+
+    def warmup_input(self):
+        return np.zeros((self.input_size, self.input_size, 3), dtype=np.float32)
+
+
+BACKENDS = {"stub": StubBackend, "cpu": CpuReferenceBackend}
+
+
+class _Pending:
+    __slots__ = ("item", "future", "enqueued")
+
+    def __init__(self, item):
+        self.item = item
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent infer() calls into batches on one background thread.
+    `preparing` is a callable returning how many callers are still about to submit;
+    the batcher only waits (up to max_wait) for more inputs while it is non-zero.
+    """
+
+    def __init__(self, infer, max_batch, max_wait, preparing=lambda: 0):
+        self.infer = infer
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.preparing = preparing
+        self.batches = 0
+        self.items = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+
+    def submit(self, item):
+        """Queue one input; the Future resolves to (result, queue seconds, infer seconds, batch size)."""
+        if self._pid != os.getpid():
+            self._start()
+        pending = _Pending(item)
+        self._queue.put(pending)
+        return pending.future
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Threads do not survive fork: each process starts its own
+            self._queue = queue.SimpleQueue()
+            thread = threading.Thread(target=self._run, args=(self._queue,), name="analyzer-batcher", daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+
+    def _collect(self, work):
+        batch = [work.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(work.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or not self.preparing():
+                break
+            try:
+                batch.append(work.get(timeout=min(remaining, 0.001)))
+            except queue.Empty:
+                pass
+        return batch
+
+    def _run(self, work):
+        while True:
+            batch = self._collect(work)
+            started = time.perf_counter()
+            try:
+                results = self.infer(np.stack([pending.item for pending in batch]))
+            except Exception as exc:  # fail this batch's callers, keep the thread alive
+                for pending in batch:
+                    pending.future.set_exception(exc)
+                continue
+            infer_seconds = time.perf_counter() - started
+            self.batches += 1
+            self.items += len(batch)
+            for pending, result in zip(batch, results):
+                pending.future.set_result((result, started - pending.enqueued, infer_seconds, len(batch)))
+
+
+class Analyzer:
+    def __init__(self):
+        self.backend = StubBackend()
+        self.max_batch = 8
+        self.max_wait = 0.01
+        self.loaded = False
+        self.warmup_ms = None
+        self._load_lock = threading.Lock()
+        self._preparing = 0
+        self._preparing_lock = threading.Lock()
+        self.batcher = None
+        self._configure()
+
+    def init_app(self, app):
+        name = app.config.get("ANALYZER_BACKEND", "stub")
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown ANALYZER_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
+        backend = BACKENDS[name]
+        self.backend = backend(app.config.get("ANALYZER_MODEL_PATH")) if backend is CpuReferenceBackend else backend()
+        self.max_batch = app.config.get("ANALYZER_MAX_BATCH", 8)
+        self.max_wait = app.config.get("ANALYZER_MAX_WAIT_MS", 10) / 1000.0
+        self.loaded = False
+        self.warmup_ms = None
+        self._configure()
+        app.extensions["analyzer"] = self
+        if app.config.get("ANALYZER_PRELOAD", True):
+            self.load()
+
+    def _configure(self):
+        self.batcher = MicroBatcher(self.backend.infer, self.max_batch, self.max_wait, lambda: self._preparing)
+
+    def load(self):
+        """Load the backend (once) and run a warmup pass."""
+        with self._load_lock:
+            if not self.loaded:
+                self.backend.load()
+                self.loaded = True
+        self.warmup()
+
+    def warmup(self):
+        """Run one full-size batch so buffers and BLAS threads exist before the first request."""
+        started = time.perf_counter()
+        self.backend.infer(np.stack([self.backend.warmup_input()] * self.max_batch))
+        self.warmup_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def analyze(self, path):
+        """Returns (result, timings) where timings maps STAGES to milliseconds plus batch_size."""
+        if not self.loaded:
+            self.load()
+        with self._preparing_lock:
+            self._preparing += 1
+        try:
+            started = time.perf_counter()
+            image = self.backend.decode(path)
+            decoded = time.perf_counter()
+            item = self.backend.preprocess(image)
+            prepared = time.perf_counter()
+        finally:
+            with self._preparing_lock:
+                self._preparing -= 1
+        if self.backend.batched:
+            result, queue_seconds, infer_seconds, batch_size = self.batcher.submit(item).result()
+        else:
+            result = self.backend.infer(item[np.newaxis])[0]
+            queue_seconds, infer_seconds, batch_size = 0.0, time.perf_counter() - prepared, 1
+        seconds = {
+            "decode": decoded - started,
+            "preprocess": prepared - decoded,
+            "queue": queue_seconds,
+            "infer": infer_seconds,
+        }
+        metrics.observe_analysis(seconds, batch_size)
+        timings = {stage: round(value * 1000, 3) for stage, value in seconds.items()}
+        timings["batch_size"] = batch_size
+        return result, timings
+
+    def stats(self):
+        batches = self.batcher.batches
+        return {
+            "backend": self.backend.name,
+            "loaded": self.loaded,
+            "warmup_ms": self.warmup_ms,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": batches,
+            "images": self.batcher.items,
+            "mean_batch_size": round(self.batcher.items / batches, 2) if batches else None,
+        }
+
+
+analyzer = Analyzer()
+
+
+def analyze_image(path):
+    """Estimate macros for the meal photo at `path` with the configured backend."""
+    return analyzer.analyze(path)[0]
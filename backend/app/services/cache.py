@@ -0,0 +1,225 @@
+"""
+Caching primitives and the per-user response cache for dashboard endpoints.
+
+LRUCache is a thread-safe in-process LRU with per-entry TTL and hit/miss
+counters; it is reused wherever a worker-local cache is needed.
+
+ResponseCache stores whole JSON responses keyed by user, endpoint and query
+string. Each user has a generation number that is part of the key; any commit
+that changes the user's meals or workouts bumps it (see note_user_write()), so
+stale entries are never served and simply age out. Backends:
+
+- "local" (default): an LRUCache in this process. With several worker processes
+  a write only invalidates the worker that handled it; others may serve data up
+  to CACHE_DEFAULT_TTL seconds old.
+- "redis": shared by all workers (needs the `redis` package and CACHE_REDIS_URL).
+- "null": caching disabled.
+"""
+import functools
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import Response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded mapping with least-recently-used eviction and optional TTL (seconds)."""
+
+    def __init__(self, max_entries=10000, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=_MISSING):
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class LocalBackend:
+    """Worker-local backend; also the stand-in for the shared backend in dev and tests."""
+
+    def __init__(self, max_entries, ttl):
+        self.entries = LRUCache(max_entries, ttl)
+        # Generations are drawn from one process-wide counter, so a generation that
+        # was evicted and re-created can never match an older cached entry.
+        self._generations = LRUCache(max_entries)
+        self._counter = itertools.count(1)
+
+    def generation(self, user_id):
+        gen = self._generations.get(user_id)
+        if gen is None:
+            gen = next(self._counter)
+            self._generations.set(user_id, gen)
+        return gen
+
+    def bump(self, user_id):
+        self._generations.set(user_id, next(self._counter))
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value):
+        self.entries.set(key, value)
+
+
+class RedisBackend:
+    """Shared backend so invalidation reaches every worker process."""
+
+    def __init__(self, url, ttl, prefix="fitness:"):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from exc
+        self._redis = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def generation(self, user_id):
+        return int(self._redis.get(f"{self.prefix}gen:{user_id}") or 0)
+
+    def bump(self, user_id):
+        self._redis.incr(f"{self.prefix}gen:{user_id}")
+
+    def get(self, key):
+        raw = self._redis.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value):
+        self._redis.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+
+
+class ResponseCache:
+    """Per-user cache of JSON view responses; see module docstring."""
+
+    def __init__(self):
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        from app import db
+
+        kind = app.config.get("CACHE_BACKEND", "local")
+        ttl = app.config.get("CACHE_DEFAULT_TTL", 30)
+        if kind == "redis":
+            self.backend = RedisBackend(app.config["CACHE_REDIS_URL"], ttl)
+        elif kind == "local":
+            self.backend = LocalBackend(app.config.get("CACHE_MAX_ENTRIES", 10000), ttl)
+        else:
+            self.backend = None
+        app.extensions["response_cache"] = self
+
+        if not getattr(self, "_listening", False):
+            event.listen(db.session, "after_commit", self._after_commit)
+            event.listen(db.session, "after_rollback", self._after_rollback)
+            self._listening = True
+
+    def cached(self, namespace):
+        """Decorator for @jwt_required views returning JSON; caches 200 responses per user."""
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return view(*args, **kwargs)
+                user_id = get_jwt_identity()
+                key = self._key(namespace, user_id)
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    return Response(entry["body"], mimetype=entry["mimetype"], headers={"X-Cache": "HIT"})
+                self.misses += 1
+                response = view(*args, **kwargs)
+                if isinstance(response, Response) and response.status_code == 200:
+                    self.backend.set(key, {"body": response.get_data(as_text=True), "mimetype": response.mimetype})
+                    response.headers["X-Cache"] = "MISS"
+                return response
+
+            return wrapper
+
+        return decorator
+
+    def _key(self, namespace, user_id):
+        # Today's date is part of the key because endpoints default to "today"
+        today = datetime.now(timezone.utc).date().isoformat()
+        query = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+        return f"resp:{namespace}:{user_id}:{self.backend.generation(user_id)}:{today}:{query}"
+
+    def invalidate_user(self, user_id):
+        if self.backend is not None:
+            self.backend.bump(user_id)
+            self.invalidations += 1
+
+    def _after_commit(self, session):
+        for user_id in session.info.pop("changed_users", ()):
+            self.invalidate_user(user_id)
+
+    @staticmethod
+    def _after_rollback(session):
+        session.info.pop("changed_users", None)
+
+    def stats(self):
+        stats = {"hits": self.hits, "misses": self.misses, "invalidations": self.invalidations}
+        if isinstance(self.backend, LocalBackend):
+            stats["entries"] = len(self.backend.entries)
+            stats["evictions"] = self.backend.entries.evictions
+        return stats
+
+
+response_cache = ResponseCache()
+
+
+def note_user_write(session, user_ids):
+    """Record that the current transaction changes these users' data; caches drop it on commit."""
+    session.info.setdefault("changed_users", set()).update(user_ids)
@@ -0,0 +1,169 @@
+"""
+Two-tier cache for /api/analyze/text estimates.
+
+Descriptions are keyed by nutrition.normalize(), so "Two eggs and toast" and
+"toast with 2 eggs" share one entry, and by the food table version, so editing
+foods.json retires old entries. Lookups go:
+
+1. an in-process LRUCache, tried with the raw description first (no
+   tokenizing at all for an exact repeat, e.g. the estimate-then-log pair the
+   app sends for every meal) and then with the normalized key;
+2. the text_estimates table, shared by all workers and surviving restarts;
+3. the estimation engine, whose result is then written to both tiers.
+
+The table counts hits per entry. Counts are collected in memory and added with
+one executemany UPDATE every TEXT_ESTIMATE_HIT_FLUSH hits or
+TEXT_ESTIMATE_HIT_FLUSH_SECONDS, so a cache hit does no write of its own.
+Writes use their own short transaction, never the request's session. At
+startup the TEXT_ESTIMATE_PRELOAD most-hit entries of the current version are
+loaded into the LRU; under gunicorn that happens once in the preloaded master.
+"""
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db
+from app.models import TextEstimate
+from app.services import nutrition
+from app.services.cache import LRUCache
+from app.services.sql import upsert_insert
+
+logger = logging.getLogger(__name__)
+
+
+def digest(version, normalized):
+    return hashlib.sha256(f"{version}\n{normalized}".encode()).hexdigest()
+
+
+class TextEstimateCache:
+    def __init__(self):
+        self.entries = LRUCache()
+        self.raw = LRUCache()
+        self.hit_flush = 100
+        self.hit_flush_seconds = 60
+        self.db_hits = 0
+        self.computed = 0
+        self.preloaded = 0
+        self._pending_hits = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        max_entries = app.config.get("TEXT_ESTIMATE_CACHE_MAX_ENTRIES", 10000)
+        self.entries = LRUCache(max_entries)
+        self.raw = LRUCache(max_entries)
+        self.hit_flush = app.config.get("TEXT_ESTIMATE_HIT_FLUSH", 100)
+        self.hit_flush_seconds = app.config.get("TEXT_ESTIMATE_HIT_FLUSH_SECONDS", 60)
+        self.db_hits = self.computed = self.preloaded = 0
+        app.extensions["text_estimates"] = self
+        preload = app.config.get("TEXT_ESTIMATE_PRELOAD", 0)
+        if preload:
+            with app.app_context():
+                self.preload(preload)
+
+    def preload(self, limit):
+        """Load the `limit` most-hit entries of the current food table into the LRU."""
+        version = nutrition.get_food_index().version
+        try:
+            with db.engine.connect() as conn:
+                rows = conn.execute(
+                    select(TextEstimate.digest, TextEstimate.normalized, TextEstimate.result)
+                    .where(TextEstimate.food_version == version)
+                    .order_by(TextEstimate.hits.desc())
+                    .limit(limit)
+                ).all()
+        except SQLAlchemyError as exc:  # e.g. before `flask db upgrade` created the table
+            logger.warning("Text estimate preload skipped: %s", exc.__class__.__name__)
+            return 0
+        for key, normalized, result in reversed(rows):  # hottest last = most recently used
+            self.entries.set(normalized, (key, result))
+        self.preloaded = len(rows)
+        return len(rows)
+
+    def estimate(self, description):
+        """nutrition.estimate(description), served from the cache when possible."""
+        cached = self.raw.get(description)
+        if cached is None:
+            normalized = nutrition.normalize(description)
+            cached = self.entries.get(normalized)
+            if cached is None:
+                cached = self._load_or_compute(normalized)
+                self.entries.set(normalized, cached)
+            self.raw.set(description, cached)
+        key, result = cached
+        self._count_hit(key)
+        return result
+
+    def _load_or_compute(self, normalized):
+        version = nutrition.get_food_index().version
+        key = digest(version, normalized)
+        with db.engine.connect() as conn:
+            result = conn.execute(select(TextEstimate.result).where(TextEstimate.digest == key)).scalar()
+        if result is not None:
+            self.db_hits += 1
+            return key, result
+        result = nutrition.estimate(normalized)
+        self.computed += 1
+        with db.engine.begin() as conn:
+            conn.execute(
+                upsert_insert(TextEstimate)
+                .values(digest=key, food_version=version, normalized=normalized, result=result, hits=0)
+                .on_conflict_do_nothing(index_elements=[TextEstimate.__table__.c.digest])
+            )
+        return key, result
+
+    def _count_hit(self, key):
+        with self._lock:
+            self._pending_hits[key] = self._pending_hits.get(key, 0) + 1
+            due = (
+                sum(self._pending_hits.values()) >= self.hit_flush
+                or time.monotonic() - self._last_flush >= self.hit_flush_seconds
+            )
+        if due:
+            self.flush_hits()
+
+    def flush_hits(self):
+        """Add the hits counted since the last flush to the table. Returns the entries updated."""
+        with self._lock:
+            pending, self._pending_hits = self._pending_hits, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        table = TextEstimate.__table__
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(
+                    update(table)
+                    .where(table.c.digest == bindparam("key"))
+                    .values(hits=table.c.hits + bindparam("count"), last_hit_at=datetime.now(timezone.utc)),
+                    [{"key": key, "count": count} for key, count in pending.items()],
+                )
+        except SQLAlchemyError:  # hit counts only rank preloading; losing a batch is harmless
+            logger.exception("Could not record text estimate hits")
+        return len(pending)
+
+    def prune(self):
+        """Delete entries computed from other versions of the food table. Returns the count."""
+        version = nutrition.get_food_index().version
+        with db.engine.begin() as conn:
+            return conn.execute(delete(TextEstimate).where(TextEstimate.food_version != version)).rowcount
+
+    def stats(self):
+        return {
+            "raw_entries": len(self.raw),
+            "raw_hits": self.raw.hits,
+            "entries": len(self.entries),
+            "hits": self.entries.hits,
+            "misses": self.entries.misses,
+            "db_hits": self.db_hits,
+            "computed": self.computed,
+            "preloaded": self.preloaded,
+        }
+
+
+text_estimates = TextEstimateCache()
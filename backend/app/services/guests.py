@@ -0,0 +1,68 @@
+"""
+Cheap guest accounts.
+
+Guests have no password hash (nobody could ever type their random password), so
+creating one is a single INSERT, or, with GUEST_POOL_ENABLED, a single
+UPDATE ... RETURNING that claims a row pre-allocated by `flask guests prefill`.
+On PostgreSQL the commit runs with synchronous_commit off: losing a
+just-created, still empty guest in a crash is harmless. Guests become regular
+accounts through POST /api/auth/register with their guest token.
+"""
+import uuid
+
+from sqlalchemy import insert, select, text, update
+
+from app import db
+from app.models import User
+
+
+def _guest_email():
+    return f"guest_{uuid.uuid4().hex}@guest.local"
+
+
+def _relax_commit():
+    if db.engine.dialect.name == "postgresql":
+        db.session.execute(text("SET LOCAL synchronous_commit = off"))
+
+
+def claim_pooled():
+    """Take one pre-allocated guest from the pool; returns the User or None if the pool is empty."""
+    candidate = select(User.id).where(User.pooled.is_(True)).limit(1).with_for_update(skip_locked=True)
+    row = db.session.execute(
+        update(User)
+        .where(User.id == candidate.scalar_subquery())
+        .values(pooled=False, created_at=db.func.now())
+        .returning(User.id)
+    ).first()
+    if row is None:
+        return None
+    return db.session.get(User, row.id, populate_existing=True)
+
+
+def create_guest(use_pool=False):
+    """Create (or claim) a guest user and commit. No password hashing happens here."""
+    _relax_commit()
+    user = claim_pooled() if use_pool else None
+    if user is None:
+        user = User(email=_guest_email(), is_guest=True)
+        db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def prefill(count, batch_size=1000):
+    """Insert `count` pooled guest rows with executemany INSERTs. Commits; returns the count."""
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        db.session.execute(
+            insert(User),
+            [{"email": _guest_email(), "is_guest": True, "pooled": True} for _ in range(size)],
+        )
+        db.session.commit()
+        created += size
+    return created
+
+
+def pool_size():
+    return db.session.execute(select(db.func.count()).where(User.pooled.is_(True))).scalar()
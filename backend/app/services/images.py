@@ -0,0 +1,180 @@
+"""
+Resized variants of stored meal images, cached on disk.
+
+GET /api/meals/<id>/image?size=thumb|medium serves a WebP (or JPEG, for clients
+that do not accept WebP) no larger than VARIANT_SIZES[size] on its longest
+side; size=full serves the stored file itself. A variant is rendered with
+Pillow the first time it is asked for and written next to the uploads under
+UPLOAD_FOLDER/.variants/<size>/<image path>.<format>, so it is immutable like
+the content-addressed original and one X-Accel-Redirect location covers both.
+
+The variant cache is bounded by IMAGE_VARIANT_CACHE_MAX_BYTES. Cache hits
+refresh a file's mtime (at most hourly), and trim() deletes the least recently
+used variants until the cache is back under 80% of the limit. Each process trims
+after it has written another tenth of the limit; `flask uploads trim-variants`
+does the same on demand. Deleted variants are simply rendered again when asked
+for.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from flask import Response, current_app, request, send_file
+
+from app.services.uploads import resolve_path, upload_root
+
+VARIANT_SIZES = {"thumb": 256, "medium": 1024}
+SIZES = (*VARIANT_SIZES, "full")
+FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+TOUCH_INTERVAL_SECONDS = 3600
+TRIM_TARGET = 0.8
+
+_written = 0
+_written_lock = threading.Lock()
+
+
+class ImageProcessingError(ValueError):
+    """The stored image could not be decoded or resized."""
+
+
+def variants_root():
+    return os.path.join(upload_root(), ".variants")
+
+
+def variant_path(source, size, fmt):
+    """Cache location for a variant of `source`, the resolved absolute path of a stored image."""
+    relative = os.path.relpath(source, os.path.realpath(upload_root()))
+    return os.path.join(variants_root(), size, f"{os.path.splitext(relative)[0]}.{fmt}")
+
+
+def etag(image_path, size, fmt):
+    """Strong validator: stored images never change in place, so the path identifies the bytes."""
+    return hashlib.blake2s(f"{image_path}:{size}:{fmt}".encode(), digest_size=16).hexdigest()
+
+
+def _render(source, target, max_dimension, fmt):
+    from PIL import Image, ImageOps
+
+    pil_format, _mimetype, options = FORMATS[fmt]
+    try:
+        with Image.open(source) as img:
+            if img.format == "JPEG":
+                img.draft("RGB", (max_dimension, max_dimension))
+            img = ImageOps.exif_transpose(img)
+            keep_alpha = fmt == "webp" and (img.mode in ("RGBA", "LA") or "transparency" in img.info)
+            img = img.convert("RGBA" if keep_alpha else "RGB")
+            img.thumbnail((max_dimension, max_dimension), reducing_gap=2.0)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    img.save(out, format=pil_format, **options)
+                os.replace(tmp_path, target)  # atomic; concurrent renders of the same variant agree
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+    except (OSError, SyntaxError, Image.DecompressionBombError) as exc:
+        raise ImageProcessingError("Image could not be processed") from exc
+    return os.path.getsize(target)
+
+
+def _note_written(size):
+    global _written
+    max_bytes = current_app.config["IMAGE_VARIANT_CACHE_MAX_BYTES"]
+    with _written_lock:
+        _written += size
+        if _written < max_bytes / 10:
+            return
+        _written = 0
+    trim(max_bytes)
+
+
+def get(image_path, size, fmt):
+    """
+    Absolute path of the file to serve for (image_path, size, fmt), rendering the variant
+    if needed; None if the stored image is missing. Raises ImageProcessingError.
+    """
+    source = resolve_path(image_path)
+    if not source or not os.path.isfile(source):
+        return None
+    if size == "full":
+        return source
+    target = variant_path(source, size, fmt)
+    try:
+        mtime = os.path.getmtime(target)
+    except OSError:
+        _note_written(_render(source, target, VARIANT_SIZES[size], fmt))
+        return target
+    if time.time() - mtime > TOUCH_INTERVAL_SECONDS:
+        try:
+            os.utime(target)
+        except OSError:  # evicted meanwhile; the route answers 404 and the next request re-renders
+            pass
+    return target
+
+
+def trim(max_bytes):
+    """Delete least recently used variants until the cache is under TRIM_TARGET * max_bytes."""
+    entries = []
+    total = 0
+    for directory, _dirs, files in os.walk(variants_root()):
+        for name in files:
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    if total <= max_bytes:
+        return 0, 0
+    removed = freed = 0
+    for _mtime, size, path in sorted(entries):
+        if total - freed <= max_bytes * TRIM_TARGET:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        removed += 1
+        freed += size
+    return removed, freed
+
+
+def send(path, mimetype, tag, last_modified):
+    """
+    Response for a file with ETag/Last-Modified validation (304) and, when Flask serves the
+    bytes itself, Range support (206). With IMAGE_SENDFILE=x-accel or x-sendfile the body is
+    left to the front server (nginx internal location at IMAGE_ACCEL_PREFIX, or
+    mod_xsendfile/lighttpd), which then handles ranges too.
+    """
+    mode = current_app.config["IMAGE_SENDFILE"]
+    max_age = current_app.config["IMAGE_MAX_AGE"]
+    if mode in ("x-accel", "x-sendfile"):
+        response = Response(mimetype=mimetype)
+        if mode == "x-accel":
+            relative = os.path.relpath(os.path.realpath(path), os.path.realpath(upload_root())).replace(os.sep, "/")
+            response.headers["X-Accel-Redirect"] = current_app.config["IMAGE_ACCEL_PREFIX"].rstrip("/") + "/" + relative
+        else:
+            response.headers["X-Sendfile"] = path
+        response.set_etag(tag)
+        response.last_modified = last_modified
+        response = response.make_conditional(request.environ)
+        if response.status_code == 304:
+            response.headers.pop("X-Accel-Redirect", None)
+            response.headers.pop("X-Sendfile", None)
+    else:
+        response = send_file(path, mimetype=mimetype, etag=tag, last_modified=last_modified, conditional=True)
+    # Meal images are per user: browsers may keep them, shared caches must not
+    response.cache_control.public = False
+    response.cache_control.no_cache = None
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    response.vary.add("Accept")
+    return response
@@ -0,0 +1,228 @@
+"""
+Streaming parsers for bulk imports.
+
+Request bodies are read in fixed-size chunks and records are yielded one at a
+time, so memory stays bounded by the batch size rather than the upload size.
+Supported formats: JSON array, NDJSON (one object per line) and CSV with a
+header row.
+"""
+import codecs
+import csv
+import io
+import json
+from collections import Counter
+
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db
+from app.services import rollups, uploads
+
+CHUNK_SIZE = 64 * 1024
+MAX_RECORD_SIZE = 1024 * 1024  # a single JSON array element larger than this is rejected
+
+FORMATS_BY_MIMETYPE = {
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonlines": "ndjson",
+    "text/csv": "csv",
+}
+
+
+class RecordError(Exception):
+    """A single record could not be parsed; the import continues with the next one."""
+
+
+class StreamError(Exception):
+    """The body is malformed beyond recovery (e.g. broken JSON array); the import stops."""
+
+
+def detect_format(mimetype, override=None):
+    """Pick a parser from ?format= or the Content-Type. Raises ValueError if unsupported."""
+    fmt = (override or "").lower() or FORMATS_BY_MIMETYPE.get((mimetype or "").lower())
+    if fmt not in ("json", "ndjson", "csv"):
+        raise ValueError("Unsupported format; send JSON array, NDJSON or CSV")
+    return fmt
+
+
+def iter_records(stream, fmt):
+    """
+    Yield (row_number, record) pairs, 1-based. record is a dict, or a RecordError
+    for rows that failed to parse. Raises StreamError for unrecoverable input.
+    """
+    if fmt == "json":
+        records = _iter_json_array(stream)
+    elif fmt == "ndjson":
+        records = _iter_ndjson(stream)
+    else:
+        records = _iter_csv(stream)
+    return _utf8_only(records)
+
+
+def _utf8_only(records):
+    try:
+        yield from records
+    except UnicodeDecodeError as exc:
+        raise StreamError("Body is not valid UTF-8") from exc
+
+
+def _text_stream(stream):
+    return io.TextIOWrapper(io.BufferedReader(stream, CHUNK_SIZE), encoding="utf-8-sig", newline="")
+
+
+def _iter_ndjson(stream):
+    for row, line in enumerate(_text_stream(stream), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield row, RecordError("Invalid JSON")
+            continue
+        yield row, record if isinstance(record, dict) else RecordError("Expected a JSON object")
+
+
+def _iter_csv(stream):
+    reader = csv.DictReader(_text_stream(stream))
+    for row, record in enumerate(reader, start=1):
+        if None in record:
+            yield row, RecordError("Too many columns")
+            continue
+        # Empty cells mean "not provided", like a missing JSON key
+        yield row, {key: value for key, value in record.items() if value not in ("", None)}
+
+
+def _iter_json_array(stream):
+    """Incrementally decode a top-level JSON array without reading it all into memory."""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+    buf = ""
+    pos = 0
+    eof = False
+    state = "start"  # start -> value -> separator -> value ... -> done
+    row = 0
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            eof = True
+            buf = buf[pos:] + utf8.decode(b"", final=True)
+        else:
+            buf = buf[pos:] + utf8.decode(chunk)
+        pos = 0
+
+    while True:
+        while pos < len(buf) and buf[pos].isspace():
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                if state != "done":
+                    raise StreamError("Unexpected end of JSON array")
+                return
+            fill()
+            continue
+        if state == "done":
+            raise StreamError("Unexpected data after JSON array")
+        char = buf[pos]
+        if state == "start":
+            if char != "[":
+                raise StreamError("Expected a JSON array")
+            pos += 1
+            state = "first"
+            continue
+        if state in ("first", "separator") and char == "]":
+            pos += 1
+            state = "done"
+            continue
+        if state == "separator":
+            if char != ",":
+                raise StreamError("Expected ',' or ']' in JSON array")
+            pos += 1
+            state = "value"
+            continue
+        # state is "first" or "value": decode one element, reading more until it is complete
+        try:
+            record, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            if eof or len(buf) - pos > MAX_RECORD_SIZE:
+                raise StreamError("Invalid JSON in array")
+            fill()
+            continue
+        if end == len(buf) and not eof and not isinstance(record, (dict, list, str)):
+            # A number at the buffer edge may continue in the next chunk
+            fill()
+            continue
+        pos = end
+        row += 1
+        state = "separator"
+        yield row, record if isinstance(record, dict) else RecordError("Expected a JSON object")
+
+
+def batched(iterable, size):
+    """Group an iterable into lists of at most `size` items."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_records(records, model, user_id, to_values, rollup_deltas, batch_size, max_errors=100):
+    """
+    Validate and insert parsed records in batches of `batch_size`.
+
+    to_values(record) returns (column_values, error). Valid rows of each batch are
+    written with one executemany INSERT plus one rollup upsert, then committed, so
+    bad rows are reported without aborting the rest of the import.
+    Returns a summary dict with inserted/failed counts and the first `max_errors` errors,
+    plus `aborted` if the body broke off or a batch could not be written (earlier
+    batches stay committed).
+    """
+    inserted = failed = 0
+    errors = []
+
+    def reject(row, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < max_errors:
+            errors.append({"row": row, "error": message})
+
+    try:
+        for batch in batched(records, batch_size):
+            rows = []
+            for row, record in batch:
+                if isinstance(record, RecordError):
+                    reject(row, str(record))
+                    continue
+                values, error = to_values(record)
+                if error:
+                    reject(row, error)
+                    continue
+                rows.append({"user_id": user_id, **values})
+            if not rows:
+                continue
+            try:
+                db.session.execute(insert(model), rows)
+                rollups.apply_deltas(rollup_deltas(rows))
+                for image_path, count in Counter(r["image_path"] for r in rows if r.get("image_path")).items():
+                    uploads.retain(image_path, count)
+                db.session.commit()
+            except SQLAlchemyError:
+                db.session.rollback()
+                return {
+                    "inserted": inserted,
+                    "failed": failed + len(rows),
+                    "errors": errors,
+                    "aborted": f"Rows {batch[0][0]}-{batch[-1][0]} could not be written; the import stopped there",
+                }
+            inserted += len(rows)
+    except StreamError as exc:
+        db.session.rollback()
+        return {"inserted": inserted, "failed": failed, "errors": errors, "aborted": str(exc)}
+    return {"inserted": inserted, "failed": failed, "errors": errors}
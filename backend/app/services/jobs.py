@@ -0,0 +1,209 @@
+"""
+Database-backed queue for asynchronous image analysis.
+
+POST /api/analyze?async=1 saves the upload and inserts an AnalysisJob row.
+`flask jobs work` claims queued rows (SELECT ... FOR UPDATE SKIP LOCKED on
+PostgreSQL, so several workers can share the table), runs analyze_image() in a
+process pool sized by ANALYZE_WORKER_PROCESSES, and records the result, creating
+the Meal when the client asked for save_meal. No broker or other outside service
+is needed.
+"""
+import logging
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+
+from app import db
+from app.models import AnalysisJob, Meal
+from app.services import rollups, uploads
+from app.services.analysis import analyze_image
+
+logger = logging.getLogger(__name__)
+
+STALE_CHECK_SECONDS = 60  # how often a running worker looks for jobs abandoned by others
+
+
+def enqueue(user_id, image_path, save_meal=False, meal_name=None):
+    """Queue analysis of an already-saved upload. Commits and returns the job."""
+    job = AnalysisJob(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        status=AnalysisJob.QUEUED,
+        image_path=image_path,
+        save_meal=save_meal,
+        meal_name=meal_name,
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def claim(limit):
+    """Mark up to `limit` queued jobs as running and return their ids, oldest first."""
+    jobs = (
+        AnalysisJob.query.filter_by(status=AnalysisJob.QUEUED)
+        .order_by(AnalysisJob.created_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    now = datetime.now(timezone.utc)
+    for job in jobs:
+        job.status = AnalysisJob.RUNNING
+        job.started_at = now
+        job.attempts += 1
+    db.session.commit()
+    return [(job.id, job.image_path) for job in jobs]
+
+
+def retry_or_fail(job_ids, error, max_attempts):
+    """
+    Requeue running jobs that have attempts left and fail the rest, so an image that
+    crashes the analyzer cannot loop forever. Commits; returns (requeued, failed).
+    """
+    if not job_ids:
+        return 0, 0
+    running = AnalysisJob.query.filter(AnalysisJob.id.in_(job_ids), AnalysisJob.status == AnalysisJob.RUNNING)
+    failed = running.filter(AnalysisJob.attempts >= max_attempts).update(
+        {"status": AnalysisJob.FAILED, "error": error, "finished_at": datetime.now(timezone.utc)},
+        synchronize_session=False,
+    )
+    requeued = running.filter(AnalysisJob.attempts < max_attempts).update(
+        {"status": AnalysisJob.QUEUED}, synchronize_session=False
+    )
+    db.session.commit()
+    return requeued, failed
+
+
+def requeue_stale(timeout_seconds, max_attempts, exclude=()):
+    """
+    Retry (or fail, see retry_or_fail) jobs left running by a crashed worker, other than
+    the caller's own jobs in `exclude`. Returns the count.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=timeout_seconds)
+    stale = db.session.execute(
+        db.select(AnalysisJob.id).where(AnalysisJob.status == AnalysisJob.RUNNING, AnalysisJob.started_at < cutoff)
+    ).scalars().all()
+    stale = [job_id for job_id in stale if job_id not in exclude]
+    requeued, failed = retry_or_fail(stale, "Worker stopped during analysis too many times", max_attempts)
+    return requeued + failed
+
+
+def complete(job_id, result):
+    """Store a finished analysis and, if requested, log it as a meal (one transaction)."""
+    job = db.session.get(AnalysisJob, job_id)
+    if job is None:  # user deleted meanwhile
+        return
+    result = {**result, "image_path": job.image_path}
+    if job.save_meal:
+        meal = Meal(
+            user_id=job.user_id,
+            calories=result["calories"],
+            protein=result["protein"],
+            carbs=result["carbs"],
+            fats=result["fats"],
+            image_path=job.image_path,
+            name=job.meal_name or "Photo meal",
+            logged_at=job.created_at or datetime.now(timezone.utc),
+        )
+        db.session.add(meal)
+        rollups.add_meal(meal)
+        uploads.retain(job.image_path)
+        db.session.flush()
+        job.meal_id = meal.id
+    uploads.cache_analysis(job.image_path, {k: v for k, v in result.items() if k != "image_path"})
+    job.result = result
+    job.status = AnalysisJob.DONE
+    job.finished_at = datetime.now(timezone.utc)
+    db.session.commit()
+
+
+def fail(job_id, error):
+    job = db.session.get(AnalysisJob, job_id)
+    if job is None:
+        return
+    job.status = AnalysisJob.FAILED
+    job.error = error[:2000]
+    job.finished_at = datetime.now(timezone.utc)
+    db.session.commit()
+
+
+def run_worker(app, processes=None, poll_interval=None, once=False):
+    """
+    Process jobs until interrupted (or until the queue is empty with once=True).
+    Keeps at most `processes` analyses in flight; the DB is only touched from this
+    process, the pool children just run analyze_image(). If a child dies (e.g. out of
+    memory on a huge image) the pool is replaced and its in-flight jobs are retried
+    up to ANALYZE_JOB_MAX_ATTEMPTS times.
+    Returns the number of jobs processed.
+    """
+    processes = processes or app.config["ANALYZE_WORKER_PROCESSES"]
+    poll_interval = poll_interval if poll_interval is not None else app.config["ANALYZE_JOB_POLL_SECONDS"]
+    max_attempts = app.config["ANALYZE_JOB_MAX_ATTEMPTS"]
+    processed = 0
+    in_flight = {}
+
+    def pool_broken(*unsubmitted):
+        nonlocal pool
+        job_ids = [*in_flight.values(), *unsubmitted]
+        logger.error("Analysis worker process died; retrying %d in-flight jobs", len(job_ids))
+        retry_or_fail(job_ids, "Analysis worker process crashed", max_attempts)
+        in_flight.clear()
+        pool.shutdown(wait=False, cancel_futures=True)
+        pool = ProcessPoolExecutor(max_workers=processes)
+
+    with app.app_context():
+        pool = ProcessPoolExecutor(max_workers=processes)
+        try:
+            last_stale_check = None
+            while True:
+                if last_stale_check is None or time.monotonic() - last_stale_check >= STALE_CHECK_SECONDS:
+                    requeued = requeue_stale(
+                        app.config["ANALYZE_JOB_TIMEOUT_SECONDS"], max_attempts, exclude=set(in_flight.values())
+                    )
+                    if requeued:
+                        logger.warning("Requeued or failed %d stale analysis jobs", requeued)
+                    last_stale_check = time.monotonic()
+                free = processes - len(in_flight)
+                claimed = claim(free) if free > 0 else []
+                if claimed:
+                    for position, (job_id, image_path) in enumerate(claimed):
+                        cached = uploads.cached_analysis(image_path)
+                        if cached is not None:  # same photo analyzed before
+                            complete(job_id, cached)
+                            processed += 1
+                            continue
+                        path = uploads.resolve_path(image_path)
+                        if path is None:
+                            fail(job_id, "Invalid image path")
+                            processed += 1
+                            continue
+                        try:
+                            future = pool.submit(analyze_image, path)
+                        except BrokenProcessPool:
+                            # This job and the rest of the batch are claimed but not submitted
+                            pool_broken(*[claimed_id for claimed_id, _ in claimed[position:]])
+                            break
+                        in_flight[future] = job_id
+                if not in_flight:
+                    if once and not claimed:
+                        return processed
+                    time.sleep(poll_interval)
+                    continue
+                done, _ = wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if isinstance(future.exception(), BrokenProcessPool):
+                        pool_broken()
+                        break
+                    job_id = in_flight.pop(future)
+                    try:
+                        complete(job_id, future.result())
+                    except Exception as exc:  # analysis or DB error: record it, keep the worker alive
+                        db.session.rollback()
+                        logger.exception("Analysis job %s failed", job_id)
+                        fail(job_id, f"{type(exc).__name__}: {exc}")
+                    processed += 1
+        finally:
+            pool.shutdown(cancel_futures=True)
@@ -0,0 +1,283 @@
+"""
+Request and database instrumentation, exported at GET /metrics (Prometheus text format).
+
+- Every request records wall time by blueprint/endpoint, plus how many SQL
+  statements it ran and how long they took. Statements are counted with
+  SQLAlchemy's before/after_cursor_execute events into a per-request context
+  variable, so a view that suddenly runs 40 queries instead of 2 (an N+1)
+  shows up in fitness_request_db_statements right away.
+- Statements slower than SLOW_QUERY_MS are logged to the "app.sql.slow" logger
+  with the endpoint that ran them.
+- /api/analyze records received and stored upload bytes.
+- Image analysis records per-stage times (decode, preprocess, queue, infer)
+  and the size of the inference batch each image ran in.
+- Cache, connection pool and analyzer stats are read at scrape time.
+
+Recording is a few counter increments under a lock per request and per
+statement, cheap enough to keep on in production. With METRICS_SERVER_TIMING
+responses also carry a Server-Timing header (db time and statement count),
+visible in browser dev tools.
+
+Metrics live in each process. Under gunicorn a scrape reports the worker that
+answered it; run one worker per container, or scrape workers individually,
+when exact totals matter. Streaming responses (exports) are timed until the
+response object is returned, not until the body is sent.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from flask import Response, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+slow_query_logger = logging.getLogger("app.sql.slow")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BYTE_BUCKETS = (16e3, 64e3, 256e3, 1e6, 4e6, 16e6)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labelvalues -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, *labelvalues, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        with self._lock:
+            for labelvalues, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _number(bound)
+                    lines.append(f"{self.name}_bucket{_labels(names, labelvalues + (le,))} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(series[-1])}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+def _gauges(prefix, help_text, stats, labels=""):
+    lines = []
+    for key, value in sorted(stats.items()):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        name = f"{prefix}_{key}"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name}{labels} {_number(value)}"]
+    return lines
+
+
+class _RequestStats:
+    __slots__ = ("statements", "db_seconds", "endpoint")
+
+    def __init__(self, endpoint):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.endpoint = endpoint
+
+
+_current = ContextVar("request_db_stats", default=None)
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.slow_query_seconds = 0.2
+        self.requests = Counter(
+            "fitness_http_requests_total", "HTTP requests.", ("blueprint", "endpoint", "method", "status")
+        )
+        self.latency = Histogram(
+            "fitness_http_request_duration_seconds", "Request wall time.", ("blueprint", "endpoint")
+        )
+        self.request_statements = Histogram(
+            "fitness_request_db_statements", "SQL statements per request.", ("endpoint",), STATEMENT_BUCKETS
+        )
+        self.request_db_time = Histogram(
+            "fitness_request_db_duration_seconds", "Time spent in SQL per request.", ("endpoint",)
+        )
+        self.statements = Counter("fitness_db_statements_total", "SQL statements executed.")
+        self.slow_statements = Counter(
+            "fitness_db_slow_statements_total", "SQL statements slower than SLOW_QUERY_MS.", ("endpoint",)
+        )
+        self.upload_bytes = Histogram(
+            "fitness_upload_bytes", "Image upload sizes.", ("stage",), BYTE_BUCKETS
+        )
+        self.uploads = Counter("fitness_uploads_total", "Image uploads by outcome.", ("outcome",))
+        self.analyzer_stages = Histogram(
+            "fitness_analyzer_stage_duration_seconds", "Image analysis time per stage.", ("stage",)
+        )
+        self.analyzer_batch = Histogram(
+            "fitness_analyzer_batch_size", "Inference batch size seen by each analyzed image.", (), BATCH_BUCKETS
+        )
+        self._collectors = []
+
+    def init_app(self, app):
+        self.enabled = app.config.get("METRICS_ENABLED", True)
+        self.slow_query_seconds = app.config.get("SLOW_QUERY_MS", 200) / 1000.0
+        server_timing = app.config.get("METRICS_SERVER_TIMING", False)
+        app.extensions["metrics"] = self
+        if not self.enabled:
+            return
+
+        if not getattr(self, "_listening", False):
+            event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+            self._listening = True
+
+        @app.before_request
+        def _start_timer():
+            g._metrics_started = time.perf_counter()
+            g._metrics_token = _current.set(_RequestStats(request.endpoint or "unmatched"))
+
+        @app.after_request
+        def _record(response):
+            started = g.pop("_metrics_started", None)
+            token = g.pop("_metrics_token", None)
+            if started is None:
+                return response
+            stats = _current.get()
+            _current.reset(token)
+            elapsed = time.perf_counter() - started
+            blueprint = request.blueprint or ""
+            endpoint = stats.endpoint
+            self.requests.inc(blueprint, endpoint, request.method, response.status_code)
+            self.latency.observe(blueprint, endpoint, value=elapsed)
+            self.request_statements.observe(endpoint, value=stats.statements)
+            self.request_db_time.observe(endpoint, value=stats.db_seconds)
+            if server_timing:
+                response.headers["Server-Timing"] = (
+                    f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.statements} queries", '
+                    f"app;dur={elapsed * 1000:.1f}"
+                )
+            return response
+
+        @app.route("/metrics")
+        def prometheus_metrics():
+            return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+    def add_collector(self, collector):
+        """Register a callable returning Prometheus text lines, run at scrape time."""
+        self._collectors.append(collector)
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        self.statements.inc()
+        stats = _current.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+        if elapsed >= self.slow_query_seconds:
+            endpoint = stats.endpoint if stats is not None else "-"
+            self.slow_statements.inc(endpoint)
+            slow_query_logger.warning(
+                "Slow query (%.0f ms, endpoint %s): %s", elapsed * 1000, endpoint, " ".join(statement.split())[:1000]
+            )
+
+    def observe_upload(self, received, stored, outcome):
+        self.uploads.inc(outcome)
+        if received:
+            self.upload_bytes.observe("received", value=received)
+        if stored:
+            self.upload_bytes.observe("stored", value=stored)
+
+    def observe_analysis(self, seconds, batch_size):
+        for stage, value in seconds.items():
+            self.analyzer_stages.observe(stage, value=value)
+        self.analyzer_batch.observe(value=batch_size)
+
+    def render(self):
+        lines = []
+        for metric in (
+            self.requests, self.latency, self.request_statements, self.request_db_time,
+            self.statements, self.slow_statements, self.uploads, self.upload_bytes,
+            self.analyzer_stages, self.analyzer_batch,
+        ):
+            lines += metric.render()
+        for collector in self._collectors:
+            lines += collector()
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def register_default_collectors(app):
+    """Expose cache, connection pool and analyzer stats as gauges."""
+    from app import db
+    from app.services.analysis import analyzer
+    from app.services.cache import response_cache
+    from app.services.estimates import text_estimates
+    from app.services.pool import pool_status
+    from app.services.users import user_cache
+
+    metrics._collectors.clear()
+    metrics.add_collector(lambda: _gauges("fitness_response_cache", "Dashboard response cache.", response_cache.stats()))
+    metrics.add_collector(lambda: _gauges("fitness_user_cache", "Authenticated user cache.", user_cache.stats()))
+    metrics.add_collector(lambda: _gauges("fitness_analyzer", "Image analyzer.", analyzer.stats()))
+    metrics.add_collector(
+        lambda: _gauges("fitness_text_estimates", "Text estimate cache.", text_estimates.stats())
+    )
+
+    def pool():
+        with app.app_context():
+            return _gauges("fitness_db_pool", "Database connection pool.", pool_status(db.engine))
+
+    metrics.add_collector(pool)
@@ -0,0 +1,308 @@
+"""
+Text-based nutrition estimates from the bundled food table (app/data/foods.json).
+
+The table is loaded once per worker into a FoodIndex:
+
+- phrases: normalized token tuple -> food, for names and aliases ("peanut butter")
+- an inverted index token -> phrases, for loosely ordered matches ("chicken grilled")
+- a prefix trie over the vocabulary, for truncated words ("banan", "oatm")
+
+estimate() tokenizes a description, parses quantities and units ("two eggs",
+"200g rice", "1/2 cup oats") and matches foods greedily, longest phrase first.
+Everything is in memory; no database access happens per token.
+
+normalize() rewrites a description into a canonical form that estimates the
+same: lowercase canonical tokens, numbers as digits ("two" -> "2",
+"1/2" -> "0.5"), and items separated by "and"/"with"/"plus" sorted, so
+"Toast with two eggs" and "2 eggs and toast" share one cache entry
+(see app/services/estimates.py).
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from decimal import Decimal
+
+FOODS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "foods.json")
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "half": 0.5, "quarter": 0.25, "couple": 2, "few": 3, "dozen": 12, "single": 1, "double": 2,
+}
+
+# Mass/volume units, in grams (volumes assume water density)
+GRAM_UNITS = {
+    "g": 1, "gram": 1, "gr": 1, "kg": 1000, "kilo": 1000, "kilogram": 1000,
+    "oz": 28.35, "ounce": 28.35, "lb": 453.6, "lbs": 453.6, "pound": 453.6,
+    "ml": 1, "milliliter": 1, "millilitre": 1, "l": 1000, "liter": 1000, "litre": 1000,
+    "cup": 240, "tbsp": 15, "tablespoon": 15, "tsp": 5, "teaspoon": 5,
+}
+
+# Units that mean "this many servings" of the food
+SERVING_UNITS = {
+    "serving", "portion", "piece", "slice", "bowl", "plate", "glass", "can", "bottle",
+    "handful", "scoop", "bar", "pack", "packet", "fillet", "breast", "thigh", "shake", "mug",
+}
+
+STOP_WORDS = {"and", "with", "of", "some", "plus", "the", "on", "in", "for", "&", "my", "x"}
+
+# Stop words that join separate items; normalize() may reorder the items around them
+ITEM_SEPARATORS = {"and", "with", "plus", "&"}
+
+_RESERVED = set(NUMBER_WORDS) | set(GRAM_UNITS) | SERVING_UNITS | STOP_WORDS
+
+_TOKEN_RE = re.compile(r"\d+(?:[./]\d+)?|[a-z]+|&")
+_NUMBER_RE = re.compile(r"^\d+(?:\.\d+)?$")
+_FRACTION_RE = re.compile(r"^(\d+)/(\d+)$")
+
+MIN_PREFIX = 4  # shortest truncated word the trie will complete
+
+# Bounds on what one item can contribute, so "99999999999999999999 eggs" cannot produce
+# absurd totals (or be cached and logged as a meal)
+MAX_QUANTITY = 10000
+MAX_ITEM_GRAMS = 5000
+
+# Bump when estimate() or normalize() change meaning, to retire cached estimates
+ESTIMATOR_REVISION = 2
+
+
+def singular(token):
+    """Cheap plural folding, applied identically to the food table and to input."""
+    if len(token) <= 3 or token.endswith("ss"):
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith(("oes", "ches", "shes", "sses", "xes")):
+        return token[:-2]
+    if token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Lowercase tokens; numbers glued to units ("200g") are split into two tokens."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def parse_number(token):
+    """Numeric value of a token ("2", "1.5", "1/2", "two"), or None."""
+    if _NUMBER_RE.match(token):
+        return min(float(token), MAX_QUANTITY)
+    match = _FRACTION_RE.match(token)
+    if match:
+        denominator = int(match.group(2))
+        return min(int(match.group(1)) / denominator, MAX_QUANTITY) if denominator else None
+    return NUMBER_WORDS.get(token)
+
+
+def format_number(number):
+    """Plain decimal digits that parse_number() reads back as exactly `number` ("2", "0.5")."""
+    text = format(Decimal(repr(float(number))), "f")
+    return text.rstrip("0").rstrip(".") if "." in text else text
+
+
+class PrefixTrie:
+    """Maps a prefix to the most frequent complete word starting with it."""
+
+    __slots__ = ("_root",)
+
+    def __init__(self):
+        self._root = {}
+
+    def insert(self, word, weight=1):
+        node = self._root
+        for char in word:
+            node = node.setdefault(char, {})
+            best = node.get("")
+            if best is None or weight > best[1] or (weight == best[1] and len(word) < len(best[0])):
+                node[""] = (word, weight)
+
+    def complete(self, prefix):
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return None
+        best = node.get("")
+        return best[0] if best else None
+
+
+class FoodIndex:
+    """Immutable in-memory index over the food table; build once, share per process."""
+
+    def __init__(self, foods):
+        self.foods = foods
+        # Identifies the table contents (and estimator revision), so cached estimates from another version are ignored
+        self.version = hashlib.sha256(
+            json.dumps([ESTIMATOR_REVISION, foods], sort_keys=True).encode()
+        ).hexdigest()[:16]
+        self.phrases = {}
+        self.phrase_food = []
+        self.phrase_tokens = []
+        self.inverted = {}
+        self.trie = PrefixTrie()
+        self.max_phrase_len = 1
+        counts = {}
+        for food_id, food in enumerate(foods):
+            for label in [food["name"], *food.get("aliases", ())]:
+                key = tuple(singular(t) for t in tokenize(label))
+                if not key or key in self.phrases:
+                    continue
+                phrase_id = len(self.phrase_food)
+                self.phrases[key] = phrase_id
+                self.phrase_food.append(food_id)
+                self.phrase_tokens.append(frozenset(key))
+                self.max_phrase_len = max(self.max_phrase_len, len(key))
+                for token in key:
+                    self.inverted.setdefault(token, []).append(phrase_id)
+                    counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            self.trie.insert(token, count)
+
+    @classmethod
+    def load(cls, path=FOODS_PATH):
+        with open(path, encoding="utf-8") as fh:
+            return cls(json.load(fh))
+
+    def _canonical(self, token):
+        token = singular(token)
+        if token in self.inverted or len(token) < MIN_PREFIX or token in _RESERVED:
+            return token
+        return self.trie.complete(token) or token
+
+    def normalize(self, description):
+        """
+        Canonical text for a description; estimate(normalize(d)) matches estimate(d) up to
+        the order of items. Items are only reordered at separators right after a complete
+        food name, where estimate() holds no pending quantity or unit.
+        """
+        segments = [[]]
+        separators = ITEM_SEPARATORS - self.inverted.keys()
+        for token in tokenize(description):
+            token = self._canonical(token)
+            current = segments[-1]
+            if token in ("a", "an") and current and parse_number(current[-1]) is not None:
+                continue  # "half a cup": the article adds nothing after a number
+            number = parse_number(token) if token not in ("a", "an", "half") else None
+            if number is not None:
+                token = format_number(number)
+            elif token in separators and self._ends_with_food(current):
+                segments.append([])
+                continue
+            current.append(token)
+        texts = [" ".join(segment) for segment in segments if segment]
+        # A trailing quantity without a food ("... and 2 slices of") stays last
+        tail = [texts.pop()] if texts and not self._ends_with_food(segments[-1]) else []
+        return " and ".join(sorted(texts) + tail)
+
+    def _ends_with_food(self, tokens):
+        """True if the last tokens form a food name, so a quantity before it was consumed."""
+        for length in range(min(self.max_phrase_len, len(tokens)), 0, -1):
+            tail = tokens[-length:]
+            if tail[0] in GRAM_UNITS or tail[0] in SERVING_UNITS or parse_number(tail[0]) is not None:
+                continue  # estimate() reads these as a unit or quantity, never as a food's first word
+            if tuple(tail) in self.phrases or any(
+                self.phrase_tokens[phrase_id] == frozenset(tail) for phrase_id in self.inverted.get(tail[0], ())
+            ):
+                return True
+        return False
+
+    def _match_at(self, tokens, i):
+        """Return (phrase_id, tokens consumed) for the best phrase starting at i, or (None, 0)."""
+        best, best_len = None, 0
+        for length in range(min(self.max_phrase_len, len(tokens) - i), 0, -1):
+            phrase_id = self.phrases.get(tuple(tokens[i:i + length]))
+            if phrase_id is not None:
+                best, best_len = phrase_id, length
+                break
+        # A longer phrase written in another order ("rice brown", "chicken grilled")
+        for phrase_id in self.inverted.get(tokens[i], ()):
+            needed = self.phrase_tokens[phrase_id]
+            length = len(needed)
+            if length > best_len and needed == frozenset(tokens[i:i + length]):
+                best, best_len = phrase_id, length
+        return best, best_len
+
+    def estimate(self, description):
+        """
+        Estimate macros for a free-text description.
+        Returns {"calories", "protein", "carbs", "fats", "items", "unmatched"}.
+        """
+        tokens = [self._canonical(t) for t in tokenize(description)]
+        items = []
+        unmatched = []
+        quantity = None
+        unit = None
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            number = parse_number(token)
+            if number is not None:
+                if quantity is None:
+                    quantity = number
+                elif token == "half":  # "one and a half"
+                    quantity += 0.5
+                elif token not in ("a", "an"):  # "half a cup" keeps 0.5
+                    quantity = number
+                i += 1
+                continue
+            if token in GRAM_UNITS or token in SERVING_UNITS:
+                unit = token
+                i += 1
+                continue
+            phrase_id, consumed = self._match_at(tokens, i)
+            if phrase_id is None:
+                if token not in STOP_WORDS:
+                    unmatched.append(token)
+                i += 1
+                continue
+            items.append(self._item(self.foods[self.phrase_food[phrase_id]], quantity, unit))
+            quantity = unit = None
+            i += consumed
+        totals = {key: round(sum(item[key] for item in items), 1) for key in ("calories", "protein", "carbs", "fats")}
+        return {**totals, "items": items, "unmatched": unmatched}
+
+    @staticmethod
+    def _item(food, quantity, unit):
+        quantity = 1 if quantity is None else quantity
+        if unit in GRAM_UNITS:
+            grams = quantity * GRAM_UNITS[unit]
+        else:
+            grams = quantity * food["serving_g"]
+        grams = min(grams, MAX_ITEM_GRAMS)
+        per_100g = food["per_100g"]
+        factor = grams / 100.0
+        return {
+            "food": food["name"],
+            "quantity": quantity,
+            "unit": unit or food.get("serving", "serving"),
+            "grams": round(grams, 1),
+            "calories": round(per_100g["calories"] * factor, 1),
+            "protein": round(per_100g["protein"] * factor, 1),
+            "carbs": round(per_100g["carbs"] * factor, 1),
+            "fats": round(per_100g["fats"] * factor, 1),
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_food_index():
+    """The process-wide FoodIndex, loaded on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = FoodIndex.load()
+    return _index
+
+
+def estimate(description):
+    return get_food_index().estimate(description)
+
+
+def normalize(description):
+    return get_food_index().normalize(description)
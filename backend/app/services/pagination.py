@@ -0,0 +1,57 @@
+"""
+Keyset (cursor) pagination over (logged_at DESC, id DESC).
+
+Cursors are opaque to clients: URL-safe base64 of the last row's sort key.
+Each page is one indexed range scan on (user_id, logged_at DESC, id DESC),
+so deep pages cost the same as the first one and no COUNT(*) is needed.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(*values):
+    """Encode a sort key (datetimes allowed) as an opaque cursor string."""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor(); ISO timestamps come back as datetimes. Raises ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(values, list) or not values:
+        raise ValueError("Invalid cursor")
+    decoded = []
+    for value in values:
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                pass
+        decoded.append(value)
+    return decoded
+
+
+def paginate_keyset(query, model, cursor, per_page):
+    """
+    Return (items, next_cursor) for the page after `cursor` (None/"" for the first page),
+    newest first. next_cursor is None on the last page.
+    """
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 2 or not isinstance(values[0], datetime) or not isinstance(values[1], int):
+            raise ValueError("Invalid cursor")
+        query = query.filter(tuple_(model.logged_at, model.id) < tuple_(*values))
+    items = query.order_by(model.logged_at.desc(), model.id.desc()).limit(per_page + 1).all()
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = encode_cursor(items[-1].logged_at, items[-1].id)
+    return items, next_cursor
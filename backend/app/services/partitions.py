@@ -0,0 +1,209 @@
+"""
+Maintenance of the monthly meals/workouts partitions (PostgreSQL, migration 008).
+
+Partitions are named <table>_yYYYYmMM and cover one UTC month of logged_at.
+Rows outside every partition land in <table>_default, so inserts never fail
+when a month is missing. Queries with a logged_at range (list filters, rollup
+rebuilds, exports by date) only touch the partitions of that range.
+
+- ensure_partitions() creates the next months ahead, and splits rows that
+  ended up in the default partition (back-dated entries) into their own month.
+  A new partition is built detached with a CHECK constraint matching its
+  bounds, so ATTACH does not scan it; only the (small) default partition is
+  locked exclusively while it is checked, writes to other months continue.
+- archive() takes months older than a cutoff out of the live tables. By default
+  the partition is detached and moved to the `archive` schema (instant, data
+  kept); with an export directory it is written to <dir>/<partition>.csv.gz with
+  COPY and dropped, and the images its meals referenced are released.
+
+Dashboard totals come from daily_totals, which archiving leaves alone; do not
+run an unbounded `flask rollups rebuild` afterwards, or the archived months drop
+out of the rollup (pass --from after the archive cutoff).
+"""
+import gzip
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+
+from app import db
+from app.services import uploads
+from app.services.sql import advisory_lock
+
+logger = logging.getLogger(__name__)
+
+TABLES = ("meals", "workouts")
+ARCHIVE_SCHEMA = "archive"
+ADVISORY_LOCK_KEY = 0x70617274  # "part"
+
+_NAME_RE = re.compile(r"^(?P<table>\w+)_y(?P<year>\d{4})m(?P<month>\d{2})$")
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+
+def _bound(month):
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def is_partitioned(table="meals"):
+    if db.engine.dialect.name != "postgresql":
+        return False
+    return bool(
+        db.session.execute(
+            text("SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+                 "WHERE c.relname = :table AND c.relnamespace = 'public'::regnamespace"),
+            {"table": table},
+        ).scalar()
+    )
+
+
+def list_partitions(table):
+    """Attached monthly partitions of `table` as (month, name, approximate rows), oldest first."""
+    rows = db.session.execute(
+        text(
+            "SELECT c.relname, c.reltuples::bigint FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table AND p.relnamespace = 'public'::regnamespace"
+        ),
+        {"table": table},
+    ).all()
+    partitions = []
+    for name, approx_rows in rows:
+        match = _NAME_RE.match(name)
+        if match and match.group("table") == table:
+            month = date(int(match.group("year")), int(match.group("month")), 1)
+            partitions.append((month, name, max(approx_rows, 0)))
+    return sorted(partitions)
+
+
+def _create_partition(table, month):
+    """Create and attach one month, moving matching rows out of the default partition."""
+    name = partition_name(table, month)
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    db.session.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    db.session.execute(
+        text(f"ALTER TABLE {name} ADD CONSTRAINT {name}_bounds CHECK (logged_at >= {lower} AND logged_at < {upper})")
+    )
+    moved = db.session.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {table}_default WHERE logged_at >= {lower} AND logged_at < {upper} "
+            f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+        )
+    ).rowcount
+    db.session.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ({lower}) TO ({upper})"))
+    db.session.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT {name}_bounds"))
+    return moved
+
+
+def ensure_partitions(months_ahead=3, today=None):
+    """Create missing partitions up to `months_ahead` months ahead. Commits; returns names created."""
+    today = (today or datetime.now(timezone.utc).date()).replace(day=1)
+    created = []
+    for table in TABLES:
+        existing = {month for month, _name, _rows in list_partitions(table)}
+        stray = db.session.execute(
+            text(f"SELECT DISTINCT date_trunc('month', logged_at AT TIME ZONE 'UTC')::date FROM {table}_default")
+        ).scalars()
+        wanted = {add_months(today, n) for n in range(months_ahead + 1)} | set(stray)
+        for month in sorted(wanted - existing):
+            moved = _create_partition(table, month)
+            db.session.commit()
+            created.append(partition_name(table, month))
+            logger.info("Created partition %s (%d rows moved from default)", partition_name(table, month), moved)
+    return created
+
+
+def _release_images(name):
+    rows = db.session.execute(
+        text(f"SELECT image_path, count(*) FROM {name} WHERE image_path IS NOT NULL GROUP BY image_path")
+    ).all()
+    for image_path, count in rows:
+        uploads.release(image_path, count)
+
+
+def _export(name, directory):
+    """COPY a table to <directory>/<name>.csv.gz (written to a temp file, then renamed)."""
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, f"{name}.csv.gz")
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as out:
+            cursor = db.session.connection().connection.cursor()
+            cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", out)
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return target
+
+
+def archive(older_than_months, export_dir=None, today=None):
+    """
+    Take partitions for months before (current month - older_than_months) out of the live
+    tables: detach into the archive schema, or export and drop with export_dir.
+    Commits after each partition; returns a list of (partition, destination).
+    """
+    cutoff = add_months((today or datetime.now(timezone.utc).date()).replace(day=1), -older_than_months)
+    done = []
+    if export_dir is None:
+        db.session.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+    for table in TABLES:
+        for month, name, _rows in list_partitions(table):
+            if month >= cutoff:
+                break
+            db.session.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            if export_dir is None:
+                db.session.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+                destination = f"{ARCHIVE_SCHEMA}.{name}"
+            else:
+                destination = _export(name, export_dir)
+                if table == "meals":
+                    _release_images(name)
+                db.session.execute(text(f"DROP TABLE {name}"))
+            db.session.commit()
+            done.append((name, destination))
+            logger.info("Archived partition %s to %s", name, destination)
+    return done
+
+
+def start_scheduler(app):
+    """Run ensure_partitions() every PARTITION_MAINTENANCE_INTERVAL_SECONDS (0 disables)."""
+    interval = app.config.get("PARTITION_MAINTENANCE_INTERVAL_SECONDS", 0)
+    if not interval:
+        return None
+
+    def run_once():
+        with app.app_context():
+            try:
+                if not is_partitioned():
+                    return
+                with advisory_lock(ADVISORY_LOCK_KEY) as got:
+                    if got:
+                        ensure_partitions(app.config["PARTITION_MONTHS_AHEAD"])
+            finally:
+                db.session.remove()
+
+    def loop():
+        while True:
+            try:
+                run_once()
+            except Exception:  # keep the scheduler alive; next run retries
+                logger.exception("Partition maintenance failed")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="partition-maintenance", daemon=True)
+    thread.start()
+    return thread
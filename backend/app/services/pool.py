@@ -0,0 +1,108 @@
+"""
+Connection pool with checkout statistics.
+
+TimedQueuePool is SQLAlchemy's QueuePool plus counters: how many checkouts
+happened, how many found the pool exhausted (every connection in use and the
+overflow used up, so the request had to wait), how long acquiring took, and how
+many gave up after pool_timeout. GET /health/pool reports them next to the
+pool's current size, so pool exhaustion under load shows up as a growing
+`exhausted` count and wait times instead of as slow requests.
+"""
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.exhausted = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, seconds, exhausted, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.exhausted += exhausted
+            self.timeouts += timed_out
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "exhausted": self.exhausted,
+                "timeouts": self.timeouts,
+                "wait_ms_total": round(self.wait_seconds * 1000, 3),
+                "wait_ms_avg": round(self.wait_seconds * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.max_wait_seconds * 1000, 3),
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that times every checkout; stats survive engine.dispose()."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+        self._local = threading.local()
+
+    def _do_get(self):
+        # QueuePool._do_get retries by calling itself; only time the outermost call
+        if getattr(self._local, "timing", False):
+            return super()._do_get()
+        self._local.timing = True
+        exhausted = self._pool.qsize() == 0 and self._overflow >= self._max_overflow
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - started, exhausted, timed_out=True)
+            raise
+        finally:
+            self._local.timing = False
+        self.stats.record(time.perf_counter() - started, exhausted)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def configure_pool(app):
+    """Use TimedQueuePool for the app's engine unless another pool class was configured."""
+    url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+    options = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # In-memory SQLite needs its single-connection pool, which takes no sizing options
+        for key in ("pool_size", "max_overflow", "pool_timeout", "pool_use_lifo"):
+            options.pop(key, None)
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+        return
+    options.setdefault("poolclass", TimedQueuePool)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+
+def pool_status(engine):
+    """Current pool occupancy plus checkout stats (when the pool keeps them)."""
+    pool = engine.pool
+    status = {"class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+        )
+    if isinstance(pool, TimedQueuePool):
+        status.update(pool.stats.to_dict())
+    return status
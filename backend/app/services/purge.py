@@ -0,0 +1,155 @@
+"""
+Background purge of expired guests and accounts whose owners asked for deletion.
+
+Work is done in bounded steps so no transaction holds locks on the hot
+meals/workouts tables for long:
+
+1. pick up to PURGE_BATCH_SIZE users to remove;
+2. delete their meals and workouts PURGE_CHUNK_ROWS at a time
+   (DELETE ... RETURNING image_path, one short transaction per chunk that also
+   drops the chunk's upload references), pausing PURGE_PAUSE_SECONDS between chunks;
+3. delete the user rows; ON DELETE CASCADE (001_initial) removes what is left,
+   and passive_deletes keeps the ORM from loading children first;
+4. delete legacy (pre content-addressing) image files nobody else uses. Stored
+   blobs are left to `flask uploads gc`, which keeps its grace period for a
+   photo someone else just analyzed but has not logged yet.
+
+On PostgreSQL every step sets a short lock_timeout; a step that cannot get its
+locks is skipped and retried on the next run.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, or_, select, text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models import Meal, User, Workout
+from app.services import uploads
+from app.services.sql import advisory_lock
+from app.services.users import note_account_change
+
+logger = logging.getLogger(__name__)
+
+# pg_try_advisory_lock key so only one scheduler thread across all workers purges at a time
+ADVISORY_LOCK_KEY = 0x70757267  # "purg"
+
+
+def _is_postgres():
+    return db.engine.dialect.name == "postgresql"
+
+
+def _short_locks(config):
+    if _is_postgres():
+        db.session.execute(text(f"SET LOCAL lock_timeout = '{int(config['PURGE_LOCK_TIMEOUT_MS'])}ms'"))
+
+
+def due_user_ids(config, limit, now=None):
+    """Ids of expired guests and confirmed deletions, oldest first."""
+    now = now or datetime.now(timezone.utc)
+    guest_cutoff = now - timedelta(days=config["GUEST_TTL_DAYS"])
+    deletion_cutoff = now - timedelta(hours=config["ACCOUNT_DELETION_GRACE_HOURS"])
+    stmt = (
+        select(User.id)
+        .where(
+            or_(
+                User.is_guest.is_(True) & User.pooled.is_(False) & (User.created_at < guest_cutoff),
+                User.deletion_requested_at < deletion_cutoff,
+            )
+        )
+        .order_by(User.id)
+        .limit(limit)
+    )
+    return list(db.session.execute(stmt).scalars())
+
+
+def _delete_children(model, user_ids, chunk_rows, pause, config):
+    """
+    Delete a batch of users' rows from one table in chunks, releasing each chunk's image
+    references in the same transaction. Returns (rows, image paths).
+    """
+    returning = [model.id, model.image_path] if model is Meal else [model.id]
+    total = 0
+    image_paths = Counter()
+    while True:
+        chunk = select(model.id).where(model.user_id.in_(user_ids)).limit(chunk_rows).scalar_subquery()
+        _short_locks(config)
+        rows = db.session.execute(delete(model).where(model.id.in_(chunk)).returning(*returning)).all()
+        released = Counter(row.image_path for row in rows if model is Meal and row.image_path)
+        for image_path, count in released.items():
+            uploads.release(image_path, count)
+        db.session.commit()
+        if not rows:
+            return total, image_paths
+        total += len(rows)
+        image_paths.update(released)
+        time.sleep(pause)
+
+
+def purge_users(user_ids, config):
+    """Remove the given users and everything they own. Returns a stats dict."""
+    chunk_rows = config["PURGE_CHUNK_ROWS"]
+    pause = config["PURGE_PAUSE_SECONDS"]
+    meals, image_paths = _delete_children(Meal, user_ids, chunk_rows, pause, config)
+    workouts, _ = _delete_children(Workout, user_ids, chunk_rows, pause, config)
+
+    _short_locks(config)
+    db.session.execute(delete(User).where(User.id.in_(user_ids)))
+    note_account_change(db.session, user_ids)
+    db.session.commit()
+    files = uploads.delete_legacy_files(image_paths)
+    return {"users": len(user_ids), "meals": meals, "workouts": workouts, "files": files}
+
+
+def run(config, max_batches=None):
+    """Purge due users batch by batch until none are left. Returns accumulated stats."""
+    totals = Counter()
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        user_ids = due_user_ids(config, config["PURGE_BATCH_SIZE"])
+        if not user_ids:
+            break
+        try:
+            totals.update(purge_users(user_ids, config))
+        except OperationalError:  # lock_timeout hit: leave it for the next run
+            db.session.rollback()
+            logger.warning("Purge batch skipped: could not acquire locks in time")
+            break
+        batches += 1
+        time.sleep(config["PURGE_PAUSE_SECONDS"])
+    return dict(totals)
+
+
+def _run_exclusive(app):
+    with app.app_context():
+        try:
+            with advisory_lock(ADVISORY_LOCK_KEY) as got:
+                if not got:
+                    return
+                stats = run(app.config)
+                if stats:
+                    logger.info("Purged %s", stats)
+        finally:
+            db.session.remove()
+
+
+def start_scheduler(app):
+    """Run purges every PURGE_INTERVAL_SECONDS in a daemon thread (0 disables)."""
+    interval = app.config.get("PURGE_INTERVAL_SECONDS", 0)
+    if not interval:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                _run_exclusive(app)
+            except Exception:  # keep the scheduler alive; next run retries
+                logger.exception("Scheduled purge failed")
+
+    thread = threading.Thread(target=loop, name="purge-scheduler", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,193 @@
+"""
+Maintenance of the daily_totals rollup table.
+
+Every write path that creates, changes or removes a meal or workout calls
+add_meal()/add_workout() inside the same transaction, so the dashboard can read
+one rollup row per day instead of scanning raw entries. rebuild() recomputes
+rollups from the raw tables (backfill, or repair after manual SQL edits).
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, insert, literal, select, union_all
+
+from app import db
+from app.models import DailyTotal, Meal, Workout
+from app.services.cache import note_user_write
+from app.services.sql import upsert_insert
+
+ROLLUP_COLUMNS = (
+    "calories_in", "calories_out", "protein", "carbs", "fats", "meals_count", "workouts_count",
+)
+
+
+def utc_day(value):
+    """Calendar day (UTC) a timestamp belongs to; naive timestamps are taken as UTC."""
+    if value.tzinfo is None:
+        return value.date()
+    return value.astimezone(timezone.utc).date()
+
+
+def day_expr(column):
+    """UTC calendar day of a timestamptz column, as a SQL expression."""
+    if db.engine.dialect.name == "postgresql":
+        return func.date(func.timezone("UTC", column))
+    return func.date(column)
+
+
+def activity_rows(user_id=None, start=None, end=None):
+    """
+    One row per meal or workout, projected onto the rollup columns, so both tables
+    can be aggregated together in a single statement.
+    """
+    meals = select(
+        Meal.user_id.label("user_id"),
+        day_expr(Meal.logged_at).label("day"),
+        Meal.calories.label("calories_in"),
+        literal(0.0).label("calories_out"),
+        Meal.protein.label("protein"),
+        Meal.carbs.label("carbs"),
+        Meal.fats.label("fats"),
+        literal(1).label("meals_count"),
+        literal(0).label("workouts_count"),
+    )
+    workouts = select(
+        Workout.user_id,
+        day_expr(Workout.logged_at),
+        literal(0.0),
+        func.coalesce(Workout.calories_burned, 0.0),
+        literal(0.0),
+        literal(0.0),
+        literal(0.0),
+        literal(0),
+        literal(1),
+    )
+    if user_id is not None:
+        meals = meals.where(Meal.user_id == user_id)
+        workouts = workouts.where(Workout.user_id == user_id)
+    if start is not None:
+        meals = meals.where(Meal.logged_at >= start)
+        workouts = workouts.where(Workout.logged_at >= start)
+    if end is not None:
+        meals = meals.where(Meal.logged_at < end)
+        workouts = workouts.where(Workout.logged_at < end)
+    return union_all(meals, workouts).subquery("activity")
+
+
+def _upsert(values):
+    """ON CONFLICT upsert adding to existing rows; values is a dict or a list of dicts."""
+    stmt = upsert_insert(DailyTotal).values(values)
+    table = DailyTotal.__table__
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.day],
+        set_={col: table.c[col] + stmt.excluded[col] for col in ROLLUP_COLUMNS},
+    )
+
+
+def apply_delta(user_id, day, **deltas):
+    """Add deltas to the (user_id, day) rollup row, creating it if needed."""
+    apply_deltas({(user_id, day): deltas})
+
+
+def apply_deltas(deltas):
+    """
+    Apply many deltas at once: deltas maps (user_id, day) to {column: delta}.
+    Uses a single multi-row upsert, so a bulk write costs one rollup statement.
+    """
+    if not deltas:
+        return
+    rows = [
+        {"user_id": user_id, "day": day, **{col: values.get(col, 0) for col in ROLLUP_COLUMNS}}
+        for (user_id, day), values in deltas.items()
+    ]
+    db.session.execute(_upsert(rows))
+    note_user_write(db.session, {user_id for user_id, _ in deltas})
+
+
+def meal_rows_deltas(rows, sign=1):
+    """Aggregate meal column dicts (user_id, logged_at, calories, ...) into per-day deltas."""
+    deltas = {}
+    for row in rows:
+        bucket = deltas.setdefault((row["user_id"], utc_day(row["logged_at"])), dict.fromkeys(ROLLUP_COLUMNS, 0))
+        bucket["calories_in"] += sign * float(row.get("calories") or 0)
+        bucket["protein"] += sign * float(row.get("protein") or 0)
+        bucket["carbs"] += sign * float(row.get("carbs") or 0)
+        bucket["fats"] += sign * float(row.get("fats") or 0)
+        bucket["meals_count"] += sign
+    return deltas
+
+
+def workout_rows_deltas(rows, sign=1):
+    """Aggregate workout column dicts (user_id, logged_at, calories_burned) into per-day deltas."""
+    deltas = {}
+    for row in rows:
+        bucket = deltas.setdefault((row["user_id"], utc_day(row["logged_at"])), dict.fromkeys(ROLLUP_COLUMNS, 0))
+        bucket["calories_out"] += sign * float(row.get("calories_burned") or 0)
+        bucket["workouts_count"] += sign
+    return deltas
+
+
+def merge_deltas(*parts):
+    """Sum several (user_id, day) -> {column: delta} maps into one."""
+    merged = {}
+    for deltas in parts:
+        for key, values in deltas.items():
+            bucket = merged.setdefault(key, dict.fromkeys(ROLLUP_COLUMNS, 0))
+            for col, value in values.items():
+                bucket[col] += value
+    return merged
+
+
+def add_meal(meal, sign=1):
+    """Count a meal into its day's rollup; sign=-1 removes it again."""
+    apply_delta(
+        meal.user_id,
+        utc_day(meal.logged_at),
+        calories_in=sign * float(meal.calories or 0),
+        protein=sign * float(meal.protein or 0),
+        carbs=sign * float(meal.carbs or 0),
+        fats=sign * float(meal.fats or 0),
+        meals_count=sign,
+    )
+
+
+def add_workout(workout, sign=1):
+    """Count a workout into its day's rollup; sign=-1 removes it again."""
+    apply_delta(
+        workout.user_id,
+        utc_day(workout.logged_at),
+        calories_out=sign * float(workout.calories_burned or 0),
+        workouts_count=sign,
+    )
+
+
+def rebuild(user_id=None, from_day=None, to_day=None):
+    """
+    Recompute rollup rows from the raw meals/workouts tables with one
+    INSERT ... SELECT. Scoped to a user and/or a day range when given.
+    Returns the number of rollup rows written. Does not commit.
+    """
+    start = end = None
+    if from_day is not None:
+        start = datetime.combine(from_day, datetime.min.time()).replace(tzinfo=timezone.utc)
+    if to_day is not None:
+        end = datetime.combine(to_day + timedelta(days=1), datetime.min.time()).replace(tzinfo=timezone.utc)
+
+    stale = delete(DailyTotal)
+    if user_id is not None:
+        stale = stale.where(DailyTotal.user_id == user_id)
+    if from_day is not None:
+        stale = stale.where(DailyTotal.day >= from_day)
+    if to_day is not None:
+        stale = stale.where(DailyTotal.day <= to_day)
+    db.session.execute(stale)
+
+    rows = activity_rows(user_id, start, end)
+    source = select(
+        rows.c.user_id,
+        rows.c.day,
+        *[func.sum(rows.c[col]) for col in ROLLUP_COLUMNS],
+    ).group_by(rows.c.user_id, rows.c.day)
+    result = db.session.execute(
+        insert(DailyTotal).from_select(["user_id", "day", *ROLLUP_COLUMNS], source)
+    )
+    return result.rowcount
@@ -0,0 +1,73 @@
+"""
+Row serializers for list endpoints that skip ORM hydration.
+
+List and history views select only the serialized columns (plain Row tuples,
+no identity map, no attribute instrumentation) and turn each row into a dict
+by zipping it with the field names; only the positions of date/time columns,
+worked out once per model, get isoformat(). The output matches Model.to_dict().
+
+dumps() uses orjson when it is installed and falls back to the standard
+library encoder.
+"""
+import json
+
+from flask import Response
+
+from app import db
+from app.models import Meal, Workout
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+MEAL_FIELDS = (
+    "id", "user_id", "image_path", "calories", "protein", "carbs", "fats", "name", "logged_at", "created_at", "updated_at",
+)
+WORKOUT_FIELDS = (
+    "id", "user_id", "name", "duration_minutes", "calories_burned", "notes", "logged_at", "created_at", "updated_at",
+)
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+class RowSerializer:
+    """Column list plus a row -> dict function for one model."""
+
+    def __init__(self, model, fields):
+        self.fields = tuple(fields)
+        self.columns = [getattr(model, name) for name in self.fields]
+        temporal = tuple(
+            i for i, name in enumerate(self.fields)
+            if isinstance(model.__table__.c[name].type, (db.DateTime, db.Date))
+        )
+        keys = self.fields
+
+        def to_dict(row):
+            values = list(row)
+            for i in temporal:
+                values[i] = _iso(values[i])
+            return dict(zip(keys, values))
+
+        self.to_dict = to_dict
+
+    def many(self, rows):
+        to_dict = self.to_dict
+        return [to_dict(row) for row in rows]
+
+
+meal_rows = RowSerializer(Meal, MEAL_FIELDS)
+workout_rows = RowSerializer(Workout, WORKOUT_FIELDS)
+
+
+def dumps(payload):
+    """Compact JSON as bytes."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def json_response(payload, status=200):
+    return Response(dumps(payload), status=status, mimetype="application/json")
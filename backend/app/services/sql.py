@@ -0,0 +1,39 @@
+"""Dialect helpers for statements that differ between PostgreSQL and SQLite."""
+from contextlib import contextmanager
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import db
+
+
+def upsert_insert(model):
+    """INSERT supporting .on_conflict_do_update()/.on_conflict_do_nothing() on the current dialect."""
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        return pg_insert(model)
+    if dialect == "sqlite":
+        return sqlite_insert(model)
+    raise RuntimeError(f"ON CONFLICT inserts not supported on {dialect}")
+
+
+@contextmanager
+def advisory_lock(key):
+    """
+    Yield True if this process got the session-level PostgreSQL advisory lock `key`
+    (always True elsewhere). The lock lives on its own connection, so the ORM session
+    can commit and return its connections to the pool while the lock is held.
+    """
+    if db.engine.dialect.name != "postgresql":
+        yield True
+        return
+    with db.engine.connect() as conn:
+        got = conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": key}).scalar()
+        conn.commit()
+        try:
+            yield bool(got)
+        finally:
+            if got:
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": key})
+                conn.commit()
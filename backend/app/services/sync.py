@@ -0,0 +1,115 @@
+"""
+Delta sync for offline-capable clients (GET /api/sync).
+
+Every meal and workout carries updated_at, set on insert and on each UPDATE;
+deletes leave a Tombstone. A change feed page is the user's rows from all three
+tables ordered by (changed_at, kind, id), where kind is "meal", "tombstone" or
+"workout". The sync token is that key for the last row sent, encoded like the
+pagination cursors. Each table is read with one range scan on its
+(user_id, updated_at/deleted_at) index, and the three short lists are merged.
+
+Timestamps are taken when a statement runs, not when its transaction commits,
+so a slow transaction can commit rows stamped earlier than rows another client
+has already synced. To avoid skipping them, a page only includes changes older
+than SYNC_SETTLE_SECONDS; transactions are expected to finish within that time.
+Changes show up on the next sync after that delay.
+"""
+import heapq
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, select, tuple_
+
+from app import db
+from app.models import Meal, Tombstone, Workout
+from app.services.pagination import decode_cursor, encode_cursor
+from app.services.serializers import meal_rows, workout_rows
+
+# Sorts after every kind: a token at (t, END) means "everything up to t was sent"
+END = "~"
+
+
+class TokenExpired(ValueError):
+    """The token predates the tombstone retention window; the client must resync from scratch."""
+
+
+def record_deletions(kind, user_id, record_ids, deleted_at=None):
+    """Add tombstones for deleted rows in one INSERT. Does not commit."""
+    if not record_ids:
+        return
+    deleted_at = deleted_at or datetime.now(timezone.utc)
+    db.session.execute(
+        insert(Tombstone),
+        [{"user_id": user_id, "kind": kind, "record_id": record_id, "deleted_at": deleted_at} for record_id in record_ids],
+    )
+
+
+def prune_tombstones(retention_days):
+    """Delete tombstones older than retention_days. Commits; returns the count."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    removed = db.session.execute(delete(Tombstone).where(Tombstone.deleted_at < cutoff)).rowcount
+    db.session.commit()
+    return removed
+
+
+def parse_token(token, retention_days):
+    """(changed_at, kind, id) from a sync token, or None for a full sync. Raises ValueError/TokenExpired."""
+    if not token:
+        return None
+    values = decode_cursor(token)
+    if len(values) != 3 or not isinstance(values[0], datetime) or not isinstance(values[2], int):
+        raise ValueError("Invalid sync token")
+    at = values[0] if values[0].tzinfo else values[0].replace(tzinfo=timezone.utc)
+    if at < datetime.now(timezone.utc) - timedelta(days=retention_days):
+        raise TokenExpired("Sync token expired; sync again without since")
+    return values
+
+
+def _branch(kind, columns, changed_at, record_id, user_id, after, until, limit):
+    """Rows of one kind after the token, oldest change first (kind is constant per branch)."""
+    stmt = select(*columns).where(columns[0].table.c.user_id == user_id, changed_at <= until)
+    if after is not None:
+        at, after_kind, after_id = after
+        if kind > after_kind:
+            stmt = stmt.where(changed_at >= at)
+        elif kind == after_kind:
+            stmt = stmt.where(tuple_(changed_at, record_id) > tuple_(at, after_id))
+        else:
+            stmt = stmt.where(changed_at > at)
+    rows = db.session.execute(stmt.order_by(changed_at, record_id).limit(limit)).all()
+    return [(getattr(row, changed_at.key), kind, getattr(row, record_id.key), row) for row in rows]
+
+
+def changes(user_id, after, limit, settle_seconds):
+    """
+    The next page of changes after `after` (None: from the beginning).
+    Returns {"meals", "workouts", "deleted", "next", "has_more"}.
+    """
+    until = datetime.now(timezone.utc) - timedelta(seconds=settle_seconds)
+    branches = [
+        _branch("meal", meal_rows.columns, Meal.updated_at, Meal.id, user_id, after, until, limit + 1),
+        _branch(
+            "tombstone",
+            [Tombstone.id, Tombstone.kind, Tombstone.record_id, Tombstone.deleted_at],
+            Tombstone.deleted_at, Tombstone.id, user_id, after, until, limit + 1,
+        ),
+        _branch("workout", workout_rows.columns, Workout.updated_at, Workout.id, user_id, after, until, limit + 1),
+    ]
+    page = list(heapq.merge(*branches, key=lambda entry: entry[:3]))
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    result = {"meals": [], "workouts": [], "deleted": []}
+    for _changed_at, kind, _id, row in page:
+        if kind == "meal":
+            result["meals"].append(meal_rows.to_dict(row))
+        elif kind == "workout":
+            result["workouts"].append(workout_rows.to_dict(row))
+        else:
+            result["deleted"].append({"kind": row.kind, "id": row.record_id, "deleted_at": row.deleted_at.isoformat()})
+    if has_more:
+        last = page[-1]
+        result["next"] = encode_cursor(last[0], last[1], last[2])
+    else:
+        result["next"] = encode_cursor(until, END, 0)
+    result["has_more"] = has_more
+    return result
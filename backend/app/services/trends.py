@@ -0,0 +1,87 @@
+"""
+Long-range trends from the daily_totals rollup.
+
+One indexed range query loads the user's rollup rows (at most one per day) into
+a dense NumPy matrix, days x ROLLUP_COLUMNS, with missing days left at zero.
+Bucketing into weeks (Monday start) or calendar months is an np.add.reduceat
+over bucket boundaries, and the trailing 7- and 30-day averages come from one
+cumulative sum, so a year of daily points costs one query plus a handful of
+vectorized operations. The query starts 29 days before `from` so the averages
+at the start of the range are computed over full windows.
+"""
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import select
+
+from app import db
+from app.models import DailyTotal
+from app.services.rollups import ROLLUP_COLUMNS
+
+BUCKETS = ("day", "week", "month")
+WINDOWS = (7, 30)
+COUNT_COLUMNS = ("meals_count", "workouts_count")
+AVERAGED_COLUMNS = tuple(col for col in ROLLUP_COLUMNS if col not in COUNT_COLUMNS)
+
+
+def daily_matrix(user_id, start, end):
+    """Rollup values for every day in [start, end] as a (days, len(ROLLUP_COLUMNS)) float array."""
+    rows = db.session.execute(
+        select(DailyTotal.day, *[getattr(DailyTotal, col) for col in ROLLUP_COLUMNS]).where(
+            DailyTotal.user_id == user_id,
+            DailyTotal.day >= start,
+            DailyTotal.day <= end,
+        )
+    ).all()
+    matrix = np.zeros(((end - start).days + 1, len(ROLLUP_COLUMNS)))
+    if rows:
+        index = np.fromiter(((row[0] - start).days for row in rows), dtype=np.intp, count=len(rows))
+        matrix[index] = np.array([row[1:] for row in rows], dtype=float)
+    return matrix
+
+
+def trailing_mean(values, window):
+    """Mean over the `window` rows ending at each row; the first window-1 rows are dropped."""
+    cumulative = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+    return (cumulative[window:] - cumulative[:-window]) / window
+
+
+def bucket_keys(days, bucket):
+    """Start date (datetime64[D]) of the bucket each day falls in."""
+    if bucket == "week":
+        # datetime64 day 0 (1970-01-01) was a Thursday; shift back to the Monday
+        return days - (days.astype(np.int64) + 3) % 7
+    if bucket == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    return days
+
+
+def trends(user_id, start, end, bucket="day"):
+    """Gap-filled totals per bucket over [start, end] plus trailing 7/30-day daily averages."""
+    warmup = max(WINDOWS) - 1
+    matrix = daily_matrix(user_id, start - timedelta(days=warmup), end)
+    values = matrix[warmup:]
+    rolling = {window: trailing_mean(matrix[warmup - window + 1:], window) for window in WINDOWS}
+
+    days = np.arange(np.datetime64(start), np.datetime64(end + timedelta(days=1)), dtype="datetime64[D]")
+    keys = bucket_keys(days, bucket)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(days)] - 1
+    totals = np.round(np.add.reduceat(values, starts, axis=0), 1)
+
+    float_idx = [ROLLUP_COLUMNS.index(col) for col in AVERAGED_COLUMNS]
+    averages = {window: np.round(rolling[window][ends][:, float_idx], 1) for window in WINDOWS}
+
+    first_days = days[starts].astype(str).tolist()
+    last_days = days[ends].astype(str).tolist()
+    totals = totals.tolist()
+    averages = {window: rows.tolist() for window, rows in averages.items()}
+    series = []
+    for i, first_day in enumerate(first_days):
+        point = {"start": first_day, "end": last_days[i]}
+        for col, value in zip(ROLLUP_COLUMNS, totals[i]):
+            point[col] = int(value) if col in COUNT_COLUMNS else value
+        for window in WINDOWS:
+            point[f"avg_{window}d"] = dict(zip(AVERAGED_COLUMNS, averages[window][i]))
+        series.append(point)
+    return series
@@ -0,0 +1,340 @@
+"""
+Content-addressed storage for meal images.
+
+Uploads are streamed in fixed-size chunks: the type is sniffed from the magic
+bytes, then the content is hashed and written to a temp file in the same pass,
+so memory per upload stays at one chunk. Each distinct content is stored once
+under UPLOAD_FOLDER as ab/cd/<sha256>.<ext> and tracked in upload_blobs.
+Re-sending the same photo (e.g. a mobile retry) discards the temp file and
+reuses the cached analysis. Meals reference images by relative path; legacy
+<uuid>.<ext> names at the folder root keep resolving through resolve_path().
+
+refcount counts meals pointing at a blob. Blobs that drop to zero references
+are deleted by collect_garbage() after a grace period, so a photo analyzed
+without saving a meal can still be logged shortly after.
+"""
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import select, update
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from app import db
+from app.models import Meal, UploadBlob
+from app.services.sql import upsert_insert
+
+CHUNK_SIZE = 64 * 1024
+SNIFF_BYTES = 12  # enough to identify png, jpeg, gif and webp
+MAX_FORM_FIELD_BYTES = 64 * 1024  # text fields sent alongside a multipart upload
+
+
+@dataclass
+class StoredUpload:
+    path: str  # relative to UPLOAD_FOLDER, suitable for Meal.image_path
+    digest: str
+    size: int
+    analysis: dict = None  # cached analyzer output, if this content was seen before
+    created: bool = False  # False when the content was already stored
+    received: int = 0  # bytes read from the client, before any downscaling
+
+
+def upload_root():
+    return current_app.config["UPLOAD_FOLDER"]
+
+
+def blob_path(digest, ext):
+    """Sharded relative path for a digest: ab/cd/abcd....ext"""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+
+def resolve_path(image_path):
+    """Absolute filesystem path for a Meal.image_path (hash or legacy uuid name), or None."""
+    if not image_path:
+        return None
+    root = os.path.realpath(upload_root())
+    full = os.path.realpath(os.path.join(root, image_path))
+    if os.path.commonpath([root, full]) != root:  # reject ../ escapes
+        return None
+    return full
+
+
+def is_stored(image_path):
+    """True if image_path is a path returned by store(); meals may only reference those."""
+    return isinstance(image_path, str) and db.session.execute(
+        select(UploadBlob.digest).where(UploadBlob.path == image_path).limit(1)
+    ).first() is not None
+
+
+class UploadRejected(ValueError):
+    """The upload is not an accepted image (or is too large); nothing was stored."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def sniff_image_type(head):
+    """Extension for the image type given the first bytes of a file, or None."""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def iter_chunks(stream, size=CHUNK_SIZE):
+    """Read a file-like object in fixed-size chunks."""
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+class MultipartUpload:
+    """
+    multipart/form-data body read from the socket as it arrives, without spooling it the
+    way request.files does. find_file() collects text fields up to the first file part
+    with an accepted name; file_chunks() then yields that file's bytes straight from the
+    stream, so store() can reject a non-image after its first chunk. finish() reads the
+    rest and returns all text fields. Malformed bodies raise ValueError.
+    """
+
+    def __init__(self, stream, boundary):
+        self.stream = stream
+        self.decoder = MultipartDecoder(boundary.encode(), MAX_FORM_FIELD_BYTES, max_parts=100)
+        self.form = {}
+        self._eof = False
+        self._done = False
+
+    def _next(self):
+        while True:
+            event = self.decoder.next_event()
+            if not isinstance(event, NeedData):
+                return event
+            if self._eof:
+                raise ValueError("Unexpected end of multipart body")
+            chunk = self.stream.read(CHUNK_SIZE)
+            self._eof = not chunk
+            self.decoder.receive_data(chunk or None)
+
+    def _drain_part(self, keep=None):
+        while True:
+            event = self._next()
+            if not isinstance(event, Data):
+                raise ValueError("Malformed multipart body")
+            if keep is not None:
+                keep.append(event.data)
+            if not event.more_data:
+                return
+
+    def _skip_to(self, names):
+        """Next file part named in `names` (or Epilogue), keeping text fields on the way."""
+        while not self._done:
+            event = self._next()
+            if isinstance(event, Epilogue):
+                self._done = True
+            elif isinstance(event, File) and event.name in names:
+                return event
+            elif isinstance(event, Field):
+                parts = []
+                self._drain_part(parts)
+                self.form.setdefault(event.name, b"".join(parts).decode("utf-8", "replace"))
+            elif isinstance(event, File):
+                self._drain_part()
+        return None
+
+    def find_file(self, names):
+        """Filename of the first file part called one of `names`, or None if there is none."""
+        part = self._skip_to(names)
+        return part.filename if part is not None else None
+
+    def file_chunks(self):
+        while True:
+            event = self._next()
+            if not isinstance(event, Data):
+                raise ValueError("Malformed multipart body")
+            if event.data:
+                yield event.data
+            if not event.more_data:
+                return
+
+    def finish(self):
+        """Read the remaining parts; returns the text fields."""
+        self._skip_to(())
+        return self.form
+
+
+def _receive(chunks, out, max_bytes):
+    """
+    Copy chunks to `out` while hashing them, in one pass. The image type is sniffed
+    from the first bytes, so non-images are rejected before the rest is read.
+    Returns (sha256 hex digest, size, extension).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    ext = None
+    head = b""
+    for chunk in chunks:
+        if ext is None:
+            head += chunk
+            if len(head) < SNIFF_BYTES:
+                continue
+            ext = sniff_image_type(head)
+            if ext is None:
+                raise UploadRejected("Not a supported image (png, jpg, jpeg, webp, gif)")
+            chunk, head = head, b""
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise UploadRejected("Image too large", status=413)
+        digest.update(chunk)
+        out.write(chunk)
+    if ext is None:  # tiny file: fewer bytes than SNIFF_BYTES
+        ext = sniff_image_type(head)
+        if ext is None:
+            raise UploadRejected("Not a supported image (png, jpg, jpeg, webp, gif)")
+        size = len(head)
+        digest.update(head)
+        out.write(head)
+    return digest.hexdigest(), size, ext
+
+
+def _downscale(path, max_dimension):
+    """
+    Shrink an image whose longest side exceeds max_dimension, in place.
+    JPEGs use draft mode so the decoder itself scales by 1/2, 1/4 or 1/8 and never
+    materializes the full-resolution bitmap. Animated images are left untouched.
+    Raises UploadRejected if Pillow cannot parse the file.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(path) as img:
+            if max(img.size) <= max_dimension or getattr(img, "n_frames", 1) > 1:
+                return
+            fmt = img.format
+            if fmt == "JPEG":
+                img.draft("RGB", (max_dimension, max_dimension))
+            img.thumbnail((max_dimension, max_dimension), reducing_gap=2.0)
+            resized_path = f"{path}.resized"
+            save_options = {"quality": 85} if fmt in ("JPEG", "WEBP") else {}
+            img.save(resized_path, format=fmt, **save_options)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as exc:
+        raise UploadRejected("Corrupt or unsupported image") from exc
+    os.replace(resized_path, path)
+
+
+def store(chunks):
+    """
+    Stream an upload to disk by content hash. `chunks` is an iterable of bytes,
+    consumed once: the hash and the temp file are produced in the same pass.
+    Oversized images are downscaled to UPLOAD_MAX_DIMENSION; the address is the
+    hash of the bytes as sent, so client retries still deduplicate.
+    Commits the blob row. Raises UploadRejected for non-images.
+    """
+    config = current_app.config
+    incoming = os.path.join(upload_root(), ".incoming")
+    os.makedirs(incoming, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=incoming)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            digest, size, ext = _receive(chunks, out, config.get("MAX_CONTENT_LENGTH"))
+
+        blob = db.session.get(UploadBlob, digest)
+        if blob is not None and os.path.exists(resolve_path(blob.path)):
+            os.remove(tmp_path)
+            blob.last_used_at = datetime.now(timezone.utc)
+            db.session.commit()
+            return StoredUpload(blob.path, digest, blob.size, blob.analysis, created=False, received=size)
+
+        _downscale(tmp_path, config["UPLOAD_MAX_DIMENSION"])
+        path = blob.path if blob is not None else blob_path(digest, ext)
+        full_path = resolve_path(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.replace(tmp_path, full_path)  # atomic; concurrent writers of the same digest agree on content
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    stored_size = os.path.getsize(full_path)
+    db.session.execute(
+        upsert_insert(UploadBlob)
+        .values(digest=digest, path=path, size=stored_size, refcount=0)
+        .on_conflict_do_nothing(index_elements=[UploadBlob.__table__.c.digest])
+    )
+    db.session.commit()
+    return StoredUpload(
+        path, digest, stored_size, blob.analysis if blob is not None else None, created=True, received=size
+    )
+
+
+def cache_analysis(image_path, result):
+    """Remember the analyzer output for the stored content at image_path. Does not commit."""
+    db.session.execute(update(UploadBlob).where(UploadBlob.path == image_path).values(analysis=result))
+
+
+def cached_analysis(image_path):
+    """Cached analyzer output for a stored path, or None (legacy names have no cache)."""
+    return db.session.execute(
+        db.select(UploadBlob.analysis).where(UploadBlob.path == image_path)
+    ).scalar()
+
+
+def retain(image_path, count=1):
+    """Add meal references to the blob at image_path (no-op for legacy names). Does not commit."""
+    if image_path and count:
+        db.session.execute(
+            update(UploadBlob)
+            .where(UploadBlob.path == image_path)
+            .values(refcount=UploadBlob.refcount + count, last_used_at=datetime.now(timezone.utc))
+        )
+
+
+def release(image_path, count=1):
+    """Drop meal references; the file is removed later by collect_garbage(). Does not commit."""
+    retain(image_path, -count)
+
+
+def collect_garbage(grace_seconds, limit=1000):
+    """Delete unreferenced blobs idle for longer than grace_seconds. Commits; returns the count."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace_seconds)
+    blobs = (
+        UploadBlob.query.filter(UploadBlob.refcount <= 0, UploadBlob.last_used_at < cutoff)
+        .limit(limit)
+        .all()
+    )
+    for blob in blobs:
+        full = resolve_path(blob.path)
+        if full and os.path.isfile(full):
+            os.remove(full)
+        db.session.delete(blob)
+    db.session.commit()
+    return len(blobs)
+
+
+def delete_legacy_files(image_paths):
+    """
+    Remove legacy uuid-named files (no upload_blobs row) among the given paths once no meal
+    references them (used when purging accounts). Blobs are left to collect_garbage() and
+    its grace period. Returns the number of files deleted.
+    """
+    removed = 0
+    for image_path in set(image_paths):
+        if db.session.execute(select(UploadBlob.digest).where(UploadBlob.path == image_path).limit(1)).first():
+            continue
+        if db.session.execute(select(Meal.id).where(Meal.image_path == image_path).limit(1)).first():
+            continue
+        full = resolve_path(image_path)
+        if full and os.path.isfile(full):
+            os.remove(full)
+            removed += 1
+    return removed
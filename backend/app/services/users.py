@@ -0,0 +1,115 @@
+"""
+Per-process cache of authenticated users, wired into Flask-JWT-Extended.
+
+Every @jwt_required view resolves its token through the user lookup loader, so
+a token for a missing or deletion-pending account is rejected with 401 before
+the view runs. Loaded users are kept as immutable UserSnapshot values (never ORM
+objects, which belong to one request's session) in an LRUCache, so the common
+case is a dict lookup and no query.
+
+Entries expire after USER_CACHE_TTL seconds. Writes that change what the
+snapshot holds (registration of a guest, password changes, deletion requests,
+purges) call note_account_change(); the entry is dropped when that transaction
+commits. Like the local response cache, this only reaches the current process;
+other workers see the change within USER_CACHE_TTL.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+
+from flask import jsonify
+from sqlalchemy import event, select
+
+from app.services.cache import LRUCache
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    id: int
+    email: str
+    is_guest: bool
+    created_at: datetime
+    deletion_requested_at: datetime = None
+
+    @property
+    def active(self):
+        return self.deletion_requested_at is None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "email": self.email,
+            "is_guest": bool(self.is_guest),
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+class UserCache:
+    """Snapshot cache keyed by user id; see module docstring."""
+
+    def __init__(self):
+        self.entries = LRUCache()
+        self.loads = 0
+        self.invalidations = 0
+
+    def init_app(self, app, jwt):
+        from app import db
+
+        self.entries = LRUCache(app.config.get("USER_CACHE_MAX_ENTRIES", 10000), app.config.get("USER_CACHE_TTL", 60))
+        app.extensions["user_cache"] = self
+
+        @jwt.user_lookup_loader
+        def _lookup(_jwt_header, jwt_data):
+            user = self.get(jwt_data[app.config["JWT_IDENTITY_CLAIM"]])
+            return user if user is not None and user.active else None
+
+        @jwt.user_lookup_error_loader
+        def _lookup_error(_jwt_header, _jwt_data):
+            return jsonify({"error": "User not found"}), 401
+
+        if not getattr(self, "_listening", False):
+            event.listen(db.session, "after_commit", self._after_commit)
+            event.listen(db.session, "after_rollback", self._after_rollback)
+            self._listening = True
+
+    def get(self, user_id):
+        """Snapshot for user_id, from the cache or one primary-key query; None if missing."""
+        snapshot = self.entries.get(user_id)
+        if snapshot is None:
+            snapshot = self._load(user_id)
+            if snapshot is not None:
+                self.entries.set(user_id, snapshot)
+        return snapshot
+
+    def _load(self, user_id):
+        from app import db
+        from app.models import User
+
+        self.loads += 1
+        row = db.session.execute(
+            select(User.id, User.email, User.is_guest, User.created_at, User.deletion_requested_at)
+            .where(User.id == user_id)
+        ).first()
+        return UserSnapshot(*row) if row is not None else None
+
+    def invalidate(self, user_id):
+        self.entries.delete(user_id)
+        self.invalidations += 1
+
+    def _after_commit(self, session):
+        for user_id in session.info.pop("changed_accounts", ()):
+            self.invalidate(user_id)
+
+    @staticmethod
+    def _after_rollback(session):
+        session.info.pop("changed_accounts", None)
+
+    def stats(self):
+        return {**self.entries.stats(), "loads": self.loads, "invalidations": self.invalidations}
+
+
+user_cache = UserCache()
+
+
+def note_account_change(session, user_ids):
+    """Record that this transaction changes these accounts; their snapshots drop on commit."""
+    session.info.setdefault("changed_accounts", set()).update(user_ids)
@@ -0,0 +1,77 @@
+"""
+Throughput of the text nutrition matcher (app/services/nutrition.py).
+
+Builds a corpus of realistic meal descriptions from the bundled food table
+(quantities, units, plurals, truncated words, several foods per line) and
+reports lookups per second and mean latency.
+
+    cd backend
+    python -m benchmarks.bench_food_matcher --descriptions 5000 --rounds 5
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+
+from app.services.nutrition import FoodIndex
+
+QUANTITIES = ["", "a", "one", "two", "three", "half a", "1", "2", "1/2", "1.5", "100g", "200 g", "250ml", "3 oz"]
+UNITS = ["", "", "", "cup of", "slices of", "bowl of", "glass of", "tbsp", "handful of", "serving of"]
+JOINERS = [" and ", ", ", " with ", " plus "]
+NOISE = ["homemade", "leftover", "quick", "big", "small", "my usual"]
+
+
+def build_corpus(index, size, seed=1):
+    rng = random.Random(seed)
+    labels = [label for food in index.foods for label in [food["name"], *food.get("aliases", ())]]
+    corpus = []
+    for _ in range(size):
+        parts = []
+        for _ in range(rng.randint(1, 4)):
+            label = rng.choice(labels)
+            if rng.random() < 0.1 and len(label) > 6:
+                label = label[: len(label) - 2]  # truncated word, resolved by the trie
+            part = " ".join(p for p in (rng.choice(QUANTITIES), rng.choice(UNITS), label) if p)
+            if rng.random() < 0.15:
+                part = f"{rng.choice(NOISE)} {part}"
+            parts.append(part)
+        text = parts[0]
+        for part in parts[1:]:
+            text += rng.choice(JOINERS) + part
+        corpus.append(text)
+    return corpus
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--descriptions", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    index = FoodIndex.load()
+    load_ms = (time.perf_counter() - started) * 1000
+    corpus = build_corpus(index, args.descriptions)
+
+    rates = []
+    matched = 0
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        for text in corpus:
+            index.estimate(text)
+        elapsed = time.perf_counter() - started
+        rates.append(len(corpus) / elapsed)
+    for text in corpus:
+        matched += bool(index.estimate(text)["items"])
+
+    best = max(rates)
+    print(f"foods: {len(index.foods)}  phrases: {len(index.phrase_food)}  index load: {load_ms:.1f} ms")
+    print(f"corpus: {len(corpus)} descriptions, {matched / len(corpus):.1%} with at least one match")
+    print(f"throughput: best {best:,.0f}/s, median {statistics.median(rates):,.0f}/s")
+    print(f"latency: {1e6 / best:.1f} us per description")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Per-row cost of the list endpoint serialization paths.
+
+Compares, for one page of meals:
+
+- orm:     Meal.query ... .all(), Meal.to_dict() per row, then app.json.dumps
+           (what jsonify did before)
+- columns: column-tuple query, RowSerializer, serializers.dumps
+           (orjson when installed)
+
+and also times serialization alone on already-fetched rows. Uses an in-memory
+SQLite database, so absolute numbers exclude network and PostgreSQL time.
+
+    cd backend
+    python -m benchmarks.bench_serialization --rows 100 --rounds 2000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app import create_app, db  # noqa: E402
+from app.models import Meal, User  # noqa: E402
+from app.services import serializers  # noqa: E402
+from app.services.serializers import meal_rows  # noqa: E402
+
+
+def seed(rows):
+    user = User(email="bench@example.com")
+    db.session.add(user)
+    db.session.flush()
+    start = datetime.now(timezone.utc)
+    db.session.add_all(
+        Meal(
+            user_id=user.id,
+            name=f"Meal {i}",
+            calories=400 + i,
+            protein=20.5,
+            carbs=50.25,
+            fats=12.0,
+            image_path=None if i % 3 else f"ab/cd/{i:064x}.jpg",
+            logged_at=start - timedelta(minutes=i),
+        )
+        for i in range(rows)
+    )
+    db.session.commit()
+    return user.id
+
+
+def timed(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100, help="Rows per page.")
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    app = create_app("production")
+    with app.app_context():
+        db.create_all()
+        user_id = seed(args.rows)
+
+        def orm_page():
+            items = (
+                Meal.query.filter_by(user_id=user_id)
+                .order_by(Meal.logged_at.desc(), Meal.id.desc())
+                .limit(args.rows)
+                .all()
+            )
+            body = app.json.dumps({"meals": [m.to_dict() for m in items]})
+            db.session.expunge_all()  # a new request starts with an empty identity map
+            return body
+
+        def column_page():
+            rows = (
+                Meal.query.with_entities(*meal_rows.columns)
+                .filter_by(user_id=user_id)
+                .order_by(Meal.logged_at.desc(), Meal.id.desc())
+                .limit(args.rows)
+                .all()
+            )
+            return serializers.dumps({"meals": meal_rows.many(rows)})
+
+        assert app.json.loads(orm_page()) == app.json.loads(column_page())
+
+        orm_items = Meal.query.filter_by(user_id=user_id).all()
+        tuples = Meal.query.with_entities(*meal_rows.columns).filter_by(user_id=user_id).all()
+        results = {
+            "orm (query + to_dict + json)": timed(orm_page, args.rounds),
+            "columns (query + serializer + json)": timed(column_page, args.rounds),
+            "to_dict + json only": timed(lambda: app.json.dumps([m.to_dict() for m in orm_items]), args.rounds),
+            "serializer + json only": timed(lambda: serializers.dumps(meal_rows.many(tuples)), args.rounds),
+        }
+
+    encoder = "orjson" if serializers.orjson is not None else "json (stdlib)"
+    print(f"rows per page: {args.rows}  rounds: {args.rounds}  encoder: {encoder}")
+    for label, seconds in results.items():
+        print(f"{label:38s} {seconds * 1e3:8.3f} ms/page  {seconds * 1e6 / args.rows:7.2f} us/row")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+"""
+Load test for the main endpoints, reporting latency percentiles and throughput.
+
+Drives the real routes either in-process through the Flask test client (default)
+or over HTTP against a running server (--url). Requests run as users created by
+benchmarks.seed; access tokens are minted locally, so with --url the server must
+share JWT_SECRET_KEY with this process.
+
+    cd backend
+    python -m benchmarks.seed --users 20 --create-tables       # once
+    python -m benchmarks.load --requests 500 --concurrency 8
+    python -m benchmarks.load --url http://127.0.0.1:5000 --compare benchmarks/results/<earlier>.json
+
+Each run is saved as JSON under --output (default benchmarks/results/) with the
+git revision and settings, so runs can be compared over time with --compare.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app, db
+from app.models import User
+from app.services.nutrition import FoodIndex
+from benchmarks.bench_food_matcher import build_corpus
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _summary(rng, ctx):
+    today = datetime.now(timezone.utc).date()
+    start = today - timedelta(days=rng.choice((0, 6, 29)))
+    return "GET", f"/api/dashboard/summary?from={start}&to={today}&granularity=day", None
+
+
+def _history(rng, ctx):
+    return "GET", "/api/dashboard/history?limit=20", None
+
+
+def _list_meals(rng, ctx):
+    return "GET", "/api/meals?cursor=&per_page=50", None
+
+
+def _analyze_text(rng, ctx):
+    return "POST", "/api/analyze/text", {"description": rng.choice(ctx["corpus"])}
+
+
+def _guest(rng, ctx):
+    return "POST", "/api/auth/guest", None
+
+
+# name -> (request builder, needs a user token)
+SCENARIOS = {
+    "summary": (_summary, True),
+    "history": (_history, True),
+    "list_meals": (_list_meals, True),
+    "analyze_text": (_analyze_text, True),
+    "guest": (_guest, False),
+}
+
+
+class TestClientTransport:
+    """In-process requests; one test client per thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body, headers):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body, headers=headers)
+        response.close()
+        return response.status_code
+
+
+class HttpTransport:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, path, body, headers):
+        data = json.dumps(body).encode() if body is not None else None
+        headers = dict(headers, **({"Content-Type": "application/json"} if data is not None else {}))
+        req = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as exc:
+            return exc.code
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_scenario(transport, builder, tokens, ctx, requests, concurrency, warmup, seed):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    remaining = iter(range(warmup + requests))
+
+    def worker(worker_id):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        while True:
+            with lock:
+                n = next(remaining, None)
+            if n is None:
+                return
+            method, path, body = builder(rng, ctx)
+            headers = {"Authorization": f"Bearer {rng.choice(tokens)}"} if tokens else {}
+            started = time.perf_counter()
+            status = transport.request(method, path, body, headers)
+            elapsed = time.perf_counter() - started
+            if n < warmup:
+                continue
+            with lock:
+                latencies.append(elapsed)
+                errors += status >= 400
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    ms = [value * 1000 for value in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else None,
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else None,
+        "p50_ms": round(percentile(ms, 50), 3) if ms else None,
+        "p95_ms": round(percentile(ms, 95), 3) if ms else None,
+        "p99_ms": round(percentile(ms, 99), 3) if ms else None,
+        "max_ms": round(ms[-1], 3) if ms else None,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_table(results, baseline=None):
+    print(f"{'scenario':14s} {'req':>6s} {'err':>5s} {'rps':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    for name, r in results.items():
+        line = (
+            f"{name:14s} {r['requests']:6d} {r['errors']:5d} {r['throughput_rps']:9.1f} "
+            f"{r['p50_ms']:9.2f} {r['p95_ms']:9.2f} {r['p99_ms']:9.2f}"
+        )
+        before = (baseline or {}).get(name)
+        if before and before.get("p95_ms"):
+            line += f"   p95 {(r['p95_ms'] - before['p95_ms']) / before['p95_ms']:+.0%} vs baseline"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running server (default: in-process test client).")
+    parser.add_argument("--requests", type=int, default=300, help="Measured requests per scenario.")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per scenario.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--users", type=int, default=50, help="Seeded users to spread requests over.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=RESULTS_DIR, help="Directory for the JSON result ('' to skip).")
+    parser.add_argument("--compare", help="Earlier result JSON to compare p95 against.")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    app = create_app("production")
+    with app.app_context():
+        user_ids = db.session.execute(
+            db.select(User.id).where(User.email.like("bench\\_%", escape="\\")).order_by(User.id).limit(args.users)
+        ).scalars().all()
+        if not user_ids:
+            print("No seeded users found; run python -m benchmarks.seed first.", file=sys.stderr)
+            return 1
+        tokens = [create_access_token(identity=user_id) for user_id in user_ids]
+        dialect = db.engine.dialect.name
+        db.session.remove()
+
+    ctx = {"corpus": build_corpus(FoodIndex.load(), 500, seed=args.seed)}
+    transport = HttpTransport(args.url) if args.url else TestClientTransport(app)
+    results = {}
+    for name in names:
+        builder, needs_user = SCENARIOS[name]
+        results[name] = run_scenario(
+            transport, builder, tokens if needs_user else None, ctx,
+            args.requests, args.concurrency, args.warmup, args.seed,
+        )
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)["scenarios"]
+    _print_table(results, baseline)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "target": args.url or "test-client",
+            "database": dialect,
+            "cache_backend": app.config.get("CACHE_BACKEND"),
+            "python": platform.python_version(),
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "users": len(tokens),
+        },
+        "scenarios": results,
+    }
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = os.path.join(args.output, f"load-{stamp}.json")
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"saved {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Synthetic data for benchmarks: N users with M meals and K workouts each.
+
+Meals fall around breakfast, lunch, dinner and snack times with some jitter,
+spread over the last --days days; workouts favour mornings and evenings and
+skip some days. Names and macros come from the bundled food table. Rows are
+written with executemany INSERTs and daily_totals is rebuilt for the new users,
+so dashboards read exactly what the app would have produced.
+
+    cd backend
+    python -m benchmarks.seed --users 100 --meals 500 --workouts 100 --days 180
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.seed --users 20
+
+Seeded users are bench_<run>_<n>@example.com with password "benchmark".
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert
+
+from app import create_app, db
+from app.models import Meal, User, Workout
+from app.services import rollups
+from app.services.nutrition import FoodIndex
+
+PASSWORD = "benchmark"
+# (hour, minutes of jitter, weight) for meal times
+MEAL_SLOTS = ((8, 60, 3), (13, 60, 3), (19, 75, 3), (16, 120, 1), (22, 60, 1))
+WORKOUTS = (("Running", 30, 60, 11.0), ("Cycling", 30, 90, 9.0), ("Strength", 30, 75, 6.0),
+            ("Yoga", 20, 60, 3.5), ("Swimming", 20, 60, 10.0), ("Walking", 20, 90, 4.5))
+
+
+def _at(rng, day, hour, jitter_minutes):
+    minutes = hour * 60 + rng.gauss(0, jitter_minutes / 2)
+    minutes = min(max(minutes, 0), 24 * 60 - 1)
+    return day + timedelta(minutes=minutes, seconds=rng.randint(0, 59))
+
+
+def meal_rows(rng, user_id, count, days, now, foods):
+    slots = [slot for slot in MEAL_SLOTS for _ in range(slot[2])]
+    for _ in range(count):
+        day = (now - timedelta(days=rng.randrange(days))).replace(hour=0, minute=0, second=0, microsecond=0)
+        hour, jitter, _weight = rng.choice(slots)
+        food = rng.choice(foods)
+        grams = food["serving_g"] * rng.choice((0.5, 1, 1, 1, 1.5, 2))
+        per_100g = food["per_100g"]
+        yield {
+            "user_id": user_id,
+            "name": food["name"].capitalize(),
+            "calories": round(per_100g["calories"] * grams / 100, 1),
+            "protein": round(per_100g["protein"] * grams / 100, 1),
+            "carbs": round(per_100g["carbs"] * grams / 100, 1),
+            "fats": round(per_100g["fats"] * grams / 100, 1),
+            "image_path": None,
+            "logged_at": min(_at(rng, day, hour, jitter), now),
+        }
+
+
+def workout_rows(rng, user_id, count, days, now):
+    for _ in range(count):
+        day = (now - timedelta(days=rng.randrange(days))).replace(hour=0, minute=0, second=0, microsecond=0)
+        name, low, high, kcal_per_minute = rng.choice(WORKOUTS)
+        minutes = rng.randint(low, high)
+        hour = rng.choice((7, 7, 12, 18, 18, 20))
+        yield {
+            "user_id": user_id,
+            "name": name,
+            "duration_minutes": minutes,
+            "calories_burned": round(minutes * kcal_per_minute * rng.uniform(0.8, 1.2), 1),
+            "notes": None,
+            "logged_at": min(_at(rng, day, hour, 45), now),
+        }
+
+
+def _insert(model, rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(insert(model), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(model), batch)
+
+
+def seed(users, meals, workouts, days, seed=1, batch_size=5000):
+    """Create the users and their history, commit per user; returns the new user ids."""
+    rng = random.Random(seed)
+    foods = FoodIndex.load().foods
+    now = datetime.now(timezone.utc)
+    run = f"{int(time.time())}{rng.randrange(1000):03d}"
+    template = User(email="template")
+    template.set_password(PASSWORD)
+    password_hash = template.password_hash  # hash once; every seeded user shares the password
+
+    user_ids = []
+    for n in range(users):
+        user = User(email=f"bench_{run}_{n}@example.com", password_hash=password_hash)
+        db.session.add(user)
+        db.session.flush()
+        _insert(Meal, meal_rows(rng, user.id, meals, days, now, foods), batch_size)
+        _insert(Workout, workout_rows(rng, user.id, workouts, days, now), batch_size)
+        rollups.rebuild(user.id)
+        db.session.commit()
+        user_ids.append(user.id)
+    return user_ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--meals", type=int, default=300, help="Meals per user.")
+    parser.add_argument("--workouts", type=int, default=60, help="Workouts per user.")
+    parser.add_argument("--days", type=int, default=90, help="History length in days.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed.")
+    parser.add_argument("--create-tables", action="store_true", help="db.create_all() first (SQLite scratch DBs).")
+    args = parser.parse_args(argv)
+
+    app = create_app("production")
+    with app.app_context():
+        if args.create_tables:
+            db.create_all()
+        started = time.perf_counter()
+        user_ids = seed(args.users, args.meals, args.workouts, args.days, args.seed)
+        elapsed = time.perf_counter() - started
+    rows = len(user_ids) * (args.meals + args.workouts)
+    print(f"seeded {len(user_ids)} users, {rows} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
+    print(f"user ids {user_ids[0]}..{user_ids[-1]}" if user_ids else "no users")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
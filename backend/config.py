@@ -29,21 +29,134 @@ class Config:
     JWT_ACCESS_TOKEN_EXPIRES = 60 * 60 * 24  # 24 hours
     JWT_REFRESH_TOKEN_EXPIRES = 60 * 60 * 24 * 30  # 30 days
 
+    # Authenticated-user cache (per process); changes made by other workers show up within the TTL
+    USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", 60))
+    USER_CACHE_MAX_ENTRIES = int(os.environ.get("USER_CACHE_MAX_ENTRIES", 10000))
+    # /api/analyze/text results: per-process LRU over the text_estimates table; hit counts are
+    # written in batches, and the most-hit entries are loaded at startup
+    TEXT_ESTIMATE_CACHE_MAX_ENTRIES = int(os.environ.get("TEXT_ESTIMATE_CACHE_MAX_ENTRIES", 10000))
+    TEXT_ESTIMATE_PRELOAD = int(os.environ.get("TEXT_ESTIMATE_PRELOAD", 1000))
+    TEXT_ESTIMATE_HIT_FLUSH = int(os.environ.get("TEXT_ESTIMATE_HIT_FLUSH", 100))
+    TEXT_ESTIMATE_HIT_FLUSH_SECONDS = float(os.environ.get("TEXT_ESTIMATE_HIT_FLUSH_SECONDS", 60))
+
+    # Hand out guests pre-allocated by `flask guests prefill` (falls back to INSERT when empty)
+    GUEST_POOL_ENABLED = os.environ.get("GUEST_POOL_ENABLED", "").lower() in ("1", "true", "yes")
+
+    # Purge of expired guests and deleted accounts (`flask purge run`, or a scheduler thread
+    # in each web process when PURGE_INTERVAL_SECONDS > 0; an advisory lock lets one run at a time)
+    GUEST_TTL_DAYS = int(os.environ.get("GUEST_TTL_DAYS", 30))
+    ACCOUNT_DELETION_GRACE_HOURS = int(os.environ.get("ACCOUNT_DELETION_GRACE_HOURS", 0))
+    PURGE_BATCH_SIZE = int(os.environ.get("PURGE_BATCH_SIZE", 100))  # users per batch
+    PURGE_CHUNK_ROWS = int(os.environ.get("PURGE_CHUNK_ROWS", 5000))  # meal/workout rows per DELETE
+    PURGE_PAUSE_SECONDS = float(os.environ.get("PURGE_PAUSE_SECONDS", 0.05))
+    PURGE_LOCK_TIMEOUT_MS = int(os.environ.get("PURGE_LOCK_TIMEOUT_MS", 2000))
+    PURGE_INTERVAL_SECONDS = int(os.environ.get("PURGE_INTERVAL_SECONDS", 0))
+
+    # Monthly meals/workouts partitions on PostgreSQL (migration 008); the maintenance thread
+    # creates upcoming months (`flask partitions ensure` does the same from cron)
+    PARTITION_MONTHS_AHEAD = int(os.environ.get("PARTITION_MONTHS_AHEAD", 3))
+    PARTITION_MAINTENANCE_INTERVAL_SECONDS = int(os.environ.get("PARTITION_MAINTENANCE_INTERVAL_SECONDS", 0))
+    # Set by gunicorn.conf.py: create_app() runs in the preloading master, so the scheduler
+    # threads are started per worker in post_fork rather than in the master before forking
+    SCHEDULERS_AFTER_FORK = os.environ.get("SCHEDULERS_AFTER_FORK", "").lower() in ("1", "true", "yes")
+
     # Uploads (for meal images)
     UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER") or os.path.join(
         os.path.dirname(os.path.abspath(__file__)), "uploads"
     )
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB
     ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "webp", "gif"}
+    # Longer side of stored images; bigger uploads are downscaled on ingest
+    UPLOAD_MAX_DIMENSION = int(os.environ.get("UPLOAD_MAX_DIMENSION", 2048))
+    # Unreferenced uploads are kept this long before `flask uploads gc` deletes them
+    UPLOAD_GC_GRACE_SECONDS = int(os.environ.get("UPLOAD_GC_GRACE_SECONDS", 7 * 24 * 60 * 60))
+    # Resized variants for GET /api/meals/<id>/image, cached under UPLOAD_FOLDER/.variants
+    IMAGE_VARIANT_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_VARIANT_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+    IMAGE_MAX_AGE = int(os.environ.get("IMAGE_MAX_AGE", 7 * 24 * 60 * 60))
+    # Hand the file body to the front server: "x-accel" (nginx), "x-sendfile", or "" (Flask streams it)
+    IMAGE_SENDFILE = os.environ.get("IMAGE_SENDFILE", "").lower()
+    # nginx `internal` location aliased to UPLOAD_FOLDER, used with IMAGE_SENDFILE=x-accel
+    IMAGE_ACCEL_PREFIX = os.environ.get("IMAGE_ACCEL_PREFIX", "/_uploads/")
+
+    # Async image analysis (POST /api/analyze?async=1, processed by `flask jobs work`)
+    ANALYZE_WORKER_PROCESSES = int(os.environ.get("ANALYZE_WORKER_PROCESSES") or os.cpu_count() or 1)
+    ANALYZE_JOB_POLL_SECONDS = float(os.environ.get("ANALYZE_JOB_POLL_SECONDS", 1.0))
+    ANALYZE_JOB_TIMEOUT_SECONDS = int(os.environ.get("ANALYZE_JOB_TIMEOUT_SECONDS", 600))
+    # Runs per job before it is failed instead of requeued (a crashing image would loop forever)
+    ANALYZE_JOB_MAX_ATTEMPTS = int(os.environ.get("ANALYZE_JOB_MAX_ATTEMPTS", 3))
+
+    # Image recognition backend ("stub" or "cpu", see app/services/analysis.py); inputs from
+    # concurrent requests are inferred together, up to ANALYZER_MAX_BATCH per forward pass
+    ANALYZER_BACKEND = os.environ.get("ANALYZER_BACKEND", "stub")
+    ANALYZER_MODEL_PATH = os.environ.get("ANALYZER_MODEL_PATH") or None
+    ANALYZER_MAX_BATCH = int(os.environ.get("ANALYZER_MAX_BATCH", 8))
+    ANALYZER_MAX_WAIT_MS = float(os.environ.get("ANALYZER_MAX_WAIT_MS", 10))
+    # Load and warm up the model at startup (off: on the first analysis)
+    ANALYZER_PRELOAD = os.environ.get("ANALYZER_PRELOAD", "1").lower() in ("1", "true", "yes")
+
+    # Dashboard response cache: "local" (per process), "redis" (shared) or "null" (off)
+    CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "local")
+    CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    CACHE_DEFAULT_TTL = int(os.environ.get("CACHE_DEFAULT_TTL", 30))
+    CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 10000))
+
+    # Instrumentation: GET /metrics (Prometheus), slow-query log threshold, Server-Timing header
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+    SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 200))
+    METRICS_SERVER_TIMING = os.environ.get("METRICS_SERVER_TIMING", "").lower() in ("1", "true", "yes")
+
+    # Bulk import: rows per INSERT/commit for /api/meals/bulk and /api/workouts/bulk
+    BULK_IMPORT_BATCH_SIZE = int(os.environ.get("BULK_IMPORT_BATCH_SIZE", 1000))
+    # Most ids accepted by one PATCH /api/meals or /api/workouts
+    BULK_UPDATE_MAX_IDS = int(os.environ.get("BULK_UPDATE_MAX_IDS", 1000))
+
+    # Delta sync (GET /api/sync): rows per page, how long a change must have been committed
+    # before it is served (longer than any write transaction), and how long tombstones are
+    # kept; older tokens get 410 and the client syncs from scratch
+    SYNC_PAGE_SIZE = int(os.environ.get("SYNC_PAGE_SIZE", 500))
+    SYNC_SETTLE_SECONDS = float(os.environ.get("SYNC_SETTLE_SECONDS", 2))
+    SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get("SYNC_TOMBSTONE_RETENTION_DAYS", 90))
 
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    METRICS_SERVER_TIMING = True
+
+
+def _engine_options(database_url, pool_size, max_overflow, statement_timeout_ms):
+    options = {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),  # seconds to wait for a free connection
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),  # reconnect before server/proxy idle limits
+        "pool_pre_ping": True,  # replace connections dropped by failovers or restarts
+        "pool_use_lifo": True,  # reuse warm connections; surplus ones idle out and get recycled
+    }
+    if database_url.startswith("postgresql"):
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout_ms}"}
+    return options
 
 
 class ProductionConfig(Config):
     DEBUG = False
 
+    # Pre-fork server sizing, shared with gunicorn.conf.py. Each worker process has its own
+    # pool; a gthread worker runs at most WEB_THREADS requests at once, each holding its
+    # session's connection (a streaming export for the whole response), so
+    # pool_size = WEB_THREADS. Some paths briefly check out a second connection of their own:
+    # text-estimate cache lookups, writes and hit flushes, and the purge/partition scheduler
+    # threads (one more for their advisory lock). Overflow covers those: WEB_THREADS + 2.
+    # Make sure WEB_WORKERS * (DB_POOL_SIZE + DB_MAX_OVERFLOW) (+ CLI workers) stays below
+    # max_connections.
+    WEB_WORKERS = int(os.environ.get("WEB_CONCURRENCY") or (os.cpu_count() or 1) * 2 + 1)
+    WEB_THREADS = int(os.environ.get("WEB_THREADS", 4))
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(
+        Config.SQLALCHEMY_DATABASE_URI,
+        pool_size=int(os.environ.get("DB_POOL_SIZE") or WEB_THREADS),
+        max_overflow=int(os.environ.get("DB_MAX_OVERFLOW") or WEB_THREADS + 2),
+        statement_timeout_ms=int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 30000)),
+    )
+
 
 config_by_name = {
     "development": DevelopmentConfig,
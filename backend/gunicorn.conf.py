@@ -0,0 +1,58 @@
+"""
+Production server settings (pre-fork, threaded workers).
+
+    cd backend
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Worker and thread counts come from ProductionConfig (WEB_CONCURRENCY, WEB_THREADS),
+which also sizes each worker's database pool to match.
+"""
+import gc
+import os
+
+# Before the app is preloaded: background threads must start in the workers, not the master
+os.environ.setdefault("SCHEDULERS_AFTER_FORK", "1")
+
+from config import ProductionConfig  # noqa: E402
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+worker_class = "gthread"
+workers = ProductionConfig.WEB_WORKERS
+threads = ProductionConfig.WEB_THREADS
+
+# Import the app (routes, models, food index modules) once in the master; workers share
+# those pages copy-on-write instead of each importing everything again.
+preload_app = True
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so slow leaks cannot accumulate
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 5000))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    # Move everything allocated while preloading out of the GC's reach, so collections in the
+    # workers do not touch (and un-share) those pages.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Connections opened in the master must not be shared with children; drop them without
+    # closing the parent's sockets.
+    from app import db, start_schedulers
+    from app.services.analysis import analyzer
+
+    app = worker.app.wsgi()
+    with app.app_context():
+        db.engine.dispose(close=False)
+    # The model was loaded in the master; warm up this worker's own buffers and BLAS threads
+    if analyzer.loaded:
+        analyzer.warmup()
+    # Purge/partition threads run here, not in the master: forking while a thread holds a
+    # pool or logging lock could deadlock the child
+    start_schedulers(app)
@@ -19,7 +19,9 @@ with app.app_context():
     config = context.config
     config.set_main_option("sqlalchemy.url", current_app.config["SQLALCHEMY_DATABASE_URI"])
     from app import db
-    from app.models import User, Meal, Workout  # noqa: F401
+    from app.models import (  # noqa: F401
+        User, Meal, Workout, DailyTotal, AnalysisJob, UploadBlob, TextEstimate, Tombstone,
+    )
     target_metadata = db.metadata
 
     def run_migrations_offline():
@@ -0,0 +1,62 @@
+"""Daily rollup table for dashboard totals
+
+Revision ID: 002_daily_totals
+Revises: 001_initial
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "002_daily_totals"
+down_revision = "001_initial"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "daily_totals",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("calories_in", sa.Float(), nullable=False, server_default=sa.text("0")),
+        sa.Column("calories_out", sa.Float(), nullable=False, server_default=sa.text("0")),
+        sa.Column("protein", sa.Float(), nullable=False, server_default=sa.text("0")),
+        sa.Column("carbs", sa.Float(), nullable=False, server_default=sa.text("0")),
+        sa.Column("fats", sa.Float(), nullable=False, server_default=sa.text("0")),
+        sa.Column("meals_count", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("workouts_count", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "day"),
+    )
+
+    # Backfill from existing entries (days are UTC, matching the dashboard). SQLite stores
+    # naive UTC timestamps and has no AT TIME ZONE.
+    if op.get_bind().dialect.name == "postgresql":
+        day = "date(logged_at AT TIME ZONE 'UTC')"
+    else:
+        day = "date(logged_at)"
+    op.execute(
+        f"""
+        INSERT INTO daily_totals
+            (user_id, day, calories_in, calories_out, protein, carbs, fats, meals_count, workouts_count)
+        SELECT user_id, day, SUM(calories_in), SUM(calories_out), SUM(protein), SUM(carbs), SUM(fats),
+               SUM(meals_count), SUM(workouts_count)
+        FROM (
+            SELECT user_id, {day} AS day,
+                   calories AS calories_in, 0 AS calories_out, protein, carbs, fats,
+                   1 AS meals_count, 0 AS workouts_count
+            FROM meals
+            UNION ALL
+            SELECT user_id, {day},
+                   0, COALESCE(calories_burned, 0), 0, 0, 0, 0, 1
+            FROM workouts
+        ) AS activity
+        GROUP BY user_id, day
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("daily_totals")
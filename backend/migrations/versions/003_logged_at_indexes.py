@@ -0,0 +1,40 @@
+"""Composite (user_id, logged_at DESC, id DESC) indexes for meal/workout lists
+
+Revision ID: 003_logged_at_indexes
+Revises: 002_daily_totals
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "003_logged_at_indexes"
+down_revision = "002_daily_totals"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_meals_user_id_logged_at",
+        "meals",
+        ["user_id", sa.text("logged_at DESC"), sa.text("id DESC")],
+        unique=False,
+    )
+    op.create_index(
+        "ix_workouts_user_id_logged_at",
+        "workouts",
+        ["user_id", sa.text("logged_at DESC"), sa.text("id DESC")],
+        unique=False,
+    )
+    # The composite indexes cover user_id-only lookups, so the old indexes are redundant
+    op.drop_index(op.f("ix_meals_user_id"), table_name="meals")
+    op.drop_index(op.f("ix_workouts_user_id"), table_name="workouts")
+
+
+def downgrade():
+    op.create_index(op.f("ix_workouts_user_id"), "workouts", ["user_id"], unique=False)
+    op.create_index(op.f("ix_meals_user_id"), "meals", ["user_id"], unique=False)
+    op.drop_index("ix_workouts_user_id_logged_at", table_name="workouts")
+    op.drop_index("ix_meals_user_id_logged_at", table_name="meals")
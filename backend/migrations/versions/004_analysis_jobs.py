@@ -0,0 +1,44 @@
+"""Queue table for asynchronous image analysis
+
+Revision ID: 004_analysis_jobs
+Revises: 003_logged_at_indexes
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "004_analysis_jobs"
+down_revision = "003_logged_at_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "analysis_jobs",
+        sa.Column("id", sa.String(32), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(16), nullable=False, server_default="queued"),
+        sa.Column("image_path", sa.String(512), nullable=False),
+        sa.Column("save_meal", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("meal_name", sa.String(255), nullable=True),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("meal_id", sa.Integer(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_analysis_jobs_status_created_at", "analysis_jobs", ["status", "created_at"], unique=False)
+    op.create_index(op.f("ix_analysis_jobs_user_id"), "analysis_jobs", ["user_id"], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f("ix_analysis_jobs_user_id"), table_name="analysis_jobs")
+    op.drop_index("ix_analysis_jobs_status_created_at", table_name="analysis_jobs")
+    op.drop_table("analysis_jobs")
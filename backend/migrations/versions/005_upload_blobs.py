@@ -0,0 +1,34 @@
+"""Content-addressed upload store
+
+Revision ID: 005_upload_blobs
+Revises: 004_analysis_jobs
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "005_upload_blobs"
+down_revision = "004_analysis_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "upload_blobs",
+        sa.Column("digest", sa.String(64), nullable=False),
+        sa.Column("path", sa.String(512), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("refcount", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("analysis", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("last_used_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint("digest"),
+        sa.UniqueConstraint("path"),
+    )
+
+
+def downgrade():
+    op.drop_table("upload_blobs")
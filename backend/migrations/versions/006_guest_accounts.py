@@ -0,0 +1,32 @@
+"""Password-less guest accounts and a pre-allocated guest pool
+
+Revision ID: 006_guest_accounts
+Revises: 005_upload_blobs
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "006_guest_accounts"
+down_revision = "005_upload_blobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column("users", "password_hash", existing_type=sa.String(255), nullable=True)
+    op.add_column("users", sa.Column("is_guest", sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.add_column("users", sa.Column("pooled", sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.execute("UPDATE users SET is_guest = true WHERE email LIKE 'guest\\_%@guest.local'")
+    op.create_index("ix_users_pooled", "users", ["pooled"], unique=False, postgresql_where=sa.text("pooled"))
+
+
+def downgrade():
+    op.drop_index("ix_users_pooled", table_name="users")
+    op.execute("DELETE FROM users WHERE pooled")
+    op.execute("UPDATE users SET password_hash = '!' WHERE password_hash IS NULL")
+    op.drop_column("users", "pooled")
+    op.drop_column("users", "is_guest")
+    op.alter_column("users", "password_hash", existing_type=sa.String(255), nullable=False)
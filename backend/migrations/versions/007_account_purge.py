@@ -0,0 +1,39 @@
+"""Account deletion requests and purge indexes
+
+Revision ID: 007_account_purge
+Revises: 006_guest_accounts
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "007_account_purge"
+down_revision = "006_guest_accounts"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("users", sa.Column("deletion_requested_at", sa.DateTime(timezone=True), nullable=True))
+    op.create_index(
+        "ix_users_deletion_requested_at",
+        "users",
+        ["deletion_requested_at"],
+        unique=False,
+        postgresql_where=sa.text("deletion_requested_at IS NOT NULL"),
+    )
+    op.create_index(
+        "ix_users_guest_created_at",
+        "users",
+        ["created_at"],
+        unique=False,
+        postgresql_where=sa.text("is_guest AND NOT pooled"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_users_guest_created_at", table_name="users")
+    op.drop_index("ix_users_deletion_requested_at", table_name="users")
+    op.drop_column("users", "deletion_requested_at")
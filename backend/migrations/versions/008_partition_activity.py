@@ -0,0 +1,117 @@
+"""Partition meals and workouts by logged_at month (PostgreSQL)
+
+Revision ID: 008_partition_activity
+Revises: 007_account_purge
+Create Date: 2026-10-18
+
+Each table is rebuilt as a declarative RANGE partitioned table with one
+partition per UTC month, from the oldest existing row through three months
+ahead, plus a DEFAULT partition for anything outside those bounds. The primary
+key becomes (id, logged_at), as PostgreSQL requires the partition key in unique
+constraints; ids still come from the existing sequence. Rows are copied with
+INSERT ... SELECT, so on large tables run this in a maintenance window.
+Needs PostgreSQL 12+. Other databases are left unchanged.
+
+Later months are added by `flask partitions ensure`; old ones are moved out by
+`flask partitions archive`.
+"""
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "008_partition_activity"
+down_revision = "007_account_purge"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+COLUMNS = {
+    "meals": """
+        id integer NOT NULL DEFAULT nextval('meals_id_seq'),
+        user_id integer NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+        image_path varchar(512),
+        calories double precision NOT NULL DEFAULT 0,
+        protein double precision NOT NULL DEFAULT 0,
+        carbs double precision NOT NULL DEFAULT 0,
+        fats double precision NOT NULL DEFAULT 0,
+        name varchar(255),
+        logged_at timestamptz NOT NULL,
+        created_at timestamptz DEFAULT now()
+    """,
+    "workouts": """
+        id integer NOT NULL DEFAULT nextval('workouts_id_seq'),
+        user_id integer NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+        name varchar(255) NOT NULL,
+        duration_minutes integer NOT NULL,
+        calories_burned double precision,
+        notes text,
+        logged_at timestamptz NOT NULL,
+        created_at timestamptz DEFAULT now()
+    """,
+}
+
+
+def _column_names(columns):
+    return ", ".join(line.split()[0] for line in columns.strip().splitlines())
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition(table, month):
+    nxt = _add_months(month, 1)
+    op.execute(
+        f"CREATE TABLE {table}_y{month.year}m{month.month:02d} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month} 00:00:00+00') TO ('{nxt} 00:00:00+00')"
+    )
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    today = datetime.now(timezone.utc).date().replace(day=1)
+    for table, columns in COLUMNS.items():
+        names = _column_names(columns)
+        oldest = bind.execute(
+            sa.text(f"SELECT date_trunc('month', min(logged_at) AT TIME ZONE 'UTC')::date FROM {table}")
+        ).scalar()
+        first = min(oldest or today, today)
+
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned")
+        op.execute(f"ALTER TABLE {table}_unpartitioned RENAME CONSTRAINT {table}_pkey TO {table}_unpartitioned_pkey")
+        op.execute(f"ALTER INDEX ix_{table}_user_id_logged_at RENAME TO ix_{table}_user_id_logged_at_old")
+        op.execute(f"CREATE TABLE {table} ({columns}, PRIMARY KEY (id, logged_at)) PARTITION BY RANGE (logged_at)")
+        month = first
+        while month <= _add_months(today, MONTHS_AHEAD):
+            _partition(table, month)
+            month = _add_months(month, 1)
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+        # Created on the parent, so every partition (present and future) gets its own copy
+        op.execute(f"CREATE INDEX ix_{table}_user_id_logged_at ON {table} (user_id, logged_at DESC, id DESC)")
+
+        op.execute(f"INSERT INTO {table} ({names}) SELECT {names} FROM {table}_unpartitioned")
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+        op.execute(f"DROP TABLE {table}_unpartitioned")
+        op.execute(f"ANALYZE {table}")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    for table, columns in COLUMNS.items():
+        names = _column_names(columns)
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_partitioned")
+        op.execute(f"ALTER TABLE {table}_partitioned RENAME CONSTRAINT {table}_pkey TO {table}_partitioned_pkey")
+        op.execute(f"ALTER INDEX ix_{table}_user_id_logged_at RENAME TO ix_{table}_user_id_logged_at_part")
+        op.execute(f"CREATE TABLE {table} ({columns}, PRIMARY KEY (id))")
+        op.execute(f"INSERT INTO {table} ({names}) SELECT {names} FROM {table}_partitioned")
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+        op.execute(f"DROP TABLE {table}_partitioned")  # drops all attached partitions
+        op.execute(f"CREATE INDEX ix_{table}_user_id_logged_at ON {table} (user_id, logged_at DESC, id DESC)")
@@ -0,0 +1,37 @@
+"""Persistent cache of text estimates
+
+Revision ID: 009_text_estimates
+Revises: 008_partition_activity
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "009_text_estimates"
+down_revision = "008_partition_activity"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "text_estimates",
+        sa.Column("digest", sa.String(64), nullable=False),
+        sa.Column("food_version", sa.String(16), nullable=False),
+        sa.Column("normalized", sa.Text(), nullable=False),
+        sa.Column("result", sa.JSON(), nullable=False),
+        sa.Column("hits", sa.BigInteger(), nullable=False, server_default=sa.text("0")),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("last_hit_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint("digest"),
+    )
+    op.create_index(
+        "ix_text_estimates_version_hits", "text_estimates", ["food_version", sa.text("hits DESC")], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index("ix_text_estimates_version_hits", table_name="text_estimates")
+    op.drop_table("text_estimates")
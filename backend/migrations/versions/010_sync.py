@@ -0,0 +1,56 @@
+"""updated_at columns and tombstones for delta sync
+
+Revision ID: 010_sync
+Revises: 009_text_estimates
+Create Date: 2026-10-18
+
+On PostgreSQL 11+ adding a NOT NULL column with a constant-per-statement
+default like now() is a catalog-only change, so meals and workouts are not
+rewritten; existing rows all get the migration time as updated_at. The
+default is dropped afterwards because the application sets updated_at on
+every write. Added to the partitioned parent, the column and index reach every
+attached partition.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "010_sync"
+down_revision = "009_text_estimates"
+branch_labels = None
+depends_on = None
+
+TABLES = ("meals", "workouts")
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table in TABLES:
+        if bind.dialect.name == "postgresql":
+            op.execute(f"ALTER TABLE {table} ADD COLUMN updated_at timestamptz NOT NULL DEFAULT now()")
+            op.execute(f"ALTER TABLE {table} ALTER COLUMN updated_at DROP DEFAULT")
+        else:
+            op.add_column(table, sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True))
+            op.execute(f"UPDATE {table} SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)")
+            op.alter_column(table, "updated_at", existing_type=sa.DateTime(timezone=True), nullable=False)
+        op.create_index(f"ix_{table}_user_id_updated_at", table, ["user_id", "updated_at"], unique=False)
+
+    op.create_table(
+        "tombstones",
+        sa.Column("id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(16), nullable=False),
+        sa.Column("record_id", sa.Integer(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_tombstones_user_id_deleted_at", "tombstones", ["user_id", "deleted_at"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_tombstones_user_id_deleted_at", table_name="tombstones")
+    op.drop_table("tombstones")
+    for table in TABLES:
+        op.drop_index(f"ix_{table}_user_id_updated_at", table_name=table)
+        op.drop_column(table, "updated_at")
@@ -0,0 +1,11 @@
+"""
+WSGI entry point for production servers: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+
+app = create_app(os.environ.get("FLASK_ENV") or "production")